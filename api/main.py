@@ -1,20 +1,96 @@
 # api/main.py
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+import json
+import queue
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import shutil, os
 
 # Import core services
-from services.ocr import extract_text_from_image, detect_document_type, extract_key_fields
-from services.decision_engine import make_decision
-from services.explainability import highlight_text_areas
-from api.schemas import InferenceResponse
+from services.pipeline import analyze_file, result_events, result_version, PIPELINE_VERSION
+from services.cache import result_cache, content_key, RESULT_CACHE_ENABLED
+from services.pool import pipeline_pool, PoolSaturated, RETRY_AFTER_SECONDS
+from services.jobs import JobStore, JobRunner
+from services.metrics import stage_metrics
+from services.backends import backends, BACKEND_WARMUP
+from services.model_server import model_server
+from services.outputs import output_store, OUTPUTS_URL
+from api.schemas import InferenceResponse, JobStatus
+from services.batch import iter_results, iter_zip
+from services.document import Document
+from api.uploads import read_upload, MAX_UPLOAD_BYTES
+
+
+# -------------------------------------------------------
+# ♻️ Lifespan: job runner + worker pool
+# -------------------------------------------------------
+job_store = None
+job_runner = None
+
+
+def _record_timings(result: dict, request_seconds: float = None) -> dict:
+    """
+    Feed a result's stage timings into the latency histograms and return the
+    result without them (cached and default responses stay timing-free).
+    """
+    result = dict(result)
+    timings = dict(result.pop("timings", None) or {})
+    if request_seconds is not None:
+        timings["request"] = request_seconds
+    if timings:
+        stage_metrics.observe(timings, result.get("document_type"))
+    return result
+
+
+def _cache_job_result(job_id: str, result: dict):
+    result = _record_timings(result)
+    if RESULT_CACHE_ENABLED:
+        job = job_store.get(job_id)
+        result_cache.put(content_key(job["sha256"], result_version(job["ocr_engine"])), result)
+
+
+def start_jobs(store: JobStore = None, pool=None):
+    """Open the job store and start dispatching queued jobs."""
+    global job_store, job_runner
+    job_store = store or JobStore()
+    job_runner = JobRunner(job_store, pool or pipeline_pool, on_result=_cache_job_result)
+    job_runner.start()
+
+
+def stop_jobs():
+    global job_runner
+    if job_runner is not None:
+        job_runner.stop()
+        job_runner = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_server.start()  # before any worker exists, so every worker inherits its address
+    if BACKEND_WARMUP:
+        print(f"🔥 Backend warm-up: {backends.warm_up()}")
+    start_jobs()
+    output_store.start_sweeper()
+    yield
+    output_store.stop_sweeper()
+    stop_jobs()
+    pipeline_pool.shutdown(wait=False)
+    model_server.shutdown()
+
 
 # -------------------------------------------------------
 # 🌟 FastAPI App Initialization
 # -------------------------------------------------------
-app = FastAPI(title="🌟 Intelligent Document Understanding and Automated Decision-Making API")
+app = FastAPI(
+    title="🌟 Intelligent Document Understanding and Automated Decision-Making API",
+    lifespan=lifespan,
+)
 
 # Allow frontend (HTML) to connect to backend
 app.add_middleware(
@@ -25,8 +101,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ✅ Serve explainability images (output visualization)
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+class ImmutableStaticFiles(StaticFiles):
+    """Output names are content hashes: a file never changes, so browsers may keep it."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# ✅ Serve explainability images (output visualization); the directory is
+# created by the first image written and kept bounded by the output sweeper
+app.mount(OUTPUTS_URL, ImmutableStaticFiles(directory=output_store.directory, check_dir=False), name="outputs")
 
 
 # -------------------------------------------------------
@@ -37,48 +123,271 @@ def root():
     return {"message": "🚀 API is running successfully!"}
 
 
+def _checked_ocr_engine(name: Optional[str]) -> Optional[str]:
+    """Validate a requested OCR engine (400 when unknown or not installed)."""
+    if name is None:
+        return None
+    if name not in backends.names("ocr"):
+        raise HTTPException(status_code=400, detail=f"Unknown OCR engine '{name}'. "
+                                                    f"Choose one of: {', '.join(backends.names('ocr'))}.")
+    if not backends.available("ocr", name):
+        raise HTTPException(status_code=400, detail=f"OCR engine '{name}' is not installed on this server.")
+    return name
+
+
+_OCR_ENGINE_QUERY = Query(None, description="OCR backend for scanned pages (tesseract, paddle); default OCR_ENGINE")
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy processing other documents. Please retry shortly.",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+def _worker_lost() -> HTTPException:
+    """The worker running this request died; the pool has been replaced, so a retry can succeed."""
+    return HTTPException(
+        status_code=503,
+        detail="The worker processing this document stopped unexpectedly. Please retry shortly.",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
 # -------------------------------------------------------
 # 🧠 Main AI Endpoint
 # -------------------------------------------------------
 @app.post("/analyze_document/", response_model=InferenceResponse)
-async def analyze_document(file: UploadFile = File(...)):
+async def analyze_document(
+    file: UploadFile = File(...),
+    timings: bool = Query(False, description="Include per-stage timings (seconds) in the response"),
+    ocr_engine: Optional[str] = _OCR_ENGINE_QUERY,
+    explain_image: bool = Query(False, description="Also render the field boxes into a reduced-resolution PNG"),
+):
     """
     Full AI pipeline:
-    1️⃣ Save uploaded file
+    1️⃣ Read upload into memory (size-capped)
     2️⃣ OCR text extraction
     3️⃣ Document type detection
     4️⃣ Key field extraction
     5️⃣ Automated decision-making
-    6️⃣ Explainability visualization
+    6️⃣ Explainability: JSON box overlay (+ PNG with ?explain_image=true)
     """
-    # --- Step 1: Save uploaded file temporarily
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # --- Step 2: OCR / Text extraction
-    text = extract_text_from_image(temp_path)
-
-    # --- Step 3: Document type & key field extraction
-    doc_type = detect_document_type(text)
-    key_fields = extract_key_fields(doc_type, text)
-
-    # --- Step 4: Decision logic
-    decision, confidence = make_decision(doc_type, key_fields)
-
-    # --- Step 5: Explainability (highlight)
-    explain_map = highlight_text_areas(temp_path, key_fields)
-
-    # --- Step 6: Build consistent response (match schema + frontend)
-    response = {
-        "document_type": doc_type,
-        "fields_extracted": key_fields,
-        "decision": decision,
-        "confidence_score": confidence,
-        "explainability_map": explain_map or "N/A"
-    }
+    started = time.perf_counter()
+    ocr_engine = _checked_ocr_engine(ocr_engine)
 
-    # Optional cleanup
-    # os.remove(temp_path)
+    # --- Step 1: Read the upload (no temp file in the working directory)
+    document = await read_upload(file)
 
+    # --- Repeat uploads are answered from the content-addressed cache
+    cache_key = content_key(document.sha256, result_version(ocr_engine, explain_image))
+    if RESULT_CACHE_ENABLED:
+        cached = await run_in_threadpool(result_cache.get, cache_key)
+        # a cached result whose explainability image was evicted is recomputed
+        if cached is not None and await run_in_threadpool(output_store.touch, cached.get("explainability_map")):
+            _record_timings(cached, time.perf_counter() - started)
+            return JSONResponse(cached)
+
+    # --- Reject immediately when the worker pool is full
+    if pipeline_pool.saturated:
+        raise _overloaded()
+
+    # --- Steps 2-6: OCR, detection, extraction, decision, explainability
+    # run in the worker pool so the event loop stays responsive
+    try:
+        result = await pipeline_pool.run(analyze_file, document, ocr_engine=ocr_engine, explain_image=explain_image)
+    except PoolSaturated:
+        raise _overloaded()
+    except BrokenProcessPool:
+        raise _worker_lost()
+
+    response = _record_timings(result, time.perf_counter() - started)
+    if RESULT_CACHE_ENABLED:
+        await run_in_threadpool(result_cache.put, cache_key, response)
+
+    if timings:
+        return JSONResponse({**response, "timings": result.get("timings")})
     return JSONResponse(response)
+
+
+# -------------------------------------------------------
+# 📡 Streaming Endpoint (Server-Sent Events)
+# -------------------------------------------------------
+# How often the stream checks whether the pipeline finished while no event arrives
+SSE_POLL_SECONDS = 0.25
+
+
+def _sse(event: dict) -> str:
+    """One Server-Sent Event: the event name, then its fields as JSON."""
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _cached_events(cached: dict):
+    for event in result_events(cached):
+        yield _sse(event)
+    yield _sse({"event": "result", **cached})
+
+
+async def _pipeline_events(events, future, cache_key: str, started: float):
+    """Relay the pipeline's events while it runs, then the full result (or an error)."""
+    while True:
+        finished = future.done()  # checked first: once done, every event is already queued
+        try:
+            event = await run_in_threadpool(events.get, True, SSE_POLL_SECONDS)
+        except queue.Empty:
+            if finished:
+                break
+            continue
+        yield _sse(event)
+
+    try:
+        result = future.result()
+    except Exception as e:
+        print(f"❌ Streaming analysis failed: {e}")
+        yield _sse({"event": "error", "detail": str(e)})
+        return
+    response = _record_timings(result, time.perf_counter() - started)
+    if RESULT_CACHE_ENABLED:
+        await run_in_threadpool(result_cache.put, cache_key, response)
+    yield _sse({"event": "result", **response})
+
+
+@app.post("/analyze_document/stream")
+async def analyze_document_stream(
+    file: UploadFile = File(...),
+    ocr_engine: Optional[str] = _OCR_ENGINE_QUERY,
+    explain_image: bool = Query(False, description="Also render the field boxes into a reduced-resolution PNG"),
+):
+    """
+    Same pipeline as /analyze_document/, answered as a text/event-stream:
+    "stage" and "page" events (each page's text as soon as it is read), then
+    "document_type", "fields", "decision", "overlay", and finally "result"
+    with the full InferenceResponse ("error" if the pipeline failed).
+    """
+    started = time.perf_counter()
+    ocr_engine = _checked_ocr_engine(ocr_engine)
+    document = await read_upload(file)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # no proxy buffering
+
+    cache_key = content_key(document.sha256, result_version(ocr_engine, explain_image))
+    if RESULT_CACHE_ENABLED:
+        cached = await run_in_threadpool(result_cache.get, cache_key)
+        if cached is not None and await run_in_threadpool(output_store.touch, cached.get("explainability_map")):
+            _record_timings(cached, time.perf_counter() - started)
+            return StreamingResponse(_cached_events(cached), media_type="text/event-stream", headers=headers)
+
+    if pipeline_pool.saturated:
+        raise _overloaded()
+    events = await run_in_threadpool(pipeline_pool.event_queue)
+    try:
+        future = pipeline_pool.submit(analyze_file, document, ocr_engine=ocr_engine, explain_image=explain_image,
+                                      on_event=events.put)
+    except PoolSaturated:
+        raise _overloaded()
+    return StreamingResponse(_pipeline_events(events, future, cache_key, started), media_type="text/event-stream",
+                             headers=headers)
+
+
+# -------------------------------------------------------
+# 📚 Batch Endpoint (NDJSON stream)
+# -------------------------------------------------------
+def _batch_documents(files: List[UploadFile]):
+    """Expand uploads lazily: zip archives yield their members, other files themselves."""
+    for upload in files:
+        upload.file.seek(0)
+        if (upload.filename or "").lower().endswith(".zip") or zipfile.is_zipfile(upload.file):
+            upload.file.seek(0)
+            yield from iter_zip(upload.file, MAX_UPLOAD_BYTES)
+            continue
+        upload.file.seek(0)
+        data = upload.file.read(MAX_UPLOAD_BYTES + 1)
+        if len(data) > MAX_UPLOAD_BYTES:
+            print(f"⚠️ Skipping {upload.filename}: larger than {MAX_UPLOAD_BYTES} bytes")
+            continue
+        yield Document(data, upload.filename or "upload")
+
+
+@app.post("/analyze_batch/")
+def analyze_batch(files: List[UploadFile] = File(...), ocr_engine: Optional[str] = _OCR_ENGINE_QUERY):
+    """
+    Analyze many documents (several files and/or zip archives) in one request.
+    Streams one JSON line per document as soon as it finishes.
+    """
+    ocr_engine = _checked_ocr_engine(ocr_engine)
+
+    def stream():
+        cache = result_cache if RESULT_CACHE_ENABLED else None
+        for result in iter_results(_batch_documents(files), pipeline_pool, cache=cache, ocr_engine=ocr_engine):
+            if result["status"] == "ok":
+                result = _record_timings(result)
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# -------------------------------------------------------
+# ⏳ Asynchronous Jobs
+# -------------------------------------------------------
+def _jobs_or_503():
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job queue is not running.")
+    return job_store
+
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_job(file: UploadFile = File(...), ocr_engine: Optional[str] = _OCR_ENGINE_QUERY):
+    """Queue a document for analysis and return its job id immediately."""
+    store = _jobs_or_503()
+    ocr_engine = _checked_ocr_engine(ocr_engine)
+    document = await read_upload(file)
+    cached = None
+    if RESULT_CACHE_ENABLED:
+        cached = await run_in_threadpool(result_cache.get, content_key(document.sha256, result_version(ocr_engine)))
+    job_id = await run_in_threadpool(store.create, document, cached, ocr_engine)
+    job_runner.notify()
+    return await run_in_threadpool(store.get, job_id)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    """Status, per-stage progress and (when done) the InferenceResponse of a job."""
+    job = _jobs_or_503().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+# -------------------------------------------------------
+# 📦 Result cache statistics
+# -------------------------------------------------------
+@app.get("/cache/stats")
+def cache_stats():
+    from services.near_duplicates import near_duplicate_index  # NumPy; loaded on demand
+    return {"pipeline_version": PIPELINE_VERSION, **result_cache.stats(), "outputs": output_store.stats(),
+            "near_duplicates": near_duplicate_index.stats() if near_duplicate_index.enabled else {"enabled": False},
+            "field_model_server": model_server.stats()}
+
+
+# -------------------------------------------------------
+# 📈 Prometheus metrics
+# -------------------------------------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage latency histograms (by document type) plus pool and cache gauges."""
+    cache = result_cache.stats()
+    outputs = output_store.stats()
+    gauges = {
+        "pool_in_flight": ("Documents running or queued on the worker pool.", [({}, pipeline_pool.in_flight)]),
+        "pool_capacity": ("Worker pool admission slots.", [({}, pipeline_pool.capacity)]),
+        "result_cache_events": ("Result cache counters since startup.", [
+            ({"event": event}, cache[event])
+            for event in ("memory_hits", "disk_hits", "misses", "stores", "evictions") if event in cache
+        ]),
+        "outputs_disk_bytes": ("Bytes of generated images kept under /outputs.", [({}, outputs["disk_bytes"])]),
+        "outputs_events": ("Generated image counters since startup.", [
+            ({"event": event}, outputs[event]) for event in ("stores", "reused", "evictions", "sweeps")
+        ]),
+    }
+    return PlainTextResponse(stage_metrics.render(gauges), media_type="text/plain; version=0.0.4")
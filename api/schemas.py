@@ -1,10 +1,49 @@
 # api/schemas.py
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+class PageInfo(BaseModel):
+    page: int                         # 1-based page number
+    strategy: str                     # text_layer | ocr
+    engine: Optional[str] = None      # OCR backend used (ocr pages only)
+    seconds: float
+
+class Region(BaseModel):
+    field: str
+    value: str
+    page: int                         # 1-based page number
+    box: List[float]                  # x0, y0, x1, y1 as fractions of the page width / height
+
+class PageSize(BaseModel):
+    page: int
+    width: float                      # PDF points, or pixels for images / scans
+    height: float
+
+class Overlay(BaseModel):
+    pages: List[PageSize] = []        # pages that have at least one region
+    regions: List[Region] = []
 
 class InferenceResponse(BaseModel):
     document_type: str
     fields_extracted: Dict[str, Any]
     decision: str
     confidence_score: float
-    explainability_map: str
+    explainability_map: str                      # PNG path, or "N/A" unless ?explain_image=true
+    overlay: Optional[Overlay] = None            # field boxes for client-side drawing
+    pages: Optional[List[PageInfo]] = None
+    near_duplicate: Optional[Dict[str, Any]] = None  # earlier document with nearly the same text
+    page_budget: Optional[Dict[str, Any]] = None     # pages read under PAGE_BUDGET_FIRST_PAGES
+    timings: Optional[Dict[str, float]] = None   # seconds per stage (opt-in)
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str                       # queued | running | done | failed
+    filename: str
+    stage: Optional[str] = None       # last stage reported by the worker
+    progress: Dict[str, str] = {}     # stage -> running | done
+    result: Optional[InferenceResponse] = None
+    error: Optional[str] = None
+    ocr_engine: Optional[str] = None  # None = server default (OCR_ENGINE)
+    created_at: float
+    updated_at: float
@@ -0,0 +1,41 @@
+# api/uploads.py
+"""
+Upload ingestion: reads the multipart upload (already held by Starlette in a
+spooled buffer) into a Document with a hard size cap. Nothing is written to
+the working directory.
+"""
+
+import os
+from fastapi import UploadFile, HTTPException
+
+from services.document import Document
+
+# ✅ Maximum accepted upload size (bytes)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum upload size is {max_bytes // (1024 * 1024)} MB.",
+    )
+
+
+async def read_upload(file: UploadFile, max_bytes: int = None) -> Document:
+    """Read an UploadFile into a Document, rejecting anything above max_bytes with 413."""
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    chunks, total = [], 0
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise _too_large(max_bytes)
+        chunks.append(chunk)
+
+    return Document(b"".join(chunks), file.filename or "upload")
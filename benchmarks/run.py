@@ -0,0 +1,324 @@
+"""
+benchmarks/run.py
+Reproducible throughput / latency benchmark for the document pipeline.
+- Generates a synthetic corpus (benchmarks.synthetic), so runs are comparable.
+- "services": calls each service function in turn on every document
+  (one process, sequential) and times it.
+- "endpoint": posts every document to /analyze_document/ in-process
+  (TestClient, result cache and document store off) with --concurrency clients in parallel.
+- Writes docs/sec, per-stage p50/p95/p99, peak RSS and field accuracy (fields
+  found vs. fields extracted from the rendered ground-truth text) as JSON,
+  and compares against a stored baseline; exits with status 1 on a regression.
+
+    python -m benchmarks.run --pages 1 3 --copies 2 --output bench.json
+    python -m benchmarks.run --save-baseline          # refresh benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import FORMS, KINDS, generate_corpus
+from services.document import Document
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MODES = ("services", "endpoint")
+# Stages faster than this are too noisy to flag (seconds)
+NOISE_FLOOR_SECONDS = 0.002
+# Field accuracy may drop by at most this much (absolute) before it is a regression
+ACCURACY_TOLERANCE = 0.01
+
+
+# ---------------------------------------------------------------------
+# 📊 Statistics
+# ---------------------------------------------------------------------
+def percentile(sorted_values, q: float) -> float:
+    """Exact q-quantile with linear interpolation between closest ranks."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def summarize(samples: dict) -> dict:
+    """{stage: [seconds, ...]} -> {stage: {"count", "mean", "p50", "p95", "p99"}}."""
+    out = {}
+    for stage, values in sorted(samples.items()):
+        values = sorted(values)
+        out[stage] = {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 6),
+            **{f"p{int(q * 100)}": round(percentile(values, q), 6) for q in (0.5, 0.95, 0.99)},
+        }
+    return out
+
+
+def peak_rss_mb() -> dict:
+    """High-water resident set size of this process and of its (reaped) children."""
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+class FieldScore:
+    """Fields that match what the rules extract from the ground-truth text."""
+
+    def __init__(self):
+        self.matched = 0
+        self.total = 0
+
+    def add(self, truth_text: str, fields: dict):
+        if truth_text is None:
+            return
+        from services.ocr import detect_document_type, extract_key_fields
+        expected = extract_key_fields(detect_document_type(truth_text), truth_text)
+        for name, value in expected.items():
+            if value in (None, "", []):
+                continue
+            got = (fields or {}).get(name)
+            self.total += 1
+            self.matched += set(value) == set(got or []) if isinstance(value, list) else got == value
+
+    @property
+    def accuracy(self):
+        return round(self.matched / self.total, 4) if self.total else None
+
+
+# ---------------------------------------------------------------------
+# ⏱️ Benchmarks
+# ---------------------------------------------------------------------
+def _fresh(doc: Document) -> Document:
+    """Same bytes, empty memos: every run pays for rasterization and OCR again."""
+    return Document(doc.data, doc.filename)
+
+
+def bench_services(corpus) -> dict:
+    """Time each service function separately on every document (sequential)."""
+    from services.ocr import extract_text_from_image, detect_document_type, extract_key_fields
+    from services.decision_engine import make_decision
+    from services.explainability import field_overlay
+
+    samples, errors, score = {}, [], FieldScore()
+
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        value = fn(*args)
+        samples.setdefault(stage, []).append(time.perf_counter() - started)
+        return value
+
+    # Warm-up (imports, compiled patterns, first PDF open) is not measured
+    with _fresh(corpus[0]) as doc:
+        text = extract_text_from_image(doc)
+        extract_key_fields(detect_document_type(text), text)
+
+    started = time.perf_counter()
+    for original in corpus:
+        doc = _fresh(original)
+        try:
+            doc_started = time.perf_counter()
+            text = timed("ocr", extract_text_from_image, doc)
+            doc_type = timed("classify", detect_document_type, text)
+            fields = timed("extract", extract_key_fields, doc_type, text)
+            timed("decide", make_decision, doc_type, fields)
+            timed("explain", field_overlay, doc, fields)
+            samples.setdefault("total", []).append(time.perf_counter() - doc_started)
+            for name, seconds in doc.timings.items():  # sub-steps (ocr.tesseract, ...)
+                samples.setdefault(name, []).append(seconds)
+        except Exception as e:
+            errors.append({"file": doc.filename, "error": str(e)})
+            continue
+        finally:
+            doc.close()
+        score.add(getattr(original, "truth_text", None), fields)
+    return _mode_report(corpus, samples, errors, time.perf_counter() - started, score)
+
+
+def _without_document_store():
+    """Pool worker initializer: every run must pay for OCR, never reuse text stored by an earlier run."""
+    from services.document_store import document_store
+    document_store.enabled = False
+
+
+def bench_endpoint(corpus, workers: int, executor: str, concurrency: int = None) -> dict:
+    """POST every document to /analyze_document/ through the ASGI app, in-process."""
+    from fastapi.testclient import TestClient
+    import api.main as main
+    from services.pool import WorkerPool
+    from services.document_store import document_store
+
+    pool = WorkerPool(max_workers=workers, max_pending=len(corpus), kind=executor,
+                      initializer=_without_document_store)
+    saved = main.pipeline_pool, main.RESULT_CACHE_ENABLED, document_store.enabled
+    main.pipeline_pool, main.RESULT_CACHE_ENABLED, document_store.enabled = pool, False, False
+    client = TestClient(main.app)  # no lifespan: the job runner stays off
+    samples, errors, score = {}, [], FieldScore()
+
+    def post(doc):
+        started = time.perf_counter()
+        res = client.post("/analyze_document/?timings=true",
+                          files={"file": (doc.filename, doc.data, "application/octet-stream")})
+        return doc, res, time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        post(corpus[0])  # warm-up: starts the pool workers, not measured
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency or workers)) as clients:
+            for doc, res, latency in clients.map(post, corpus):
+                if res.status_code != 200:
+                    errors.append({"file": doc.filename, "error": f"HTTP {res.status_code}: {res.text[:200]}"})
+                    continue
+                body = res.json()
+                samples.setdefault("request", []).append(latency)
+                for name, seconds in (body.get("timings") or {}).items():
+                    samples.setdefault(name, []).append(seconds)
+                score.add(getattr(doc, "truth_text", None), body.get("fields_extracted"))
+    finally:
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+        main.pipeline_pool, main.RESULT_CACHE_ENABLED, document_store.enabled = saved
+    return _mode_report(corpus, samples, errors, elapsed, score)
+
+
+def _mode_report(corpus, samples, errors, elapsed, score: FieldScore) -> dict:
+    done = len(corpus) - len(errors)
+    return {
+        "documents": len(corpus),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(done / elapsed, 4) if elapsed else 0.0,
+        "stages": summarize(samples),
+        "peak_rss_mb": peak_rss_mb(),
+        "field_accuracy": score.accuracy,
+    }
+
+
+# ---------------------------------------------------------------------
+# 📏 Baseline comparison
+# ---------------------------------------------------------------------
+def compare(report: dict, baseline: dict, tolerance: float) -> dict:
+    """
+    Flag metrics that got worse than the baseline by more than `tolerance`
+    (a fraction): lower docs/sec, higher stage p95, higher peak RSS; and any
+    field accuracy drop beyond ACCURACY_TOLERANCE (absolute).
+    """
+    regressions, improvements = [], []
+
+    def check(metric, old, new, higher_is_worse=True):
+        if not old or new is None:
+            return
+        change = (new - old) / old
+        worse = change > tolerance if higher_is_worse else change < -tolerance
+        better = change < -tolerance if higher_is_worse else change > tolerance
+        entry = {"metric": metric, "baseline": old, "current": new, "change": round(change, 4)}
+        if worse:
+            regressions.append(entry)
+        elif better:
+            improvements.append(entry)
+
+    for mode, current in report["modes"].items():
+        old = baseline.get("modes", {}).get(mode)
+        if not old:
+            continue
+        check(f"{mode}.docs_per_sec", old["docs_per_sec"], current["docs_per_sec"], higher_is_worse=False)
+        for stage, stats in current["stages"].items():
+            old_p95 = old["stages"].get(stage, {}).get("p95")
+            if old_p95 is not None and max(old_p95, stats["p95"]) >= NOISE_FLOOR_SECONDS:
+                check(f"{mode}.{stage}.p95", old_p95, stats["p95"])
+        check(f"{mode}.peak_rss_mb.self", old["peak_rss_mb"].get("self"), current["peak_rss_mb"].get("self"))
+        old_acc, new_acc = old.get("field_accuracy"), current.get("field_accuracy")
+        if old_acc is not None and new_acc is not None and old_acc - new_acc > ACCURACY_TOLERANCE:
+            regressions.append({"metric": f"{mode}.field_accuracy", "baseline": old_acc,
+                                "current": new_acc, "change": round(new_acc - old_acc, 4)})
+
+    mismatch = baseline.get("corpus") != report["corpus"]
+    return {"tolerance": tolerance, "corpus_mismatch": mismatch,
+            "regressions": regressions, "improvements": improvements}
+
+
+# ---------------------------------------------------------------------
+# 🖥️ Command line
+# ---------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the document pipeline on a synthetic corpus.")
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+    parser.add_argument("--forms", nargs="+", default=list(FORMS), choices=FORMS)
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 3], help="Page counts per document")
+    parser.add_argument("--copies", type=int, default=2, help="Distinct documents per kind/form/page count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Pool workers (endpoint mode)")
+    parser.add_argument("--executor", default="process", choices=("process", "thread"))
+    parser.add_argument("--concurrency", type=int, default=None, help="Parallel clients (default: --workers)")
+    parser.add_argument("--output", default="-", help="JSON report file ('-' for stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    corpus = generate_corpus(args.kinds, args.forms, tuple(args.pages), args.copies, args.seed)
+    report = {
+        "corpus": {"kinds": args.kinds, "forms": args.forms, "pages": args.pages,
+                   "copies": args.copies, "seed": args.seed, "documents": len(corpus)},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "workers": args.workers, "executor": args.executor},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "modes": {},
+    }
+
+    # Service log prints go to stderr so a JSON report on stdout stays parseable
+    with contextlib.redirect_stdout(sys.stderr):
+        from services.pipeline import PIPELINE_VERSION
+        report["pipeline_version"] = PIPELINE_VERSION
+        if "services" in args.modes:
+            report["modes"]["services"] = bench_services(corpus)
+        if "endpoint" in args.modes:
+            report["modes"]["endpoint"] = bench_endpoint(corpus, args.workers, args.executor, args.concurrency)
+
+    status = 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"💾 Baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["comparison"] = compare(report, json.load(fh), args.tolerance)
+        for entry in report["comparison"]["regressions"]:
+            print(f"❌ {entry['metric']}: {entry['baseline']} → {entry['current']} ({entry['change']:+.0%})",
+                  file=sys.stderr)
+        if report["comparison"]["corpus_mismatch"]:
+            print("⚠️ Baseline was recorded on a different corpus; comparison is indicative only.",
+                  file=sys.stderr)
+        status = 1 if report["comparison"]["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
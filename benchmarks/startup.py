@@ -0,0 +1,180 @@
+"""
+benchmarks/startup.py
+Cold-start benchmark: import time, first-document latency and peak RSS of a
+fresh interpreter, for the API process and for a pool worker.
+Every sample runs in a new subprocess (like a spawned worker), so nothing
+imported by this script leaks into the measurement.
+
+    python -m benchmarks.startup --repeat 5 --output startup.json
+    python -m benchmarks.startup --save-baseline    # refresh benchmarks/startup_baseline.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# What each scenario imports / does in a fresh interpreter
+SCENARIOS = {
+    "api": {"module": "api.main"},
+    "worker": {"module": "services.pipeline"},
+    "worker_digital": {"module": "services.pipeline", "document": True},
+    "worker_warm": {"module": "services.pipeline", "warmup": "all"},
+}
+# Modules whose presence after startup is worth reporting
+HEAVY_MODULES = ("pytesseract", "pdf2image", "PyPDF2", "pymupdf", "fitz", "PIL.Image", "numpy",
+                 "torch", "paddleocr", "transformers", "spacy", "shap", "sklearn")
+# Differences below these are noise, not regressions
+NOISE_FLOOR = {"import_seconds": 0.01, "first_document_seconds": 0.01, "peak_rss_mb": 2.0}
+
+
+def _peak_rss_mb():
+    # VmHWM restarts at exec; ru_maxrss can carry the forking parent's peak over
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1)
+
+
+# ---------------------------------------------------------------------
+# 👶 Child side (fresh interpreter)
+# ---------------------------------------------------------------------
+def _child(scenario: str, document_path: str = None):
+    spec = SCENARIOS[scenario]
+    report_to, sys.stdout = sys.stdout, sys.stderr  # keep service prints out of the JSON
+    result = {}
+
+    started = time.perf_counter()
+    importlib.import_module(spec["module"])
+    result["import_seconds"] = time.perf_counter() - started
+
+    if spec.get("warmup"):
+        from services.backends import backends
+        started = time.perf_counter()
+        backends.warm_up(spec["warmup"])
+        result["warmup_seconds"] = time.perf_counter() - started
+
+    if spec.get("document") and document_path:
+        from services.document import Document
+        from services.pipeline import analyze_file
+        started = time.perf_counter()
+        analyze_file(Document.from_path(document_path))
+        result["first_document_seconds"] = time.perf_counter() - started
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["heavy_modules"] = sorted(m for m in HEAVY_MODULES if m in sys.modules)
+    report_to.write(json.dumps(result) + "\n")
+
+
+# ---------------------------------------------------------------------
+# 🧪 Parent side
+# ---------------------------------------------------------------------
+def measure(scenario: str, repeat: int = 3, document_path: str = None) -> dict:
+    """Run a scenario `repeat` times in fresh interpreters; median of every metric."""
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+           "DOCUMENT_STORE_ENABLED": "0"}  # every repeat pays for its first document
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="idu_startup_") as cwd:
+        os.makedirs(os.path.join(cwd, ".cache", "outputs"))  # api.main serves it; images land here
+        for _ in range(max(1, repeat)):
+            cmd = [sys.executable, "-m", "benchmarks.startup", "--child", scenario]
+            if document_path:
+                cmd += ["--document", document_path]
+            out = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                raise RuntimeError(f"{scenario} failed:\n{out.stderr[-2000:]}")
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    summary = {"runs": len(samples), "heavy_modules": samples[-1]["heavy_modules"]}
+    for metric in samples[0]:
+        values = sorted(s[metric] for s in samples if isinstance(s.get(metric), (int, float)))
+        if values:
+            summary[metric] = round(values[len(values) // 2], 4)
+    return summary
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that grew by more than `tolerance` (and more than the noise floor)."""
+    regressions = []
+    for scenario, current in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(scenario, {})
+        for metric, floor in NOISE_FLOOR.items():
+            before, after = old.get(metric), current.get(metric)
+            if before and after is not None and after - before > max(floor, before * tolerance):
+                regressions.append({"metric": f"{scenario}.{metric}", "baseline": before,
+                                    "current": after, "change": round((after - before) / before, 4)})
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and RSS.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per scenario (median)")
+    parser.add_argument("--output", default="-", help="JSON report file ('-' for stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--document", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        _child(args.child, args.document)
+        return 0
+
+    from benchmarks.synthetic import make_document
+    report = {"python": sys.version.split()[0], "platform": sys.platform,
+              "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "scenarios": {}}
+    with tempfile.TemporaryDirectory(prefix="idu_startup_") as tmp:
+        document_path = os.path.join(tmp, "invoice.pdf")
+        with open(document_path, "wb") as fh:
+            fh.write(make_document("invoice", "digital").data)
+        for scenario in args.scenarios:
+            report["scenarios"][scenario] = measure(scenario, args.repeat, document_path)
+
+    status = 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"💾 Baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["regressions"] = compare(report, json.load(fh), args.tolerance)
+        for entry in report["regressions"]:
+            print(f"❌ {entry['metric']}: {entry['baseline']} → {entry['current']} ({entry['change']:+.0%})",
+                  file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+benchmarks/synthetic.py
+Deterministic synthetic documents for benchmarking (nothing is downloaded).
+- Invoices, resumes and reports with realistic field patterns.
+- "digital": PDF with a native text layer (PyMuPDF).
+- "scanned": image-only PDF (every page rendered to a noisy, slightly
+  rotated bitmap), so every page goes through OCR.
+- "image": PNG of the first scanned page (the single-image upload path).
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from services.backends import backends
+from services.document import Document
+
+KINDS = ("invoice", "resume", "report")
+FORMS = ("digital", "scanned", "image")
+
+SCAN_DPI = 150
+_PAGE_INCHES = (8.5, 11)
+_LINES_PER_PAGE = 40
+
+_NAMES = ["Asha Verma", "Rahul Mehta", "Priya Nair", "John Carter", "Maria Lopez", "Wei Chen"]
+_SKILLS = ["Python", "Java", "SQL", "Machine Learning", "Deep Learning", "Django", "Flask",
+           "TensorFlow", "PyTorch", "NLP", "AI", "Data Science", "Excel", "Communication"]
+_WORDS = ("analysis quarterly revenue growth customer retention pipeline delivery review "
+          "budget forecast milestone operations compliance region market segment risk").split()
+
+
+# ---------------------------------------------------------------------
+# 📝 Text content
+# ---------------------------------------------------------------------
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _date(rng: random.Random) -> str:
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"
+
+
+def _invoice_pages(rng, pages):
+    header = [
+        "TAX INVOICE",
+        f"Invoice No: INV-{rng.randint(10000, 99999)}",
+        f"Date: {_date(rng)}",
+        f"Billed To: {rng.choice(_NAMES)}",
+        "",
+    ]
+    items = [f"{i + 1:>3}  Item {rng.choice(_WORDS)}  qty {rng.randint(1, 9)}  {rng.randint(50, 5000)}.00"
+             for i in range(pages * _LINES_PER_PAGE - len(header) - 2)]
+    footer = ["", f"Total Amount: {rng.randint(100, 90000):,}.{rng.randint(0, 99):02d}"]
+    return _paginate(header + items + footer, pages)
+
+
+def _resume_pages(rng, pages):
+    name = rng.choice(_NAMES)
+    header = [
+        "RESUME",
+        f"Name: {name}",
+        f"Email: {name.split()[0].lower()}.{rng.randint(1, 99)}@example.com",
+        f"Phone: 9{rng.randint(100000000, 999999999)}",
+        f"Skills: {', '.join(rng.sample(_SKILLS, 5))}",
+        "",
+        "Experience",
+    ]
+    body = [f"- {_sentence(rng, 10)}" for _ in range(pages * _LINES_PER_PAGE - len(header) - 2)]
+    return _paginate(header + body + ["", "Education: B.Tech, Computer Science"], pages)
+
+
+def _report_pages(rng, pages):
+    header = [
+        f"Report Title: {rng.choice(_WORDS).capitalize()} {rng.choice(_WORDS)} review",
+        f"Date: {_date(rng)}",
+        f"Summary: {_sentence(rng, 14)}",
+        "",
+        "Findings",
+    ]
+    body = [_sentence(rng, 11) for _ in range(pages * _LINES_PER_PAGE - len(header))]
+    return _paginate(header + body, pages)
+
+
+_CONTENT = {"invoice": _invoice_pages, "resume": _resume_pages, "report": _report_pages}
+
+
+def _paginate(lines, pages):
+    return [lines[i * _LINES_PER_PAGE:(i + 1) * _LINES_PER_PAGE] for i in range(pages)]
+
+
+def document_pages(kind: str, pages: int = 1, seed: int = 0):
+    """Lines of text per page for one synthetic document."""
+    if kind not in _CONTENT:
+        raise ValueError(f"Unknown document kind: {kind}")
+    return _CONTENT[kind](random.Random(f"{kind}:{pages}:{seed}"), max(1, pages))
+
+
+# ---------------------------------------------------------------------
+# 🖨️ Rendering
+# ---------------------------------------------------------------------
+def digital_pdf(page_lines) -> bytes:
+    """PDF with a real text layer (one text block per page)."""
+    pdf = backends.get("pdf", "pymupdf").open()
+    for lines in page_lines:
+        page = pdf.new_page(width=_PAGE_INCHES[0] * 72, height=_PAGE_INCHES[1] * 72)
+        page.insert_text((54, 60), "\n".join(lines), fontsize=10)
+    pdf.set_metadata({})  # no creation date: same input, same bytes
+    data = pdf.tobytes(no_new_id=True)
+    pdf.close()
+    return data
+
+
+def scanned_page(lines, seed: int = 0, dpi: int = SCAN_DPI) -> Image.Image:
+    """Render one page like a grayscale office scan: slight skew, blur and speckles."""
+    rng = random.Random(seed)
+    width, height = int(_PAGE_INCHES[0] * dpi), int(_PAGE_INCHES[1] * dpi)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=max(10, dpi // 7))
+    margin, step = dpi * 3 // 4, int(dpi * 0.22)
+    for row, line in enumerate(lines):
+        draw.text((margin, margin + row * step), line, fill=rng.randint(0, 40), font=font)
+    for _ in range(width * height // 4000):
+        draw.point((rng.randrange(width), rng.randrange(height)), fill=rng.randint(0, 160))
+    page = page.rotate(rng.uniform(-1.2, 1.2), resample=Image.BILINEAR, fillcolor=255)
+    return page.filter(ImageFilter.GaussianBlur(0.6))
+
+
+def scanned_pdf(page_lines, seed: int = 0, dpi: int = SCAN_DPI) -> bytes:
+    """Image-only PDF (no text layer), one bitmap per page."""
+    images = [scanned_page(lines, seed + i, dpi) for i, lines in enumerate(page_lines)]
+    buf = io.BytesIO()
+    images[0].save(buf, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return buf.getvalue()
+
+
+def scanned_png(page_lines, seed: int = 0, dpi: int = SCAN_DPI) -> bytes:
+    buf = io.BytesIO()
+    scanned_page(page_lines[0], seed, dpi).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_document(kind: str, form: str, pages: int = 1, seed: int = 0) -> Document:
+    """
+    One synthetic Document, e.g. make_document("invoice", "scanned", pages=3).
+    doc.truth_text holds the text that was rendered (ground truth for accuracy).
+    """
+    if form == "image":
+        pages = 1
+    page_lines = document_pages(kind, pages, seed)
+    if form == "digital":
+        data, ext = digital_pdf(page_lines), "pdf"
+    elif form == "scanned":
+        data, ext = scanned_pdf(page_lines, seed), "pdf"
+    elif form == "image":
+        data, ext = scanned_png(page_lines, seed), "png"
+    else:
+        raise ValueError(f"Unknown document form: {form}")
+    doc = Document(data, f"{kind}_{form}_{pages}p_{seed}.{ext}")
+    doc.truth_text = "\n".join(line for lines in page_lines[:1 if form == "image" else None] for line in lines)
+    return doc
+
+
+def generate_corpus(kinds=KINDS, forms=FORMS, page_counts=(1,), copies: int = 1, seed: int = 0):
+    """
+    Every kind × form × page count, `copies` distinct documents each (deterministic).
+    Images are single pages, so the "image" form is generated once per kind and copy.
+    """
+    return [
+        make_document(kind, form, pages, seed + copy)
+        for kind in kinds
+        for form in forms
+        for pages in (page_counts if form != "image" else (1,))
+        for copy in range(copies)
+    ]
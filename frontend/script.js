@@ -1,10 +1,140 @@
+// Same colors as services/explainability.py
+const FIELD_COLORS = {
+  name: 'blue', email: 'green', phone: 'purple', invoice_no: 'orange',
+  total_amount: 'red', date: 'gold', skills: 'teal', title: 'navy', summary: 'brown'
+};
+
+// Draw the field boxes of one page over `background` (an <img>, or a blank
+// page of the right proportions). Boxes are fractions of the page size, so
+// they are placed in percentages and follow the element at any size.
+function renderOverlayPage(container, background, regions) {
+  const page = document.createElement('div');
+  page.className = 'overlay-page';
+  page.appendChild(background);
+  for (const region of regions) {
+    const [x0, y0, x1, y1] = region.box;
+    const box = document.createElement('div');
+    box.className = 'overlay-box';
+    box.style.left = `${x0 * 100}%`;
+    box.style.top = `${y0 * 100}%`;
+    box.style.width = `${(x1 - x0) * 100}%`;
+    box.style.height = `${(y1 - y0) * 100}%`;
+    box.style.borderColor = FIELD_COLORS[region.field] || 'gray';
+    box.title = `${region.field}: ${region.value}`;
+    page.appendChild(box);
+  }
+  container.appendChild(page);
+}
+
+function renderOverlay(container, file, overlay) {
+  if (!overlay || !overlay.regions.length) {
+    container.innerText = "⚠️ No field positions found.";
+    return;
+  }
+  const isImage = file.type.startsWith('image/');
+  for (const size of overlay.pages) {
+    const regions = overlay.regions.filter(r => r.page === size.page);
+    let background;
+    if (isImage) {
+      // The uploaded image itself; nothing is downloaded from the server
+      background = document.createElement('img');
+      background.src = URL.createObjectURL(file);
+      background.alt = file.name;
+    } else {
+      // PDF page: a blank sheet with the page's proportions, labelled boxes
+      background = document.createElement('div');
+      background.className = 'overlay-sheet';
+      background.style.aspectRatio = `${size.width} / ${size.height}`;
+      for (const region of regions) {
+        const label = document.createElement('span');
+        label.className = 'overlay-label';
+        label.style.left = `${region.box[0] * 100}%`;
+        label.style.top = `${region.box[1] * 100}%`;
+        label.style.color = FIELD_COLORS[region.field] || 'gray';
+        label.innerText = region.value;
+        background.appendChild(label);
+      }
+    }
+    const caption = document.createElement('p');
+    caption.innerText = `📄 Page ${size.page}`;
+    container.appendChild(caption);
+    renderOverlayPage(container, background, regions);
+  }
+}
+
+// Read a text/event-stream response body as it arrives and call
+// onEvent(name, data) once per event (EventSource cannot POST a file).
+async function readEvents(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let name = 'message';
+      const data = [];
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) name = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+      }
+      if (data.length) onEvent(name, JSON.parse(data.join('\n')));
+    }
+  }
+}
+
+// One block of text per page, kept in page order whatever order they arrive in
+function renderPageText(container, page, text, note) {
+  const block = document.createElement('div');
+  block.className = 'page-text';
+  block.dataset.page = page;
+  block.innerText = `📄 Page ${page}${note ? ` (${note})` : ''}\n${text || '(no text)'}`;
+  const next = [...container.children].find(el => Number(el.dataset.page) > page);
+  container.insertBefore(block, next || null);
+}
+
+function renderDecision(decisionDiv, data) {
+  if (!data.decision) {
+    decisionDiv.innerText = "⚠️ No decision generated.";
+    return;
+  }
+  const confidencePercent = data.confidence_score
+    ? (data.confidence_score * 100).toFixed(1)
+    : "N/A";
+  decisionDiv.innerText = `🧠 Decision: ${data.decision} (Confidence: ${confidencePercent}%)`;
+}
+
+function renderServerImage(imageContainer, path) {
+  const img = document.createElement('img');
+  // Build full image URL
+  img.src = `http://127.0.0.1:8000${path}`;
+  img.alt = 'Explainability Visualization';
+  img.style.maxWidth = '80%';
+  img.style.border = '1px solid #ccc';
+  img.style.borderRadius = '6px';
+  img.style.marginTop = '10px';
+  img.onload = () => console.log("🖼️ Image loaded successfully!");
+  img.onerror = () => {
+    console.error("❌ Could not load explainability image:", img.src);
+    imageContainer.innerText = "⚠️ Failed to load visualization image.";
+  };
+  imageContainer.appendChild(img);
+}
+
 document.getElementById('send').onclick = async () => {
   const input = document.getElementById('file');
+  const loading = document.getElementById('loading');
+  const pagesDiv = document.getElementById('pages');
   const resultDiv = document.getElementById('result');
   const decisionDiv = document.getElementById('decision');
   const imageContainer = document.getElementById('imageContainer');
 
   // Reset previous outputs
+  pagesDiv.innerHTML = '';
   resultDiv.innerText = '';
   decisionDiv.innerText = '';
   imageContainer.innerHTML = '';
@@ -20,64 +150,85 @@ document.getElementById('send').onclick = async () => {
 
   resultDiv.innerText = '⚙️ Processing... Please wait...';
   resultDiv.style.background = '#fff8e1';
+  loading.innerText = '⏫ Uploading...';
+  loading.classList.remove('hidden');
 
-  try {
-    // --- Call FastAPI backend ---
-    const res = await fetch("http://127.0.0.1:8000/analyze_document/", {
-      method: "POST",
-      body: form
-    });
+  // Server-rendered PNG only when asked for; the JSON overlay always comes back
+  const explainImage = document.getElementById('explainImage').checked;
+  let documentType = '';
 
-    const text = await res.text();
-    console.log("📥 Raw API Response:", text);
-
-    try {
-      const data = JSON.parse(text);
-      console.log("✅ Parsed JSON:", data);
-
-      // --- Display extracted text ---
-      resultDiv.innerText = JSON.stringify(data.extracted_text, null, 2);
+  // --- Render each partial result as the server sends it ---
+  const handlers = {
+    stage: data => {
+      if (data.state === 'running') loading.innerText = `⚙️ ${data.stage}...`;
+    },
+    page: data => {
+      const note = `${data.strategy === 'text_layer' ? 'text layer' : 'OCR'}, ${data.page} of ${data.page_count}`;
+      renderPageText(pagesDiv, data.page, data.text, note);
+    },
+    text: data => {
+      if (!pagesDiv.children.length) renderPageText(pagesDiv, 1, data.text, 'stored text');
+    },
+    document_type: data => {
+      documentType = data.document_type;
+      resultDiv.innerText = `🗂️ Document type: ${documentType}\n⚙️ Extracting fields...`;
+    },
+    fields: data => {
+      resultDiv.innerText = `🗂️ Document type: ${documentType}\n` + JSON.stringify(data.fields_extracted, null, 2);
       resultDiv.style.background = '#eaffea';
-
-      // --- Decision output ---
-      if (data.decision) {
-        const confidencePercent = data.confidence
-          ? (data.confidence * 100).toFixed(1)
-          : "N/A";
-        decisionDiv.innerText = `🧠 Decision: ${data.decision} (Confidence: ${confidencePercent}%)`;
+    },
+    decision: data => renderDecision(decisionDiv, data),
+    overlay: data => {
+      // --- Show explainability: server PNG if requested, else client-side overlay ---
+      imageContainer.innerHTML = '';
+      if (explainImage && data.explainability_map && data.explainability_map !== "N/A") {
+        renderServerImage(imageContainer, data.explainability_map);
       } else {
-        decisionDiv.innerText = "⚠️ No decision generated.";
+        renderOverlay(imageContainer, file, data.overlay);
       }
-
-      // --- Show explainability image ---
-      if (data.explainability_map && data.explainability_map !== "N/A") {
-        const img = document.createElement('img');
-        // Build full image URL
-        img.src = `http://127.0.0.1:8000${data.explainability_map}`;
-        img.alt = 'Explainability Visualization';
-        img.style.maxWidth = '80%';
-        img.style.border = '1px solid #ccc';
-        img.style.borderRadius = '6px';
-        img.style.marginTop = '10px';
-        img.onload = () => console.log("🖼️ Image loaded successfully!");
-        img.onerror = () => {
-          console.error("❌ Could not load explainability image:", img.src);
-          imageContainer.innerText = "⚠️ Failed to load visualization image.";
-        };
-        imageContainer.appendChild(img);
-      } else {
-        imageContainer.innerText = "⚠️ No explainability visualization available.";
+    },
+    result: data => {
+      console.log("✅ Final result:", data);
+      const match = data.near_duplicate;
+      if (match) {
+        const similar = (match.similarity * 100).toFixed(0);
+        decisionDiv.innerText += `\n♻️ Near duplicate of ${match.filename} (${similar}% similar)`
+          + (match.reused && match.reused.length ? `, reused: ${match.reused.join(', ')}` : '');
       }
+      loading.classList.add('hidden');
+    },
+    error: data => {
+      resultDiv.innerText = "❌ Error: " + data.detail;
+      resultDiv.style.background = '#ffe6e6';
+      loading.classList.add('hidden');
+    },
+  };
+
+  try {
+    // --- Call FastAPI backend (Server-Sent Events) ---
+    const res = await fetch(`http://127.0.0.1:8000/analyze_document/stream?explain_image=${explainImage}`, {
+      method: "POST",
+      body: form
+    });
 
-    } catch (jsonErr) {
-      console.error("❌ JSON parse error:", jsonErr);
-      resultDiv.innerText = "💬 Non-JSON response:\n" + text;
-      resultDiv.style.background = '#fff7e6';
+    if (!res.ok) {
+      // Validation errors, 413 (too large), 503 (busy) come back as plain JSON
+      const text = await res.text();
+      let detail = text;
+      try { detail = JSON.parse(text).detail; } catch (jsonErr) { /* not JSON */ }
+      throw new Error(typeof detail === 'string' ? detail : JSON.stringify(detail));
     }
 
+    await readEvents(res, (name, data) => {
+      console.log(`📥 ${name}`, data);
+      if (handlers[name]) handlers[name](data);
+    });
+
   } catch (err) {
     console.error("❌ Request failed:", err);
     resultDiv.innerText = "❌ Error: " + err.message;
     resultDiv.style.background = '#ffe6e6';
+  } finally {
+    loading.classList.add('hidden');
   }
 };
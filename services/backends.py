@@ -0,0 +1,212 @@
+"""
+services/backends.py
+Registry of the heavy, optional backends (OCR engines, PDF libraries,
+rasterizers, field extractors, the document classifier, the compiled
+decision rules).
+- Nothing heavy is imported when the application starts: each backend is a
+  loader that runs on first use (once per process, thread-safe).
+- A worker that only ever sees digital PDFs never imports Tesseract or
+  poppler bindings, so it starts faster and stays smaller.
+- warm_up() loads a chosen set ahead of time (API startup and pool worker
+  initializer) when BACKEND_WARMUP is set, e.g. "ocr:tesseract,pdf:pymupdf"
+  or "all", so the first request does not pay for the imports.
+"""
+
+import importlib
+import importlib.util
+import os
+import threading
+import time
+
+from services.ocr_engines import OCR_ENGINE
+
+# ✅ Backends loaded at startup ("" = none, "all" = every registered backend)
+BACKEND_WARMUP = os.getenv("BACKEND_WARMUP", "")
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when a backend's package is not installed or its loader failed (cached either way)."""
+
+
+class _Backend:
+    def __init__(self, kind: str, name: str, loader, requires: str = None):
+        self.kind = kind
+        self.name = name
+        self.loader = loader
+        self.requires = requires
+        self.value = None
+        self.error = None
+        self.loaded = False
+        self.load_seconds = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    started = time.perf_counter()
+                    try:
+                        self.value = self.loader()
+                    except ImportError as e:
+                        self.error = f"{self.kind}:{self.name} is not installed ({e})"
+                    except Exception as e:
+                        self.error = f"{self.kind}:{self.name} failed to load ({e})"
+                        print(f"⚠️ {self.error}")
+                    self.load_seconds = time.perf_counter() - started
+                    self.loaded = True
+        if self.error:
+            raise BackendUnavailable(self.error)
+        return self.value
+
+
+class BackendRegistry:
+    """Named loaders grouped by kind; the first one registered is the kind's default."""
+
+    def __init__(self):
+        self._backends = {}
+        self._defaults = {}
+
+    def register(self, kind: str, name: str, loader, default: bool = False, requires: str = None):
+        """requires: top-level package checked by available() without importing it."""
+        self._backends[(kind, name)] = _Backend(kind, name, loader, requires)
+        if default or kind not in self._defaults:
+            self._defaults[kind] = name
+
+    def names(self, kind: str) -> list:
+        return [name for k, name in self._backends if k == kind]
+
+    def default(self, kind: str) -> str:
+        return self._defaults[kind]
+
+    def get(self, kind: str, name: str = None):
+        """The loaded backend (imported on first call); raises BackendUnavailable."""
+        name = name or self._defaults.get(kind)
+        backend = self._backends.get((kind, name))
+        if backend is None:
+            raise BackendUnavailable(f"Unknown {kind} backend: {name}")
+        return backend.load()
+
+    def optional(self, kind: str, name: str = None):
+        """Like get(), but None when the backend is not installed."""
+        try:
+            return self.get(kind, name)
+        except BackendUnavailable:
+            return None
+
+    def available(self, kind: str, name: str) -> bool:
+        """Registered and installed (checked without importing the package)."""
+        backend = self._backends.get((kind, name))
+        if backend is None or backend.error:
+            return False
+        return backend.requires is None or importlib.util.find_spec(backend.requires) is not None
+
+    def is_loaded(self, kind: str, name: str) -> bool:
+        backend = self._backends.get((kind, name))
+        return bool(backend and backend.loaded and not backend.error)
+
+    def warm_up(self, spec: str = None) -> dict:
+        """
+        Load the backends named in spec ("kind:name,..." or "all"; defaults to
+        BACKEND_WARMUP). Returns {"kind:name": load seconds or error message}.
+        Missing optional packages are reported, never raised.
+        """
+        spec = BACKEND_WARMUP if spec is None else spec
+        if spec.strip() == "all":
+            wanted = list(self._backends)
+        else:
+            wanted = [tuple(item.strip().split(":", 1)) for item in spec.split(",") if ":" in item]
+        report = {}
+        for key in wanted:
+            backend = self._backends.get(key)
+            if backend is None:
+                report[":".join(key)] = "unknown backend"
+                continue
+            try:
+                backend.load()
+                report[":".join(key)] = round(backend.load_seconds, 4)
+            except BackendUnavailable as e:
+                report[":".join(key)] = str(e)
+        return report
+
+    def status(self) -> dict:
+        """{kind: {name: {"loaded", "default", "load_seconds", "error"}}}."""
+        out = {}
+        for (kind, name), backend in self._backends.items():
+            out.setdefault(kind, {})[name] = {
+                "loaded": backend.loaded and not backend.error,
+                "default": self._defaults.get(kind) == name,
+                "load_seconds": round(backend.load_seconds, 4) if backend.load_seconds is not None else None,
+                "error": backend.error,
+            }
+        return out
+
+
+# ---------------------------------------------------------------------
+# 📦 Loaders (imports happen only inside these functions)
+# ---------------------------------------------------------------------
+def _load_pymupdf():
+    try:
+        return importlib.import_module("pymupdf")
+    except ImportError:
+        return importlib.import_module("fitz")
+
+
+def _load_pypdf2():
+    from PyPDF2 import PdfReader
+    return PdfReader
+
+
+def _load_pdf2image():
+    return importlib.import_module("pdf2image")
+
+
+def _load_tesseract():
+    from services.ocr_engines import TesseractEngine
+    return TesseractEngine()
+
+
+def _load_paddle():
+    from services.ocr_engines import PaddleEngine
+    return PaddleEngine()
+
+
+def _load_rules():
+    return importlib.import_module("services.fields")
+
+
+def _load_classifier():
+    from services.classifier import load_classifier
+    return load_classifier()  # None without a trained model: keyword rules classify
+
+
+def _load_field_model():
+    address = os.environ.get("FIELD_MODEL_SERVER")
+    if address:  # the host's shared model server (services/model_server.py)
+        from services.model_server import connect
+        return connect(address)
+    from services.field_model import load_field_model
+    return load_field_model()  # None without a checkpoint: regex rules extract
+
+
+def _load_decision_rules():
+    from services.decision_rules import compile_rules
+    return compile_rules()
+
+
+# ✅ Shared registry (one per process)
+backends = BackendRegistry()
+backends.register("pdf", "pymupdf", _load_pymupdf)
+backends.register("pdf", "pypdf2", _load_pypdf2)
+backends.register("raster", "pdf2image", _load_pdf2image)
+backends.register("ocr", "tesseract", _load_tesseract, default=OCR_ENGINE == "tesseract", requires="pytesseract")
+backends.register("ocr", "paddle", _load_paddle, default=OCR_ENGINE == "paddle", requires="paddleocr")
+backends.register("extraction", "rules", _load_rules)
+backends.register("extraction", "transformer", _load_field_model, requires="transformers")
+backends.register("classifier", "linear", _load_classifier)
+backends.register("decision", "rules", _load_decision_rules)
+
+
+def warm_up_worker():
+    """Pool worker initializer: preload BACKEND_WARMUP in every new worker."""
+    if BACKEND_WARMUP:
+        backends.warm_up()
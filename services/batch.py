@@ -0,0 +1,167 @@
+"""
+services/batch.py
+Bulk document analysis on the worker pool.
+- Feeds documents lazily (directory walk, zip members, uploads) into the pool.
+- Yields one result per document as soon as it finishes (completion order).
+- Also runnable from the command line:
+
+    python -m services.batch invoices/ --workers 8 --output results.ndjson
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from services.backends import warm_up_worker
+from services.cache import content_key
+from services.document import Document
+from services.model_server import model_server
+from services.pipeline import analyze_file, result_version
+from services.pool import WorkerPool
+
+SUPPORTED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+MAX_BATCH_FILE_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+
+# ---------------------------------------------------------------------
+# 📂 Document sources
+# ---------------------------------------------------------------------
+def iter_directory(root: str, recursive: bool = True):
+    """Yield a Document for every supported file under root, in sorted order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                doc = Document.from_path(path)
+                doc.filename = os.path.relpath(path, root)
+                yield doc
+        if not recursive:
+            break
+
+
+def iter_zip(fileobj, max_member_bytes: int = None):
+    """
+    Yield a Document for every supported member of a zip archive.
+    Members are decompressed one at a time; oversized members are skipped.
+    """
+    max_member_bytes = max_member_bytes or MAX_BATCH_FILE_BYTES
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            if info.file_size > max_member_bytes:
+                print(f"⚠️ Skipping {info.filename}: larger than {max_member_bytes} bytes")
+                continue
+            doc = Document(archive.read(info))
+            doc.filename = info.filename  # keep the path inside the archive
+            yield doc
+
+
+# ---------------------------------------------------------------------
+# ⚙️ Execution
+# ---------------------------------------------------------------------
+def analyze_one(doc, ocr_engine: str = None) -> dict:
+    """Worker-side wrapper: never raises, so one bad file can't stop a batch."""
+    try:
+        return {"file": doc.filename, "sha256": doc.sha256, "status": "ok",
+                **analyze_file(doc, ocr_engine=ocr_engine)}
+    except Exception as e:
+        return {"file": doc.filename, "sha256": doc.sha256, "status": "error", "error": str(e)}
+
+
+def iter_results(documents, pool: WorkerPool, window: int = None, cache=None, ocr_engine: str = None):
+    """
+    Run analyze_one over documents on pool and yield results as they complete.
+    At most `window` documents are in flight (default: one per worker), which
+    keeps every core busy while leaving the pool's queue slots free for
+    interactive requests. When a ResultCache is given, repeats are answered
+    from it and new results are stored in it.
+    """
+    window = max(1, window or pool.max_workers)
+    version = result_version(ocr_engine)
+    pending = set()
+
+    def drain():
+        nonlocal pending
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if cache is not None and result["status"] == "ok":
+                cache.put(content_key(result["sha256"], version), _response_part(result))
+            yield result
+
+    for doc in documents:
+        while len(pending) >= window:
+            yield from drain()
+        if cache is not None:
+            cached = cache.get(content_key(doc.sha256, version))
+            if cached is not None:
+                yield {"file": doc.filename, "sha256": doc.sha256, "status": "ok", **cached}
+                continue
+        pending.add(pool.submit(analyze_one, doc, ocr_engine, block=True))
+
+    while pending:
+        yield from drain()
+
+
+def _response_part(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in ("file", "sha256", "status", "timings")}
+
+
+# ---------------------------------------------------------------------
+# 🖥️ Command line
+# ---------------------------------------------------------------------
+def _init_worker():
+    """Worker initializer: keep service log prints out of the NDJSON on stdout, then preload BACKEND_WARMUP."""
+    sys.stdout = sys.stderr
+    warm_up_worker()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every document in a directory or zip file.")
+    parser.add_argument("source", help="Directory (walked recursively) or .zip archive")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--output", default="-", help="NDJSON output file ('-' for stdout)")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--ocr-engine", default=None, help="OCR backend for scanned pages (tesseract, paddle)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.path.isdir(args.source):
+        documents = iter_directory(args.source, recursive=not args.no_recursive)
+    else:
+        documents = iter_zip(args.source)
+
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the NDJSON
+        model_server.start()
+    pool = WorkerPool(max_workers=args.workers, max_pending=args.workers, kind="process",
+                      initializer=_init_worker)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started, count, failed = time.perf_counter(), 0, 0
+    try:
+        for result in iter_results(documents, pool, ocr_engine=args.ocr_engine):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            count += 1
+            failed += result["status"] != "ok"
+    finally:
+        pool.shutdown()
+        model_server.shutdown()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(f"✅ {count} documents ({failed} failed) in {elapsed:.1f}s — {rate:.2f} docs/sec", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
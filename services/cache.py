@@ -0,0 +1,179 @@
+"""
+services/cache.py
+Content-addressed cache for analysis results.
+- Key = SHA-256 of the uploaded bytes + pipeline version string.
+- Tier 1: in-memory LRU (per API process).
+- Tier 2: JSON files on disk, evicted by TTL and total size (oldest first).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ✅ Cache configuration (override through environment variables)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") != "0"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(".cache", "results"))
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "256"))
+RESULT_CACHE_DISK_BYTES = int(os.getenv("RESULT_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def content_key(digest: str, version: str) -> str:
+    """Build a filesystem-safe cache key from a content digest and pipeline version."""
+    return f"{digest}-{re.sub(r'[^A-Za-z0-9_.]', '_', version)}"
+
+
+class ResultCache:
+    """Two-tier (memory LRU + disk) cache of JSON-serializable pipeline results."""
+
+    def __init__(self, directory: str = None, memory_items: int = None,
+                 max_disk_bytes: int = None, ttl_seconds: int = None):
+        self.directory = directory or RESULT_CACHE_DIR
+        self.memory_items = RESULT_CACHE_MEMORY_ITEMS if memory_items is None else memory_items
+        self.max_disk_bytes = RESULT_CACHE_DISK_BYTES if max_disk_bytes is None else max_disk_bytes
+        self.ttl_seconds = RESULT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # computed lazily from the directory
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # -----------------------------------------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, value: dict):
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # -----------------------------------------------------------------
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if self._expired(stat.st_mtime, now):
+                self._remove(path, stat.st_size)
+                value = None
+            else:
+                with open(path, "r", encoding="utf-8") as fh:
+                    value = json.load(fh)
+                os.utime(path, None)  # refresh recency for LRU eviction
+        except (OSError, ValueError):
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, now, value)
+        return value
+
+    def put(self, key: str, value: dict):
+        """Store value in both tiers, then enforce the disk size budget."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.counters["stores"] += 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(value, fh)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_bytes()
+            else:
+                self._disk_bytes += size
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self.evict()
+
+    # -----------------------------------------------------------------
+    def _entries(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, os.path.join(self.directory, name)))
+        return entries
+
+    def _scan_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, path: str, size: int):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.counters["evictions"] += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes = max(0, self._disk_bytes - size)
+
+    def evict(self):
+        """Drop expired disk entries, then the least recently used until under budget."""
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if self._expired(mtime, now) or total > self.max_disk_bytes:
+                self._remove(path, size)
+                total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for _, size, path in self._entries():
+            self._remove(path, size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes if self._disk_bytes is not None else self._scan_bytes(),
+            }
+
+
+# ✅ Shared cache used by the API process
+result_cache = ResultCache()
@@ -0,0 +1,171 @@
+"""
+services/classifier.py
+Document type classifier: hashed n-gram features and a linear model.
+- HashingVectorizer: lowercased word unigrams and bigrams (digit runs folded
+  to "0") hashed into n_features buckets, weighted log(1 + count) and
+  L2-normalized. There is no vocabulary to ship: training and serving run
+  the same function.
+- A batch of texts becomes one CSR matrix (indptr, indices, values); scoring
+  is a gather of weight rows plus one bincount per class, so a document costs
+  a few microseconds once tokenized.
+- LinearClassifier is the artifact written by training/train.py (.npz with
+  float16 weights, bias, class names and vectorizer settings). It is loaded
+  once per process through services.backends; without an artifact,
+  services.ocr.detect_document_type keeps the keyword scan of services/fields.py.
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+# ✅ Classifier configuration (override through environment variables)
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", os.path.join("models", "checkpoints", "doc_classifier.npz"))
+# Documents whose best class scores below this probability are "unknown" (0 = always take the best class)
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0"))
+
+DEFAULT_FEATURES = 2 ** 18
+_TOKEN = re.compile(r"[^\W_]+")
+_DIGITS = re.compile(r"\d+")
+_NGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+# ---------------------------------------------------------------------
+# 🔢 Features
+# ---------------------------------------------------------------------
+class HashingVectorizer:
+    """Texts → sparse hashed n-gram features (CSR arrays)."""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES, ngram: int = 2, cache_size: int = 200_000):
+        self.n_features = int(n_features)
+        self.ngram = int(ngram)
+        self.cache_size = cache_size
+        self._hashes = {}  # token -> crc32; OCR text repeats the same tokens endlessly
+
+    def config(self) -> dict:
+        return {"n_features": self.n_features, "ngram": self.ngram}
+
+    def tokens(self, text: str) -> list:
+        return _TOKEN.findall(_DIGITS.sub("0", (text or "").lower()))
+
+    def _token_hashes(self, tokens) -> np.ndarray:
+        hashes = self._hashes
+        if len(hashes) > self.cache_size:
+            hashes.clear()
+        values = []
+        for token in tokens:
+            value = hashes.get(token)
+            if value is None:
+                value = hashes[token] = zlib.crc32(token.encode("utf-8"))
+            values.append(value)
+        return np.array(values, dtype=np.uint64)
+
+    def buckets(self, text: str) -> np.ndarray:
+        """Feature index of every unigram, bigram, … of a text (with repeats)."""
+        unigrams = self._token_hashes(self.tokens(text))
+        grams, combined = [unigrams], unigrams
+        for n in range(2, self.ngram + 1):
+            if len(unigrams) < n:
+                break
+            combined = combined[:-1] * _NGRAM_MULTIPLIER + unigrams[n - 1:]  # wraps mod 2**64
+            grams.append(combined >> np.uint64(20))  # high bits: the multiply mixes upwards
+        return (np.concatenate(grams) % np.uint64(self.n_features)).astype(np.int64)
+
+    def transform(self, texts):
+        """(indptr, indices, values): one L2-normalized row of log(1 + count) per text."""
+        buckets = [self.buckets(text) for text in texts]
+        count = len(buckets)
+        lengths = np.fromiter((len(b) for b in buckets), dtype=np.int64, count=count)
+        rows = np.repeat(np.arange(count, dtype=np.int64), lengths)
+        keys, counts = np.unique(rows * self.n_features + np.concatenate(buckets or [np.zeros(0, np.int64)]),
+                                 return_counts=True)
+        row, indices = np.divmod(keys, self.n_features)
+        values = np.log1p(counts).astype(np.float32)
+        norms = np.sqrt(np.bincount(row, weights=values.astype(np.float64) ** 2, minlength=count))
+        values /= norms[row].astype(np.float32)
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row, minlength=count), out=indptr[1:])
+        return indptr, indices.astype(np.int32), values
+
+
+# ---------------------------------------------------------------------
+# 🧮 Model
+# ---------------------------------------------------------------------
+class LinearClassifier:
+    """Softmax-linear model over HashingVectorizer features."""
+
+    def __init__(self, weights, bias, classes, vectorizer: HashingVectorizer = None,
+                 min_confidence: float = None):
+        self.weights = np.asarray(weights, dtype=np.float32)   # n_features × classes
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.classes = [str(c) for c in classes]
+        self.vectorizer = vectorizer or HashingVectorizer(n_features=self.weights.shape[0])
+        self.min_confidence = CLASSIFIER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        if self.weights.shape != (self.vectorizer.n_features, len(self.classes)):
+            raise ValueError(f"Weights {self.weights.shape} do not match {self.vectorizer.n_features} features "
+                             f"× {len(self.classes)} classes")
+        digest = hashlib.sha256(self.weights.tobytes() + self.bias.tobytes())
+        digest.update(json.dumps([self.classes, self.vectorizer.config()]).encode("utf-8"))
+        # changes with the model (part of the "classify" stage version)
+        self.fingerprint = digest.hexdigest()[:10]
+
+    @classmethod
+    def load(cls, path: str) -> "LinearClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data["config"]))
+            return cls(data["weights"], data["bias"], data["classes"].tolist(), HashingVectorizer(**config))
+
+    def save(self, path: str):
+        """Compressed .npz; weights stored as float16 (a few MB for 2^18 features)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights.astype(np.float16), bias=self.bias,
+                            classes=np.array(self.classes), config=np.array(json.dumps(self.vectorizer.config())))
+        os.replace(tmp_path, path)
+
+    # -----------------------------------------------------------------
+    def decision_function(self, indptr, indices, values) -> np.ndarray:
+        """Class scores (rows × classes) of a CSR batch."""
+        count = len(indptr) - 1
+        rows = np.repeat(np.arange(count), np.diff(indptr))
+        contributions = self.weights[indices] * values[:, None]
+        scores = np.empty((count, len(self.classes)), dtype=np.float32)
+        for column in range(len(self.classes)):
+            scores[:, column] = np.bincount(rows, weights=contributions[:, column], minlength=count)
+        return scores + self.bias
+
+    def predict_proba(self, texts) -> np.ndarray:
+        """Class probabilities (rows × classes); rows of texts without a single token are all zero."""
+        indptr, indices, values = self.vectorizer.transform(texts)
+        scores = self.decision_function(indptr, indices, values)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        probabilities[np.diff(indptr) == 0] = 0.0
+        return probabilities
+
+    def predict(self, texts) -> list:
+        """Document type per text ("unknown" for empty or low-confidence texts)."""
+        texts = list(texts)
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        confident = probabilities[np.arange(len(texts)), best] > max(self.min_confidence, 0.0)
+        labels = np.array(self.classes + ["unknown"], dtype=object)
+        return labels[np.where(confident, best, len(self.classes))].tolist()
+
+    def classify(self, text: str) -> str:
+        return self.predict([text])[0]
+
+
+def load_classifier(path: str = None):
+    """The trained model at `path` (default CLASSIFIER_MODEL_PATH), or None when there is none."""
+    path = path or CLASSIFIER_MODEL_PATH
+    if not os.path.exists(path):
+        print(f"ℹ️ No document classifier at {path}; using keyword rules.")
+        return None
+    return LinearClassifier.load(path)
@@ -1,46 +1,96 @@
 # services/decision_engine.py
 """
 Rule-based decision engine for document understanding.
+- The rules are a table (services/decision_rules.py, overridable with
+  DECISION_RULES_PATH) compiled once per process into a NumPy evaluator.
+- make_decisions() scores a whole batch at once; make_decision() is the
+  single-document wrapper used by the pipeline.
+- Re-score a stored backlog (NDJSON from services.batch) after a rule change:
+
+    python -m services.decision_engine results.ndjson --rules rules.json --output rescored.ndjson
+
 Later, replace this logic with a trained model for intelligent decisions.
 """
 
+import argparse
+import json
+import sys
+import time
+
+from services.backends import backends
+
+
+def make_decisions(document_types, extracted_fields):
+    """
+    Decisions for parallel sequences of document types and extracted-field
+    dicts. Returns (decisions, confidences) as NumPy arrays.
+    """
+    return backends.get("decision", "rules").decide(list(document_types), list(extracted_fields))
+
+
 def make_decision(document_type: str, extracted_fields: dict):
     """
     Makes a rule-based decision given a document type and extracted fields.
     Returns (decision, confidence).
     """
-    decision = "Needs Review"
-    confidence = 0.75
-
-    document_type = (document_type or "").lower()
-    print(f"🧠 Evaluating document type: {document_type}")
-
-    if document_type == "invoice":
-        amount = extracted_fields.get("total_amount")
-        if amount:
-            try:
-                numeric_amount = float(str(amount).replace(",", "").replace("₹", "").strip())
-                if numeric_amount < 1000:
-                    decision, confidence = "Approved", 0.95
-                elif numeric_amount > 50000:
-                    decision, confidence = "Rejected", 0.90
-                else:
-                    decision, confidence = "Needs Review", 0.85
-            except ValueError:
-                print(f"⚠️ Invalid amount: {amount}")
-
-    elif document_type == "resume":
-        skills = [s.upper() for s in extracted_fields.get("skills", [])]
-        if "AI" in skills or "MACHINE LEARNING" in skills:
-            decision, confidence = "Shortlisted", 0.92
-        else:
-            decision, confidence = "Needs Review", 0.70
-
-    elif document_type == "report":
-        decision, confidence = "Analyzed", 0.88
-
-    else:
-        print(f"⚠️ Unknown document type: {document_type}")
-
-    print(f"✅ Decision: {decision}, Confidence: {confidence}")
-    return decision, confidence
+    decisions, confidences = make_decisions([document_type], [extracted_fields or {}])
+    return str(decisions[0]), float(confidences[0])
+
+
+# ---------------------------------------------------------------------
+# 🖥️ Command line: re-score stored results
+# ---------------------------------------------------------------------
+def _chunks(lines, size: int):
+    chunk = []
+    for line in lines:
+        if line.strip():
+            chunk.append(json.loads(line))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rescore(lines, table, chunk_size: int = 50000):
+    """Yield every stored result with decision / confidence_score recomputed by `table`."""
+    for chunk in _chunks(lines, chunk_size):
+        scored = [r for r in chunk if "document_type" in r]
+        decisions, confidences = table.decide([r["document_type"] for r in scored],
+                                              [r.get("fields_extracted") or {} for r in scored])
+        for record, decision, confidence in zip(scored, decisions, confidences):
+            record["decision"], record["confidence_score"] = str(decision), float(confidence)
+        yield from chunk
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score stored results with the current decision rules.")
+    parser.add_argument("source", help="NDJSON results (e.g. from python -m services.batch); '-' for stdin")
+    parser.add_argument("--rules", default=None, help="JSON rule table (default: DECISION_RULES_PATH / built-in)")
+    parser.add_argument("--output", default="-", help="NDJSON output file ('-' for stdout)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Records scored per NumPy batch")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from services.decision_rules import compile_rules, load_rules
+    args = parse_args(argv)
+    table = compile_rules(load_rules(args.rules))
+    source = sys.stdin if args.source == "-" else open(args.source, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started, count = time.perf_counter(), 0
+    try:
+        for record in rescore(source, table, args.chunk_size):
+            out.write(json.dumps(record) + "\n")
+            count += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ {count} records re-scored in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
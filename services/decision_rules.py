@@ -0,0 +1,216 @@
+"""
+services/decision_rules.py
+Decision rule table, compiled into a NumPy batch evaluator.
+- The table (thresholds per document type, skill sets, rank_resume score
+  weights) is plain data: DEFAULT_DECISION_RULES below, optionally
+  overridden by a JSON file named in DECISION_RULES_PATH.
+- compile_rules() turns it into a DecisionTable that scores whole batches:
+  records are first laid out as columns (amounts as float arrays, skills as
+  a boolean matrix over the table's skill vocabulary), then every rule is one
+  vectorized comparison and np.select picks the first matching rule per row.
+- Per type, rules are tried in order; "otherwise" applies when none matches,
+  the table's "default" when the type has no rules at all.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# ✅ Optional JSON file replacing (per key / per document type) the defaults
+DECISION_RULES_PATH = os.getenv("DECISION_RULES_PATH", "")
+
+# ---------------------------------------------------------------------
+# 📋 Rule table
+# ---------------------------------------------------------------------
+# Rule ops: < <= > >= on a numeric field, "present" (field parsed as a
+# number), "any_skill" (at least one of `value` in the skills list).
+DEFAULT_DECISION_RULES = {
+    "default": {"decision": "Needs Review", "confidence": 0.75},
+    "types": {
+        "invoice": {
+            "rules": [
+                {"field": "total_amount", "op": "<", "value": 1000, "decision": "Approved", "confidence": 0.95},
+                {"field": "total_amount", "op": ">", "value": 50000, "decision": "Rejected", "confidence": 0.90},
+                {"field": "total_amount", "op": "present", "decision": "Needs Review", "confidence": 0.85},
+            ],
+        },
+        "resume": {
+            "rules": [
+                {"field": "skills", "op": "any_skill", "value": ["AI", "Machine Learning"],
+                 "decision": "Shortlisted", "confidence": 0.92},
+            ],
+            "otherwise": {"decision": "Needs Review", "confidence": 0.70},
+        },
+        "report": {
+            "otherwise": {"decision": "Analyzed", "confidence": 0.88},
+        },
+    },
+    # services.reasoning.rank_resume
+    "resume_score": {
+        "weights": {"email": 0.3, "phone": 0.2},
+        "keywords": ["experience", "python", "machine learning", "deep learning", "nlp", "ai", "leadership"],
+        "keyword_weight": 0.08,
+        "keyword_cap": 0.4,
+        "thresholds": [[0.6, "Recommended"], [0.3, "Consider"]],
+        "below": "Reject",
+    },
+}
+
+_COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+
+
+def load_rules(path: str = None) -> dict:
+    """Defaults, with the top-level keys and document types of a JSON file laid over them."""
+    rules = json.loads(json.dumps(DEFAULT_DECISION_RULES))  # deep copy
+    path = DECISION_RULES_PATH if path is None else path
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            override = json.load(fh)
+        types = {**rules["types"], **override.pop("types", {})}
+        rules.update(override)
+        rules["types"] = types
+    return rules
+
+
+def parse_amount(value) -> float:
+    """Amount as written by the field extractor ("12,500.00", "₹900"); NaN when not a number."""
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(str(value).replace(",", "").replace("₹", "").strip())
+    except ValueError:
+        return np.nan
+
+
+# ---------------------------------------------------------------------
+# 🧮 Compiled table
+# ---------------------------------------------------------------------
+class DecisionTable:
+    """A rule table compiled for batch evaluation (see compile_rules)."""
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        # changes whenever the table does (part of the "decide" stage version)
+        self.fingerprint = hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+        self.labels = []            # decision label per code
+        self.numeric_fields = []    # fields parsed into float columns
+        self.skills = []            # skill vocabulary (upper case), one matrix column each
+        default = rules["default"]
+        self.default = (self._code(default["decision"]), float(default["confidence"]))
+        # per type: ([((field, op, argument), code, confidence), ...], otherwise (code, confidence) or None)
+        self.types = {}
+        for doc_type, spec in rules["types"].items():
+            compiled = []
+            for rule in spec.get("rules", []):
+                compiled.append((self._condition(rule), self._code(rule["decision"]), float(rule["confidence"])))
+            otherwise = spec.get("otherwise")
+            if otherwise is not None:
+                otherwise = (self._code(otherwise["decision"]), float(otherwise["confidence"]))
+            self.types[doc_type.lower()] = (compiled, otherwise)
+
+        score = rules["resume_score"]
+        self.score_fields = list(score["weights"])
+        self.score_weights = np.array([score["weights"][f] for f in self.score_fields], dtype=np.float64)
+        self.score_keywords = [k.lower() for k in score["keywords"]]
+        self.score_bins = sorted(score["thresholds"], reverse=True)
+
+    def _code(self, label: str) -> int:
+        if label not in self.labels:
+            self.labels.append(label)
+        return self.labels.index(label)
+
+    def _condition(self, rule: dict):
+        op = rule["op"]
+        if op == "any_skill":
+            columns = []
+            for skill in rule["value"]:
+                skill = skill.upper()
+                if skill not in self.skills:
+                    self.skills.append(skill)
+                columns.append(self.skills.index(skill))
+            return ("skills", op, np.array(columns, dtype=np.intp))
+        if op not in _COMPARISONS and op != "present":
+            raise ValueError(f"Unknown decision rule op: {op}")
+        if rule["field"] not in self.numeric_fields:
+            self.numeric_fields.append(rule["field"])
+        return (rule["field"], op, float(rule.get("value", 0)))
+
+    # -----------------------------------------------------------------
+    def columns(self, document_types, records) -> dict:
+        """
+        Columnar view of a batch of extracted-field dicts: "type" (str array),
+        one float64 array per numeric field (NaN = missing / not a number)
+        and "skills" (bool matrix, rows × skill vocabulary).
+        """
+        count = len(records)
+        columns = {"type": np.char.lower(np.array([t or "" for t in document_types], dtype=str))}
+        for field in self.numeric_fields:
+            columns[field] = np.fromiter((parse_amount(r.get(field)) for r in records), dtype=np.float64, count=count)
+        skills = np.zeros((count, len(self.skills)), dtype=bool)
+        index = {skill: i for i, skill in enumerate(self.skills)}
+        for row, record in enumerate(records):
+            for skill in record.get("skills") or ():
+                column = index.get(str(skill).upper())
+                if column is not None:
+                    skills[row, column] = True
+        columns["skills"] = skills
+        return columns
+
+    def evaluate(self, columns: dict):
+        """(decision labels as an object array of str, confidences as float64) for a columnar batch."""
+        types = columns["type"]
+        conditions, codes, confidences = [], [], []
+        for doc_type, (rules, otherwise) in self.types.items():
+            in_type = types == doc_type
+            if not in_type.any():
+                continue
+            for (field, op, argument), code, confidence in rules:
+                if op == "any_skill":
+                    hit = columns["skills"][:, argument].any(axis=1)
+                elif op == "present":
+                    hit = ~np.isnan(columns[field])
+                else:
+                    with np.errstate(invalid="ignore"):
+                        hit = _COMPARISONS[op](columns[field], argument)  # NaN compares False
+                conditions.append(in_type & hit)
+                codes.append(code)
+                confidences.append(confidence)
+            if otherwise is not None:
+                conditions.append(in_type)
+                codes.append(otherwise[0])
+                confidences.append(otherwise[1])
+        labels = np.array(self.labels, dtype=object)
+        if not conditions:
+            return labels[np.full(len(types), self.default[0])], np.full(len(types), self.default[1])
+        code = np.select(conditions, codes, default=self.default[0])
+        confidence = np.select(conditions, confidences, default=self.default[1])
+        return labels[code], confidence
+
+    def decide(self, document_types, records):
+        """Decisions and confidences for parallel lists of types and extracted-field dicts."""
+        return self.evaluate(self.columns(document_types, records))
+
+    # -----------------------------------------------------------------
+    def resume_scores(self, records, texts):
+        """
+        rank_resume for a batch: (decision labels, scores rounded to 2 places).
+        Keyword hits are substring tests over each lower-cased text, row by
+        row: a fixed-width string array of the batch would pad every text to
+        the longest one.
+        """
+        score = self.rules["resume_score"]
+        present = np.array([[bool(r.get(f)) for f in self.score_fields] for r in records], dtype=bool)
+        present = present.reshape(len(records), len(self.score_fields))
+        found = np.fromiter((sum(keyword in lowered for keyword in self.score_keywords)
+                             for lowered in ((t or "").lower() for t in texts)), dtype=np.int64, count=len(records))
+        scores = present @ self.score_weights + np.minimum(found * score["keyword_weight"], score["keyword_cap"])
+        decisions = np.select([scores >= limit for limit, _ in self.score_bins],
+                              [label for _, label in self.score_bins], default=score["below"])
+        return decisions.astype(object), np.round(scores, 2)
+
+
+def compile_rules(rules: dict = None) -> DecisionTable:
+    """Compile a rule table (default: load_rules()) for batch evaluation."""
+    return DecisionTable(rules if rules is not None else load_rules())
@@ -0,0 +1,276 @@
+"""
+services/document.py
+In-memory representation of one uploaded document.
+- Holds the raw bytes, so PyPDF2 / pdf2image / PIL read them directly.
+- Anything that has to touch disk (e.g. poppler input) is spilled into a
+  private per-document temp directory that is removed on close().
+- Lazily rasterizes and memoizes page images, text layers, OCR results and
+  word boxes, so every pipeline stage shares them and no page is processed
+  twice.
+- PDF / imaging libraries come from services.backends and are imported on
+  first use, so a worker only loads what its documents actually need.
+"""
+
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from services.backends import backends
+from services.metrics import span
+
+# ✅ Poppler path (update if needed)
+POPLER_PATH = r"C:\Users\Lakhan Pal\Downloads\Release-25.07.0-0\poppler-25.07.0\Library\bin"
+
+# ✅ Rasterization settings
+RASTER_DPI = int(os.getenv("OCR_DPI", "200"))
+# Render PDF pages as 8-bit grayscale (a third of the memory of RGB)
+RASTER_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") != "0"
+# Page bitmaps kept besides page 1 (which explainability always needs)
+PAGE_CACHE_PAGES = int(os.getenv("PAGE_CACHE_PAGES", "4"))
+
+
+# Thin wrappers over the lazily loaded pdf2image backend
+def convert_from_path(*args, **kwargs):
+    return backends.get("raster", "pdf2image").convert_from_path(*args, **kwargs)
+
+
+def pdfinfo_from_path(*args, **kwargs):
+    return backends.get("raster", "pdf2image").pdfinfo_from_path(*args, **kwargs)
+
+
+class Document:
+    """Uploaded file bytes, a private scratch directory and per-page memos."""
+
+    def __init__(self, data: bytes, filename: str = "upload", dpi: int = None):
+        self.data = data
+        self.filename = os.path.basename(filename or "upload")
+        self.dpi = dpi or RASTER_DPI
+        self._sha256 = None
+        self._workdir = None
+        self._path = None
+        self._reader = None
+        self._mupdf = None
+        self._page_count = None
+        self._images = OrderedDict()  # page index -> PIL image (LRU, page 0 pinned)
+        self._text_layers = {}        # page index -> embedded text
+        self.ocr_results = {}         # page index -> OCR text
+        self.ocr_words = {}           # page index -> services.layout.WordBoxes from OCR
+        self._layer_words = {}        # page index -> WordBoxes of the PDF text layer
+        self.page_stats = {}          # page index -> {"strategy": ..., "seconds": ...}
+        self.timings = {}             # stage name -> seconds spent for this document
+
+    @classmethod
+    def from_path(cls, path: str) -> "Document":
+        with open(path, "rb") as fh:
+            return cls(fh.read(), os.path.basename(path))
+
+    # Only the bytes and the name cross process boundaries
+    def __getstate__(self):
+        return {"data": self.data, "filename": self.filename, "_sha256": self._sha256}
+
+    def __setstate__(self, state):
+        self.__init__(state["data"], state["filename"])
+        self._sha256 = state.get("_sha256")
+
+    # -----------------------------------------------------------------
+    @property
+    def is_pdf(self) -> bool:
+        return self.filename.lower().endswith(".pdf") or self.data[:5] == b"%PDF-"
+
+    @property
+    def stem(self) -> str:
+        """Filesystem-safe base name without extension."""
+        base = os.path.splitext(self.filename)[0]
+        return re.sub(r"[^A-Za-z0-9._ -]", "_", base) or "upload"
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    def stream(self) -> io.BytesIO:
+        """A fresh read-only stream over the document bytes."""
+        return io.BytesIO(self.data)
+
+    # -----------------------------------------------------------------
+    @property
+    def workdir(self) -> str:
+        """Private temp directory for this document, created on first use."""
+        if self._workdir is None:
+            self._workdir = tempfile.mkdtemp(prefix="idu_")
+        return self._workdir
+
+    def path(self) -> str:
+        """Spill the bytes to the private temp directory once and return the path."""
+        if self._path is None:
+            ext = os.path.splitext(self.filename)[1] or (".pdf" if self.is_pdf else "")
+            self._path = os.path.join(self.workdir, f"document{ext}")
+            with open(self._path, "wb") as fh:
+                fh.write(self.data)
+        return self._path
+
+    # -----------------------------------------------------------------
+    # 📄 Pages
+    # -----------------------------------------------------------------
+    def pdf_reader(self):
+        if self._reader is None:
+            self._reader = backends.get("pdf", "pypdf2")(self.stream())
+        return self._reader
+
+    def mupdf(self):
+        """PyMuPDF handle over the in-memory bytes (None when PyMuPDF is missing)."""
+        if self._mupdf is None:
+            fitz = backends.optional("pdf", "pymupdf")  # reads text layers much faster than PyPDF2
+            if fitz is not None:
+                self._mupdf = fitz.open(stream=self.data, filetype="pdf")
+        return self._mupdf
+
+    @property
+    def page_count(self) -> int:
+        if self._page_count is None:
+            if not self.is_pdf:
+                self._page_count = 1
+            else:
+                try:
+                    handle = self.mupdf()
+                    self._page_count = handle.page_count if handle is not None else len(self.pdf_reader().pages)
+                except Exception:
+                    info = pdfinfo_from_path(self.path(), poppler_path=POPLER_PATH)
+                    self._page_count = int(info["Pages"])
+        return self._page_count
+
+    def text_layer(self, index: int) -> str:
+        """Embedded text of a PDF page (memoized); empty for images."""
+        if index not in self._text_layers:
+            text = ""
+            if self.is_pdf:
+                with span(self.timings, "ocr.text_layer"):
+                    handle = self.mupdf()
+                    if handle is not None:
+                        text = handle[index].get_text()
+                    else:
+                        text = self.pdf_reader().pages[index].extract_text() or ""
+            self._text_layers[index] = text
+        return self._text_layers[index]
+
+    def word_boxes(self, index: int):
+        """
+        Words of a page with boxes as fractions of the page size
+        (services.layout.WordBoxes): from OCR when the page was OCR'd, else
+        from the PDF text layer (memoized; empty without PyMuPDF).
+        """
+        if index in self.ocr_words:
+            return self.ocr_words[index]
+        if index not in self._layer_words:
+            from services.layout import WordBoxes, from_mupdf_words
+            words = WordBoxes.empty()
+            handle = self.mupdf() if self.is_pdf and index not in self.ocr_results else None
+            if handle is not None:
+                with span(self.timings, "ocr.text_layer"):
+                    page = handle[index]
+                    words = from_mupdf_words(page.get_text("words"), (page.rect.width, page.rect.height))
+            self._layer_words[index] = words
+        return self._layer_words[index]
+
+    def _remember_image(self, index: int, image):
+        self._images[index] = image
+        self._images.move_to_end(index)
+        evictable = [i for i in self._images if i != 0]
+        while len(evictable) > PAGE_CACHE_PAGES:
+            del self._images[evictable.pop(0)]
+
+    def page_images(self, start: int, stop: int) -> list:
+        """
+        Images for pages [start, stop) (0-based), rasterizing only the
+        missing ones with a single poppler call.
+        """
+        stop = min(stop, self.page_count)
+        missing = [i for i in range(start, stop) if i not in self._images]
+        images = {i: self._images[i] for i in range(start, stop) if i in self._images}
+        if missing:
+            with span(self.timings, "ocr.rasterize"):
+                if self.is_pdf:
+                    rendered = convert_from_path(
+                        self.path(), dpi=self.dpi, first_page=missing[0] + 1,
+                        last_page=missing[-1] + 1, poppler_path=POPLER_PATH, grayscale=RASTER_GRAYSCALE
+                    )
+                    for i, image in zip(range(missing[0], missing[-1] + 1), rendered):
+                        images.setdefault(i, image)
+                else:
+                    from PIL import Image
+                    image = Image.open(self.stream())
+                    image.load()
+                    images[0] = image
+            for i in missing:
+                if i in images:
+                    self._remember_image(i, images[i])
+        return [images[i] for i in range(start, stop) if i in images]
+
+    def page_image(self, index: int):
+        """Image of a single page (memoized)."""
+        images = self.page_images(index, index + 1)
+        return images[0] if images else None
+
+    def preview_image(self, index: int, max_side: int):
+        """
+        A new page image no larger than max_side pixels either way. Reuses a
+        page already rasterized for OCR; otherwise a PDF page is rendered
+        straight at the small size with PyMuPDF instead of at OCR resolution.
+        """
+        from PIL import Image
+        image = self._images.get(index)
+        if image is None and self.is_pdf and self.mupdf() is not None:
+            with span(self.timings, "explain.render"):
+                page = self.mupdf()[index]
+                zoom = max_side / max(page.rect.width, page.rect.height)
+                fitz = backends.get("pdf", "pymupdf")
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        if image is None:
+            image = self.page_image(index)
+        if image is None:
+            return None
+        ratio = min(1.0, max_side / max(image.size))
+        size = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+        return image.resize(size, Image.BILINEAR, reducing_gap=2.0) if ratio < 1 else image.copy()
+
+    # -----------------------------------------------------------------
+    def close(self):
+        self._images.clear()
+        self._layer_words.clear()
+        if self._mupdf is not None:
+            self._mupdf.close()
+            self._mupdf = None
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def open_document(source):
+    """
+    Accept either a Document or a file path.
+    Documents created here (from a path) are closed on exit;
+    Documents passed in are left for their owner to close.
+    """
+    if isinstance(source, Document):
+        yield source
+        return
+    doc = Document.from_path(source)
+    try:
+        yield doc
+    finally:
+        doc.close()
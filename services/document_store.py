@@ -0,0 +1,201 @@
+"""
+services/document_store.py
+Persistent store of what the expensive stages produced, per document.
+- One SQLite row per (content hash, OCR engine): the OCR text and the
+  word-box layout as zlib blobs, the per-page stats, and the downstream
+  outputs (type, fields, decision, overlay) with the stage versions that
+  produced them.
+- The pipeline reads it before OCR: a document seen before (same bytes,
+  same engine, same OCR version) skips rasterization and OCR entirely.
+- services.reprocess re-runs only the stages whose version changed, straight
+  from the stored text, so rule fixes reach the whole backlog without re-OCR.
+- Pool workers write directly (WAL mode), like the job store.
+- Bounded: rows unused for DOCUMENT_STORE_MAX_AGE_DAYS, and the least
+  recently used rows beyond DOCUMENT_STORE_MAX_ROWS, are pruned every
+  PRUNE_EVERY saves. A hit only bumps accessed_at; the blobs are rewritten
+  only when something changed.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+# ✅ Document store configuration (override through environment variables)
+DOCUMENT_STORE_ENABLED = os.getenv("DOCUMENT_STORE_ENABLED", "1") != "0"
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", os.path.join(".cache", "documents.sqlite3"))
+DOCUMENT_STORE_MAX_ROWS = int(os.getenv("DOCUMENT_STORE_MAX_ROWS", "100000"))          # 0 = unbounded
+DOCUMENT_STORE_MAX_AGE_DAYS = float(os.getenv("DOCUMENT_STORE_MAX_AGE_DAYS", "90"))    # since last use; 0 = forever
+
+# Retention is enforced once every this many saves (per process)
+PRUNE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    sha256        TEXT NOT NULL,
+    ocr_engine    TEXT NOT NULL,
+    filename      TEXT,
+    page_count    INTEGER,
+    text          BLOB NOT NULL,          -- zlib(UTF-8 text)
+    layout        BLOB,                   -- services.layout.pack_pages
+    page_stats    TEXT,                   -- JSON {page index: {"strategy", "seconds", ...}}
+    versions      TEXT NOT NULL,          -- JSON {stage: version} of the stored outputs
+    document_type TEXT,
+    fields        TEXT,                   -- JSON
+    decision      TEXT,
+    confidence    REAL,
+    overlay       TEXT,                   -- JSON
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    accessed_at   REAL,                   -- last save or hit (retention is least recently used)
+    PRIMARY KEY (sha256, ocr_engine)
+);
+"""
+
+# Outputs of the downstream stages, as stored columns
+OUTPUT_COLUMNS = ("document_type", "fields", "decision", "confidence", "overlay")
+_JSON_COLUMNS = ("page_stats", "versions", "fields", "overlay")
+
+
+def _row(record: sqlite3.Row) -> dict:
+    row = dict(record)
+    for column in _JSON_COLUMNS:
+        if column in row and row[column] is not None:
+            row[column] = json.loads(row[column])
+    if row.get("page_stats"):
+        row["page_stats"] = {int(index): stats for index, stats in row["page_stats"].items()}
+    return row
+
+
+def decompress_text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class DocumentStore:
+    """SQLite table of OCR text, layout and stage outputs keyed by content hash + OCR engine."""
+
+    def __init__(self, path: str = None, enabled: bool = None, max_rows: int = None, max_age_days: float = None):
+        self.path = path or DOCUMENT_STORE_PATH
+        self.enabled = DOCUMENT_STORE_ENABLED if enabled is None else enabled
+        self.max_rows = DOCUMENT_STORE_MAX_ROWS if max_rows is None else max_rows
+        self.max_age_days = DOCUMENT_STORE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self._ready = False
+        self._saved = 0
+
+    @contextmanager
+    def _db(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                if "accessed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(documents)")}:
+                    conn.execute("ALTER TABLE documents ADD COLUMN accessed_at REAL")  # store from before the column
+                    conn.execute("UPDATE documents SET accessed_at = updated_at")
+                conn.execute("CREATE INDEX IF NOT EXISTS documents_accessed ON documents (accessed_at)")
+                self._ready = True
+            yield conn
+        finally:
+            conn.close()
+
+    # -----------------------------------------------------------------
+    def load(self, sha256: str, ocr_engine: str):
+        """Stored row (text still compressed, layout packed) or None."""
+        with self._db() as conn:
+            record = conn.execute("SELECT * FROM documents WHERE sha256 = ? AND ocr_engine = ?",
+                                  (sha256, ocr_engine)).fetchone()
+        return _row(record) if record is not None else None
+
+    def save(self, sha256: str, ocr_engine: str, filename: str, page_count: int, text: str,
+             layout: bytes, page_stats: dict, versions: dict, outputs: dict):
+        """Insert or replace a document's OCR output and stage outputs."""
+        now = time.time()
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO documents (sha256, ocr_engine, filename, page_count, text, layout, page_stats, versions,"
+                " document_type, fields, decision, confidence, overlay, created_at, updated_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (sha256, ocr_engine) DO UPDATE SET filename = excluded.filename,"
+                " page_count = excluded.page_count, text = excluded.text, layout = excluded.layout,"
+                " page_stats = excluded.page_stats, versions = excluded.versions,"
+                " document_type = excluded.document_type, fields = excluded.fields, decision = excluded.decision,"
+                " confidence = excluded.confidence, overlay = excluded.overlay, updated_at = excluded.updated_at,"
+                " accessed_at = excluded.accessed_at",
+                (sha256, ocr_engine, filename, page_count, zlib.compress(text.encode("utf-8"), 6), layout,
+                 json.dumps(page_stats), json.dumps(versions), outputs.get("document_type"),
+                 json.dumps(outputs.get("fields")), outputs.get("decision"), outputs.get("confidence"),
+                 json.dumps(outputs.get("overlay")), now, now, now),
+            )
+        self._saved += 1
+        if self._saved % PRUNE_EVERY == 0:
+            self.prune()
+
+    def touch(self, sha256: str, ocr_engine: str):
+        """Mark a stored document as used (a hit), without rewriting its blobs."""
+        with self._db() as conn:
+            conn.execute("UPDATE documents SET accessed_at = ? WHERE sha256 = ? AND ocr_engine = ?",
+                         (time.time(), sha256, ocr_engine))
+
+    def prune(self) -> int:
+        """Delete rows unused for max_age_days and the least recently used beyond max_rows; rows deleted."""
+        deleted = 0
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.max_age_days:
+                    deleted += conn.execute("DELETE FROM documents WHERE accessed_at < ?",
+                                            (time.time() - self.max_age_days * 86400,)).rowcount
+                if self.max_rows:
+                    excess = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_rows
+                    if excess > 0:
+                        deleted += conn.execute(
+                            "DELETE FROM documents WHERE rowid IN"
+                            " (SELECT rowid FROM documents ORDER BY accessed_at, rowid LIMIT ?)", (excess,)
+                        ).rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def update_outputs(self, rows):
+        """Write back the downstream outputs and versions of reprocessed rows in one transaction."""
+        now = time.time()
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE documents SET document_type = ?, fields = ?, decision = ?, confidence = ?, overlay = ?,"
+                " versions = ?, updated_at = ? WHERE sha256 = ? AND ocr_engine = ?",
+                [(row["document_type"], json.dumps(row["fields"]), row["decision"], row["confidence"],
+                  json.dumps(row["overlay"]), json.dumps(row["versions"]), now, row["sha256"], row["ocr_engine"])
+                 for row in rows],
+            )
+            conn.execute("COMMIT")
+
+    def iter_chunks(self, chunk_size: int = 1000):
+        """Every stored row, in insertion order, as lists of up to chunk_size rows."""
+        last = 0
+        while True:
+            with self._db() as conn:
+                records = conn.execute("SELECT rowid, * FROM documents WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                       (last, chunk_size)).fetchall()
+            if not records:
+                return
+            last = records[-1]["rowid"]
+            yield [_row(record) for record in records]
+
+    def stats(self) -> dict:
+        with self._db() as conn:
+            count, text_bytes, layout_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0), COALESCE(SUM(LENGTH(layout)), 0) FROM documents"
+            ).fetchone()
+        return {"documents": count, "text_bytes": text_bytes, "layout_bytes": layout_bytes}
+
+
+# ✅ Shared store (every process opens its own connections)
+document_store = DocumentStore()
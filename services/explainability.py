@@ -1,74 +1,145 @@
 """
 services/explainability.py
-Generates explainability visualizations for extracted document fields.
+Shows where the extracted fields were found in the document.
+- field_overlay(): lightweight JSON overlay: one box per field value (and
+  text line), as fractions of the page size, located in the word boxes kept
+  from OCR or the PDF text layer. No image work; the frontend draws it.
+- highlight_text_areas(): server-side image of the page with the boxes
+  drawn, only on request and at reduced resolution (EXPLAIN_IMAGE_PX),
+  stored content-addressed and compressed by services.outputs.
 - Supports both PDFs and image files.
-- Returns a web-accessible path for the FastAPI frontend.
 """
 
-from PIL import Image, ImageDraw, ImageFont
-from pdf2image import convert_from_path
 import os
 
-# ✅ Poppler path for Windows (change if needed)
-POPLER_PATH = r"C:\Users\Lakhan Pal\Downloads\Release-25.07.0-0\poppler-25.07.0\Library\bin"
+from services.document import open_document
+from services.metrics import span
+from services.outputs import output_store
 
-def highlight_text_areas(image_path: str, extracted_fields: dict):
+# ✅ Longest side (pixels) of server-rendered explainability images
+EXPLAIN_IMAGE_PX = int(os.getenv("EXPLAIN_IMAGE_PX", "1000"))
+
+# --- Color mapping for different fields ---
+FIELD_COLORS = {
+    "name": "blue",
+    "email": "green",
+    "phone": "purple",
+    "invoice_no": "orange",
+    "total_amount": "red",
+    "date": "gold",
+    "skills": "teal",
+    "title": "navy",
+    "summary": "brown",
+}
+
+
+def _field_values(extracted_fields: dict):
+    """(field, value) pairs worth locating; list fields yield every item."""
+    for field, value in (extracted_fields or {}).items():
+        if field == "note" or value in (None, "", []):
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, (str, int, float)):
+                yield field, str(item)
+
+
+def locate_fields(pages, extracted_fields: dict) -> dict:
+    """
+    Overlay from (page index, WordBoxes) pairs, searched in order until every
+    value has been found (pages may be a lazy generator).
+    """
+    overlay = {"pages": [], "regions": []}
+    pending = list(_field_values(extracted_fields))
+    for index, words in pages:
+        if not pending:
+            break
+        missing = []
+        for field, value in pending:
+            boxes = words.find(value)
+            if not boxes:
+                missing.append((field, value))
+            overlay["regions"].extend(
+                {"field": field, "value": value, "page": index + 1, "box": [round(v, 4) for v in box]}
+                for box in boxes
+            )
+        if len(missing) < len(pending):
+            width, height = words.size
+            overlay["pages"].append({"page": index + 1, "width": round(width, 1), "height": round(height, 1)})
+        pending = missing
+    return overlay
+
+
+def field_overlay(source, extracted_fields: dict, pages=None) -> dict:
+    """
+    Locate extracted field values on the pages.
+    Accepts a services.document.Document or a file path. Returns
+    {"pages": [{"page", "width", "height"}],
+     "regions": [{"field", "value", "page", "box": [x0, y0, x1, y1]}]}
+    with 1-based pages and boxes as fractions of the page width / height.
+    pages limits the search to some page indexes (default: all).
+    """
+    try:
+        with open_document(source) as doc, span(doc.timings, "explain.locate"):
+            indexes = range(doc.page_count) if pages is None else pages
+            return locate_fields(((index, doc.word_boxes(index)) for index in indexes), extracted_fields)
+    except Exception as e:
+        print(f"❌ Field overlay failed: {e}")
+        return {"pages": [], "regions": []}
+
+
+def highlight_text_areas(source, extracted_fields: dict, overlay: dict = None):
     """
-    Highlights key fields detected in the document.
-    Returns a relative web path (e.g. /outputs/file_highlighted.png)
+    Draws the located fields on a reduced-resolution page image.
+    Accepts a services.document.Document or a file path; reuses `overlay`
+    (from field_overlay) when given.
+    Returns a relative web path (e.g. /outputs/3f1c…e9.webp)
     """
     try:
         # --- Step 1: Validate file ---
-        if not os.path.exists(image_path):
-            print(f"⚠️ File not found: {image_path}")
-            return None
-
-        # --- Step 2: Convert PDF → image if necessary ---
-        if image_path.lower().endswith(".pdf"):
-            pages = convert_from_path(image_path, dpi=200, poppler_path=POPLER_PATH)
-            if not pages or len(pages) == 0:
-                print("⚠️ No pages found in PDF.")
-                return None
-
-            pdf_img_path = image_path.replace(".pdf", "_page1.jpg")
-            pages[0].save(pdf_img_path, "JPEG")
-            image_path = pdf_img_path
-
-        # --- Step 3: Open image ---
-        img = Image.open(image_path).convert("RGB")
-        draw = ImageDraw.Draw(img)
-
-        # --- Step 4: Color mapping for different fields ---
-        colors = {
-            "name": "blue",
-            "email": "green",
-            "phone": "purple",
-            "invoice_no": "orange",
-            "total_amount": "red",
-            "date": "yellow"
-        }
-
-        # --- Step 5: Draw highlights for each extracted field ---
-        y = 30
-        for field, value in extracted_fields.items():
-            color = colors.get(field, "gray")
-            draw.rectangle([(20, y), (500, y + 50)], outline=color, width=3)
-            draw.text((30, y + 15), f"{field}: {value}", fill=color)
-            y += 70
-
-        # --- Step 6: Save the output image ---
-        os.makedirs("outputs", exist_ok=True)
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        clean_name = f"{base_name}_highlighted.png"
-        output_path = os.path.join("outputs", clean_name)
-        img.save(output_path)
-
-        abs_path = os.path.abspath(output_path)
-        print(f"✅ Explainability image saved at: {abs_path}")
-
-        # --- Step 7: Return a web-accessible path for frontend ---
-        return f"/outputs/{clean_name}"
+        if not isinstance(source, str) or os.path.exists(source):
+            with open_document(source) as doc:
+                return _render_highlights(doc, extracted_fields, overlay)
+        print(f"⚠️ File not found: {source}")
+        return None
 
     except Exception as e:
         print(f"❌ Explainability generation failed: {e}")
         return None
+
+
+def _render_highlights(doc, extracted_fields: dict, overlay: dict = None):
+    # --- Step 2: Page with the first located field (page 1 when none was found) ---
+    overlay = overlay or field_overlay(doc, extracted_fields)
+    page_no = overlay["regions"][0]["page"] if overlay["regions"] else 1
+    page = doc.preview_image(page_no - 1, EXPLAIN_IMAGE_PX)
+    if page is None:
+        print("⚠️ No pages found in PDF.")
+        return None
+
+    # --- Step 3: Draw the field boxes (preview_image is already a private copy) ---
+    with span(doc.timings, "explain.draw"):
+        img = page.convert("RGB")
+        _draw_regions(img, [r for r in overlay["regions"] if r["page"] == page_no])
+
+    # --- Step 4: Encode (WebP/JPEG/PNG) and store under the content hash ---
+    with span(doc.timings, "explain.encode"):
+        web_path = output_store.save_image(img)
+    print(f"✅ Explainability image for {doc.filename} (page {page_no}) saved at: {web_path}")
+
+    # --- Step 5: Return a web-accessible path for frontend ---
+    return web_path
+
+
+def _draw_regions(img, regions: list):
+    from PIL import ImageDraw  # only needed once a page image exists
+    draw = ImageDraw.Draw(img)
+    width, height = img.size
+    labelled = set()
+    for region in regions:
+        x0, y0, x1, y1 = region["box"]
+        color = FIELD_COLORS.get(region["field"], "gray")
+        box = [x0 * width - 2, y0 * height - 2, x1 * width + 2, y1 * height + 2]
+        draw.rectangle(box, outline=color, width=2)
+        if region["field"] not in labelled:  # label a field once, right of its first box
+            draw.text((box[2] + 4, box[1]), region["field"], fill=color)
+            labelled.add(region["field"])
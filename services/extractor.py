@@ -1,19 +1,7 @@
 # services/extractor.py
 import re
 
-def detect_document_type(text: str) -> str:
-    """Robust detection of invoice/resume/report from extracted text."""
-    if not text:
-        return "unknown"
-    t = text.lower()
-    if any(x in t for x in ["invoice", "amount", "bill", "gst", "invoice no", "tax"]):
-        return "invoice"
-    if any(x in t for x in ["resume", "curriculum vitae", "cv", "experience", "education", "skills"]):
-        return "resume"
-    if any(x in t for x in ["report", "summary", "findings", "conclusion", "analysis"]):
-        return "report"
-    return "unknown"
-
+from services.ocr import detect_document_type  # noqa: F401  re-exported; one implementation for both modules
 
 def extract_key_fields(doc_type: str, text: str) -> dict:
     """Extract fields for invoice/resume/report."""
@@ -0,0 +1,275 @@
+"""
+services/field_model.py
+Transformer field extraction (token classification) served with dynamic
+micro-batching on CPU.
+- A BERT-style token classifier tags tokens with BIO labels per field
+  ("B-invoice_no", "I-invoice_no", …, "O"); a field's value is the text under
+  its first tagged span (character offsets from the fast tokenizer).
+- The checkpoint is loaded once per host, in the model server
+  (services/model_server.py) that every pool worker sends its texts to, with
+  the fastest runtime available: an ONNX export through onnxruntime
+  (model.int8.onnx, else model.onnx), else PyTorch with dynamic int8
+  quantization of every Linear layer.
+- Texts are cut into overlapping windows of FIELD_MODEL_MAX_TOKENS tokens.
+  Windows from all concurrent requests go through one MicroBatcher
+  (services/microbatch.py), bucketed by length, so padding stays small and
+  each forward pass carries up to FIELD_MODEL_MAX_BATCH windows; a partial
+  batch waits at most FIELD_MODEL_MAX_WAIT_MS for company.
+- services.ocr.extract_key_fields uses it when EXTRACTION_BACKEND=transformer
+  and falls back to the regex rules when no model (or no transformers
+  package) is available; rules also fill fields the model did not find.
+- A tiny randomly initialized checkpoint for local testing:
+
+    python -m services.field_model make-tiny models/field-extractor --onnx
+"""
+
+import argparse
+import hashlib
+import os
+import re
+
+from services.microbatch import MicroBatcher
+
+# ✅ Transformer field extraction configuration (override through environment variables)
+FIELD_MODEL_PATH = os.getenv("FIELD_MODEL_PATH", os.path.join("models", "field-extractor"))
+FIELD_MODEL_RUNTIME = os.getenv("FIELD_MODEL_RUNTIME", "auto")    # auto | onnx | torch
+FIELD_MODEL_MAX_BATCH = int(os.getenv("FIELD_MODEL_MAX_BATCH", "16"))
+FIELD_MODEL_MAX_WAIT_MS = float(os.getenv("FIELD_MODEL_MAX_WAIT_MS", "5"))
+FIELD_MODEL_MAX_TOKENS = int(os.getenv("FIELD_MODEL_MAX_TOKENS", "256"))
+FIELD_MODEL_STRIDE = int(os.getenv("FIELD_MODEL_STRIDE", "32"))      # tokens shared by consecutive windows
+FIELD_MODEL_THREADS = int(os.getenv("FIELD_MODEL_THREADS", "0"))     # intra-op threads (0 = runtime default)
+
+# Window lengths (tokens) that are batched together
+LENGTH_BUCKETS = (32, 64, 128, 256, 512)
+# Checkpoint files that identify a model version
+_FINGERPRINT_FILES = ("config.json", "model.int8.onnx", "model.onnx", "model.safetensors", "pytorch_model.bin")
+
+
+def field_model_fingerprint(path: str = None) -> str:
+    """Short id of the checkpoint on disk (sizes and mtimes of its files), without loading it."""
+    path = path or FIELD_MODEL_PATH
+    digest = hashlib.sha256()
+    for name in _FINGERPRINT_FILES:
+        try:
+            st = os.stat(os.path.join(path, name))
+        except OSError:
+            continue
+        digest.update(f"{name}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return digest.hexdigest()[:10]
+
+
+# ---------------------------------------------------------------------
+# 🏃 Runtimes: (input_ids, attention_mask) int64 arrays → logits
+# ---------------------------------------------------------------------
+class OnnxRunner:
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, input_ids, attention_mask):
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = input_ids * 0
+        return self.session.run(None, feed)[0]
+
+
+class TorchInt8Runner:
+    name = "torch-int8"
+
+    def __init__(self, model_dir: str, threads: int = 0):
+        import torch
+        from transformers import AutoModelForTokenClassification
+        if threads:
+            torch.set_num_threads(threads)
+        model = AutoModelForTokenClassification.from_pretrained(model_dir).eval()
+        self.torch = torch
+        self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def __call__(self, input_ids, attention_mask):
+        with self.torch.inference_mode():
+            return self.model(input_ids=self.torch.from_numpy(input_ids),
+                              attention_mask=self.torch.from_numpy(attention_mask)).logits.numpy()
+
+
+def _runner(model_dir: str, runtime: str, threads: int):
+    if runtime in ("auto", "onnx"):
+        for name in ("model.int8.onnx", "model.onnx"):
+            path = os.path.join(model_dir, name)
+            if os.path.exists(path):
+                try:
+                    return OnnxRunner(path, threads)
+                except ImportError:
+                    if runtime == "onnx":
+                        raise
+                    break
+        if runtime == "onnx":
+            raise FileNotFoundError(f"No ONNX export in {model_dir}")
+    return TorchInt8Runner(model_dir, threads)
+
+
+# ---------------------------------------------------------------------
+# 🧠 Model
+# ---------------------------------------------------------------------
+class FieldModel:
+    """Token-classification checkpoint + tokenizer + micro-batcher (one per model server)."""
+
+    def __init__(self, model_dir: str, runtime: str = None, max_batch_size: int = None, max_wait_ms: float = None,
+                 max_tokens: int = None, stride: int = None, threads: int = None):
+        from transformers import AutoConfig, AutoTokenizer
+        config = AutoConfig.from_pretrained(model_dir)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+        self.fields = sorted({label[2:] for label in self.labels if label[:2] in ("B-", "I-")})
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+        self.max_tokens = max_tokens or FIELD_MODEL_MAX_TOKENS
+        self.stride = FIELD_MODEL_STRIDE if stride is None else stride
+        self.runner = _runner(model_dir, runtime or FIELD_MODEL_RUNTIME,
+                              FIELD_MODEL_THREADS if threads is None else threads)
+        self.fingerprint = field_model_fingerprint(model_dir)
+        self.batcher = MicroBatcher(
+            self._forward,
+            max_batch_size=max_batch_size or FIELD_MODEL_MAX_BATCH,
+            max_wait_ms=FIELD_MODEL_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            buckets=LENGTH_BUCKETS,
+            name="field-model",
+        )
+
+    def _forward(self, windows: list) -> list:
+        """One padded forward pass over a batch of token id lists; label ids per window."""
+        import numpy as np
+        width = max(len(ids) for ids in windows)
+        input_ids = np.full((len(windows), width), self.tokenizer.pad_token_id or 0, dtype=np.int64)
+        attention_mask = np.zeros((len(windows), width), dtype=np.int64)
+        for row, ids in enumerate(windows):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        predictions = np.asarray(self.runner(input_ids, attention_mask)).argmax(axis=-1)
+        return [predictions[row, :len(ids)] for row, ids in enumerate(windows)]
+
+    def windows(self, text: str) -> list:
+        """[(token ids, character offsets)] covering the text in overlapping windows."""
+        encoding = self.tokenizer(text, truncation=True, max_length=self.max_tokens, stride=self.stride,
+                                  return_overflowing_tokens=True, return_offsets_mapping=True)
+        return list(zip(encoding["input_ids"], encoding["offset_mapping"]))
+
+    def _spans(self, text: str, windows: list, predictions: list) -> dict:
+        found = {}
+        for (_, offsets), labels in zip(windows, predictions):
+            field, start, end = None, None, None
+            for (char_start, char_end), label_id in zip(offsets, labels):
+                if char_start == char_end:  # special / padding token
+                    continue
+                label = self.labels[int(label_id)]
+                tag, name = label[:2], label[2:]
+                if field is not None and tag == "I-" and name == field and char_start >= end:
+                    end = char_end
+                    continue
+                if field is not None:
+                    found.setdefault(field, text[start:end].strip())
+                field, start, end = (name, char_start, char_end) if tag in ("B-", "I-") else (None, None, None)
+            if field is not None:
+                found.setdefault(field, text[start:end].strip())
+        return {field: value for field, value in found.items() if value}
+
+    def extract(self, text: str) -> dict:
+        """{field: first tagged value} for one text (windows are batched with every other caller's)."""
+        return self.extract_batch([text])[0]
+
+    def extract_batch(self, texts) -> list:
+        """extract() for several texts; all their windows are submitted at once."""
+        texts = [text or "" for text in texts]
+        windows = [self.windows(text) if text.strip() else [] for text in texts]
+        futures = [[self.batcher.submit(ids) for ids, _ in doc_windows] for doc_windows in windows]
+        return [self._spans(text, doc_windows, [future.result() for future in doc_futures])
+                for text, doc_windows, doc_futures in zip(texts, windows, futures)]
+
+    def stats(self) -> dict:
+        """Micro-batching counters (batches, mean and max batch size, padding)."""
+        return self.batcher.stats()
+
+
+def load_field_model(path: str = None):
+    """The checkpoint at `path` (default FIELD_MODEL_PATH), or None when there is none."""
+    path = path or FIELD_MODEL_PATH
+    if not os.path.exists(os.path.join(path, "config.json")):
+        print(f"ℹ️ No field extraction model at {path}; using regex rules.")
+        return None
+    return FieldModel(path)
+
+
+# ---------------------------------------------------------------------
+# 🧪 Tiny local checkpoint
+# ---------------------------------------------------------------------
+FIELD_LABELS = ("invoice_no", "total_amount", "date", "name", "email", "phone", "title", "summary")
+_SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def make_tiny_checkpoint(path: str, onnx: bool = False, seed: int = 0) -> str:
+    """
+    Randomly initialized 2-layer BERT token classifier with a vocabulary
+    built from the synthetic benchmark documents. Predictions are noise; it
+    exercises loading, quantization, batching and decoding end to end.
+    """
+    import torch
+    from transformers import BertConfig, BertForTokenClassification, BertTokenizerFast
+    from benchmarks.synthetic import KINDS, document_pages
+
+    os.makedirs(path, exist_ok=True)
+    words = set()
+    for kind in KINDS:
+        for page in document_pages(kind, pages=1, seed=seed):
+            for line in page:
+                words.update(re.findall(r"\w+|[^\w\s]", line.lower()))
+    characters = sorted({ch for word in words for ch in word})
+    vocab = _SPECIAL_TOKENS + sorted(words | set(characters)) + [f"##{ch}" for ch in characters]
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(vocab) + "\n")
+    BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True).save_pretrained(path)
+
+    labels = ["O"] + [f"{tag}{field}" for field in FIELD_LABELS for tag in ("B-", "I-")]
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=512,
+                        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)})
+    torch.manual_seed(seed)
+    model = BertForTokenClassification(config).eval()
+    model.save_pretrained(path)
+    if onnx:
+        export_onnx(model, path)
+    return path
+
+
+def export_onnx(model, path: str):
+    """model.onnx with dynamic batch / sequence axes, plus model.int8.onnx when onnxruntime can quantize."""
+    import torch
+    onnx_path = os.path.join(path, "model.onnx")
+    example = torch.ones((1, 8), dtype=torch.long)
+    torch.onnx.export(model, (example, example), onnx_path, input_names=["input_ids", "attention_mask"],
+                      output_names=["logits"], opset_version=17,
+                      dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                                    "attention_mask": {0: "batch", 1: "sequence"},
+                                    "logits": {0: "batch", 1: "sequence"}})
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        return
+    quantize_dynamic(onnx_path, os.path.join(path, "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Field extraction model utilities.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    tiny = commands.add_parser("make-tiny", help="Write a tiny random checkpoint for local testing")
+    tiny.add_argument("path", nargs="?", default=FIELD_MODEL_PATH)
+    tiny.add_argument("--onnx", action="store_true", help="Also export model.onnx / model.int8.onnx")
+    args = parser.parse_args(argv)
+    print(f"✅ Tiny field model written to {make_tiny_checkpoint(args.path, onnx=args.onnx)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+services/fields.py
+Declarative field-extraction rules, compiled once at import time.
+- Each document type lists its field patterns and (optionally) a skill vocabulary.
+- All fields of a type are found in ONE left-to-right pass: a combined scanner
+  stops only where some missing field can start. Results equal a separate
+  re.search per field (first match wins) without rescanning per field.
+- Vocabularies (skills, type keywords) are compiled into one prefix-trie regex
+  and matched in one pass, so cost stays linear in text length as they grow.
+"""
+
+import re
+
+# ---------------------------------------------------------------------
+# 📋 Rule tables
+# ---------------------------------------------------------------------
+# Document type keywords, in priority order (first type with a hit wins).
+DOCUMENT_TYPE_KEYWORDS = {
+    "invoice": ["invoice", "amount", "bill", "gst", "total due", "billed to"],
+    "resume": ["resume", "curriculum vitae", "experience", "education", "skills", "objective"],
+    "report": ["report", "summary", "findings", "analysis", "project report"],
+}
+
+# (field, pattern, flags, group, postprocess) — group 0 = whole match
+FIELD_RULES = {
+    "invoice": [
+        ("invoice_no", r"invoice\s*(?:no|number|#)[:\s-]*([A-Z0-9-]+)", re.IGNORECASE, 1, str.strip),
+        ("total_amount", r"(?:total\s*(?:amount)?|amount\s*(?:due|payable)?)[\s:₹$]*([\d,]+(?:\.\d{1,2})?)",
+         re.IGNORECASE, 1, str.strip),
+        ("date", r"\b(?:\d{2}[/-]\d{2}[/-]\d{4}|\d{4}[/-]\d{2}[/-]\d{2})\b", 0, 0, None),
+    ],
+    "resume": [
+        ("name", r"Name[:\s]*([A-Z][A-Za-z\s]+)", 0, 1, str.strip),
+        ("email", r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", 0, 0, str.lower),
+        ("phone", r"\b(?:\+91[-\s]?)?\d{10}\b", 0, 0, None),
+    ],
+    "report": [
+        ("title", r"(?:Report Title|Title)[:\s]*(.*)", 0, 1, str.strip),
+        ("date", r"\b(?:\d{2}[/-]\d{2}[/-]\d{4}|\d{4}[/-]\d{2}[/-]\d{2})\b", 0, 0, None),
+        ("summary", r"(?:Summary|Abstract)[:\s]*(.*)", 0, 1, str.strip),
+    ],
+}
+
+# Vocabularies matched case-insensitively as whole terms ("Java" ≠ "JavaScript")
+SKILL_VOCABULARIES = {
+    "resume": [
+        "Python", "Java", "C++", "AI", "Machine Learning", "Deep Learning",
+        "Data Science", "NLP", "TensorFlow", "PyTorch", "SQL", "Flask", "Django"
+    ],
+}
+
+
+# ---------------------------------------------------------------------
+# 🛠️ Compilation helpers
+# ---------------------------------------------------------------------
+def _normalize_term(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+def _is_term_char(ch: str) -> bool:
+    return ch.isalnum() or ch in "+#"
+
+
+def trie_pattern(terms) -> str:
+    """
+    Build a regex matching any of `terms` (normalized to lowercase) from a
+    character trie, so shared prefixes are tested once. Whitespace inside a
+    term matches any whitespace run (OCR often breaks "Machine Learning"
+    across lines). The longest term at a position wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in _normalize_term(term):
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [(r"\s+" if ch == " " else re.escape(ch)) + emit(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie) if trie else "(?!)"
+
+
+class Vocabulary:
+    """
+    A set of terms compiled into one trie regex and matched over lowercased
+    text in a single left-to-right pass (every occurrence, overlaps included).
+    whole_words=True requires non-alphanumeric neighbours ("Java" ≠ "JavaScript").
+    """
+
+    def __init__(self, terms, whole_words: bool = False):
+        self.terms = list(terms)
+        pattern = trie_pattern(self.terms)
+        if whole_words:
+            pattern = r"(?<![a-z0-9])" + pattern + r"(?![a-z0-9+#])"
+        self._regex = re.compile(pattern)
+
+        # A match reports the longest term at its position; shorter terms that
+        # are prefixes of it (and end on a term boundary) matched there too.
+        normalized = {_normalize_term(t) for t in self.terms}
+        self._implied = {
+            n: frozenset(m for m in normalized
+                         if n.startswith(m) and (not whole_words or len(m) == len(n) or not _is_term_char(n[len(m)])))
+            for n in normalized
+        }
+
+    def __len__(self):
+        return len(self._implied)
+
+    def iter_matches(self, lowered: str):
+        """Yield the normalized terms found in already-lowercased text."""
+        search = self._regex.search
+        m = search(lowered)
+        while m:
+            yield from self._implied[_normalize_term(m.group(0))]
+            m = search(lowered, m.start() + 1)
+
+
+# ---------------------------------------------------------------------
+# ⚙️ Engines
+# ---------------------------------------------------------------------
+class FieldEngine:
+    """Compiled extractor for one document type."""
+
+    def __init__(self, field_rules, skills=None):
+        self.rules = [(name, re.compile(pattern, flags), group, post)
+                      for name, pattern, flags, group, post in field_rules]
+        self._sources = [(f"(?i:{pattern})" if flags & re.IGNORECASE else f"(?:{pattern})")
+                         for _, pattern, flags, _, _ in field_rules]
+        self._scanners = {}  # tuple of missing rule indexes -> combined regex
+        self.skills = list(skills or [])
+        self.vocabulary = Vocabulary(self.skills, whole_words=True) if self.skills else None
+
+    def _scanner(self, missing):
+        scanner = self._scanners.get(missing)
+        if scanner is None:
+            scanner = re.compile("|".join(self._sources[i] for i in missing))
+            self._scanners[missing] = scanner
+        return scanner
+
+    def _extract_fields(self, text: str) -> dict:
+        """
+        One left-to-right pass: the combined scanner stops wherever any missing
+        field can start, every missing rule is tried there, and found fields
+        drop out of the scanner. Same result as one re.search per field.
+        """
+        found = {}
+        missing = tuple(range(len(self.rules)))
+        pos = 0
+        while missing:
+            hit = self._scanner(missing).search(text, pos)
+            if hit is None:
+                break
+            pos = hit.start()
+            still_missing = []
+            for i in missing:
+                name, regex, group, post = self.rules[i]
+                m = regex.match(text, pos)
+                if m:
+                    value = m.group(group)
+                    found[name] = post(value) if post else value
+                else:
+                    still_missing.append(i)
+            missing = tuple(still_missing)
+            pos += 1
+        return found
+
+    def extract(self, text: str) -> dict:
+        found = self._extract_fields(text) if text else {}
+        fields = {name: found.get(name) for name, _, _, _ in self.rules}
+        if self.vocabulary is not None:
+            seen = set()
+            for term in self.vocabulary.iter_matches((text or "").lower()):
+                seen.add(term)
+                if len(seen) == len(self.vocabulary):
+                    break
+            fields["skills"] = [s for s in self.skills if _normalize_term(s) in seen]
+        return fields
+
+
+class KeywordClassifier:
+    """Single-pass keyword scan; the highest-priority type with any hit wins."""
+
+    def __init__(self, keywords_by_type: dict):
+        self.types = list(keywords_by_type)
+        self._rank = {}
+        for rank, words in enumerate(keywords_by_type.values()):
+            for word in words:
+                self._rank.setdefault(_normalize_term(word), rank)
+        self.vocabulary = Vocabulary(self._rank)
+
+    def classify(self, text: str) -> str:
+        best = len(self.types)
+        for term in self.vocabulary.iter_matches((text or "").lower()):
+            best = min(best, self._rank[term])
+            if best == 0:
+                break  # nothing can outrank the first type
+        return self.types[best] if best < len(self.types) else "unknown"
+
+
+# ✅ Compiled once per process
+DOCUMENT_CLASSIFIER = KeywordClassifier(DOCUMENT_TYPE_KEYWORDS)
+FIELD_ENGINES = {
+    doc_type: FieldEngine(rules, SKILL_VOCABULARIES.get(doc_type))
+    for doc_type, rules in FIELD_RULES.items()
+}
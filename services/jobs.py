@@ -0,0 +1,260 @@
+"""
+services/jobs.py
+Asynchronous analysis jobs backed by SQLite (no external broker).
+- POST /jobs stores the upload on disk and returns a job id immediately.
+- JobRunner (a thread in the API process) claims queued jobs and runs them
+  on the worker pool; workers write per-stage progress straight to SQLite.
+- Jobs left "running" by a process that no longer exists are re-queued on
+  startup, so work survives an API restart.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from services.document import Document
+from services.pipeline import analyze_file, STAGES
+
+# ✅ Job queue configuration
+JOBS_DIR = os.getenv("JOBS_DIR", ".jobs")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "0"))  # 0 → one job per pool worker
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,          -- queued | running | done | failed
+    filename    TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    stage       TEXT,
+    progress    TEXT NOT NULL DEFAULT '{}',
+    result      TEXT,
+    error       TEXT,
+    runner_pid  INTEGER,
+    ocr_engine  TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite job table plus one input file per job under `directory`."""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or JOBS_DIR
+        self.db_path = os.path.join(self.directory, "jobs.sqlite3")
+        self.inputs_dir = os.path.join(self.directory, "inputs")
+        os.makedirs(self.inputs_dir, exist_ok=True)
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "ocr_engine" not in columns:  # stores created before per-job OCR engines
+                conn.execute("ALTER TABLE jobs ADD COLUMN ocr_engine TEXT")
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _input_path(self, job_id: str) -> str:
+        return os.path.join(self.inputs_dir, job_id)
+
+    # -----------------------------------------------------------------
+    def create(self, doc: Document, result: dict = None, ocr_engine: str = None) -> str:
+        """Queue a job for doc (or record it as done right away when result is known)."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        if result is None:
+            with open(self._input_path(job_id), "wb") as fh:
+                fh.write(doc.data)
+            status, progress = "queued", {}
+        else:
+            status, progress = "done", {stage: "done" for stage in STAGES}
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, sha256, progress, result, ocr_engine, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, doc.filename, doc.sha256, json.dumps(progress),
+                 json.dumps(result) if result is not None else None, ocr_engine, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        with self._db() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "sha256": row["sha256"],
+            "stage": row["stage"],
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "ocr_engine": row["ocr_engine"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def load_input(self, job_id: str) -> Document:
+        row = self.get(job_id)
+        with open(self._input_path(job_id), "rb") as fh:
+            return Document(fh.read(), row["filename"])
+
+    # -----------------------------------------------------------------
+    def claim_next(self):
+        """Atomically move the oldest queued job to running; returns its id or None."""
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', runner_pid = ?, updated_at = ? WHERE id = ?",
+                    (os.getpid(), time.time(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        return row["id"] if row is not None else None
+
+    def set_stage(self, job_id: str, stage: str, state: str):
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            progress = json.loads(row["progress"]) if row else {}
+            progress[stage] = state
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(progress), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+
+    def finish(self, job_id: str, result: dict = None, error: str = None):
+        status = "failed" if error else "done"
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        try:
+            os.remove(self._input_path(job_id))
+        except OSError:
+            pass
+
+    def recover(self) -> int:
+        """Re-queue jobs whose runner process is gone (e.g. after an API restart)."""
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, runner_pid FROM jobs WHERE status = 'running'").fetchall()
+            stale = [r["id"] for r in rows if r["runner_pid"] == os.getpid() or not _pid_alive(r["runner_pid"])]
+            for job_id in stale:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', runner_pid = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+            conn.execute("COMMIT")
+        return len(stale)
+
+
+# ---------------------------------------------------------------------
+# ⚙️ Worker-side entry point (runs inside the pool)
+# ---------------------------------------------------------------------
+def run_job(job_id: str, directory: str):
+    store = JobStore(directory)
+    try:
+        doc = store.load_input(job_id)
+        result = analyze_file(doc, on_stage=lambda stage, state: store.set_stage(job_id, stage, state),
+                              ocr_engine=store.get(job_id)["ocr_engine"])
+    except Exception as e:
+        store.finish(job_id, error=str(e))
+        return None
+    # The stored result stays timing-free like cached ones; the timings go back to the
+    # API process (JobRunner.on_result), which feeds them into the stage histograms.
+    store.finish(job_id, result={k: v for k, v in result.items() if k != "timings"})
+    return result
+
+
+# ---------------------------------------------------------------------
+# 🧵 Dispatcher (runs in the API process)
+# ---------------------------------------------------------------------
+class JobRunner:
+    """Background thread that feeds queued jobs into the worker pool."""
+
+    def __init__(self, store: JobStore, pool, concurrency: int = None, on_result=None):
+        self.store = store
+        self.pool = pool
+        self.concurrency = max(1, concurrency or JOB_CONCURRENCY or pool.max_workers)
+        self.on_result = on_result  # called with (job_id, result) for finished jobs
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        recovered = self.store.recover()
+        if recovered:
+            print(f"♻️ Re-queued {recovered} interrupted job(s)")
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def notify(self):
+        """Wake the dispatcher after a new job was queued."""
+        self._wakeup.set()
+
+    def _done(self, job_id, future):
+        with self._lock:
+            self._running.discard(job_id)
+        try:
+            result = future.result()
+        except Exception as e:  # worker crashed before it could record anything
+            self.store.finish(job_id, error=f"worker failure: {e}")
+            result = None
+        if result is not None and self.on_result:
+            self.on_result(job_id, result)
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                has_room = len(self._running) < self.concurrency
+            job_id = self.store.claim_next() if has_room else None
+            if job_id is None:
+                self._wakeup.wait(JOB_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            with self._lock:
+                self._running.add(job_id)
+            future = self.pool.submit(run_job, job_id, self.store.directory, block=True)
+            future.add_done_callback(lambda f, job_id=job_id: self._done(job_id, f))
@@ -0,0 +1,205 @@
+"""
+services/layout.py
+Word-level page layout: every word of a page with its bounding box.
+- WordBoxes keeps the words as a list and their boxes / line numbers as
+  NumPy arrays (16 bytes per box), so a page of a few thousand words stays
+  small enough to memoize on the Document.
+- Built from Tesseract image_to_data, from OCR text lines (PaddleOCR) or
+  from the PDF text layer (PyMuPDF words).
+- find(value) maps an extracted field value back to the region(s) it was
+  read from: one box per text line the value spans.
+- pack_pages() / unpack_pages() store a document's layout compactly
+  (boxes quantized to uint16, zlib-compressed) for services.document_store.
+"""
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+# Punctuation around a word that should not stop a field value from matching
+# ("Total:", "₹1,200.00", "(555)" ...)
+_EDGE_CHARS = "\"'`.,:;!?()[]{}<>|*#₹$€£%"
+
+
+def word_key(word: str) -> str:
+    return word.strip(_EDGE_CHARS).lower()
+
+
+class WordBoxes:
+    """
+    Words of one page in reading order.
+    boxes: float32 (n, 4) x0, y0, x1, y1; fractions of the page size once
+    normalized(), source pixels/points before that.
+    lines: int32 (n,) text line of each word (increasing in reading order).
+    size: (width, height) of the page in its source units (pixels or points).
+    """
+
+    __slots__ = ("words", "boxes", "lines", "size", "_keys")
+
+    def __init__(self, words, boxes, lines=None, size=(1.0, 1.0)):
+        self.words = list(words)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.lines = np.asarray(np.arange(len(self.words)) if lines is None else lines, dtype=np.int32)
+        self.size = (float(size[0]), float(size[1]))
+        self._keys = None
+
+    @classmethod
+    def empty(cls) -> "WordBoxes":
+        return cls([], np.zeros((0, 4)))
+
+    def __len__(self):
+        return len(self.words)
+
+    def normalized(self, size, to_source=None) -> "WordBoxes":
+        """
+        Boxes as fractions of a page of `size` (width, height); to_source
+        first maps the boxes back to that page (e.g. undoing preprocessing).
+        """
+        boxes = self.boxes if to_source is None else to_source(self.boxes)
+        scale = np.array([size[0], size[1], size[0], size[1]], dtype=np.float32)
+        return WordBoxes(self.words, np.clip(boxes / scale, 0.0, 1.0), self.lines, size)
+
+    # -----------------------------------------------------------------
+    # 🔎 Field value → regions
+    # -----------------------------------------------------------------
+    @property
+    def keys(self) -> np.ndarray:
+        if self._keys is None:
+            self._keys = np.array([word_key(w) for w in self.words], dtype=str)
+        return self._keys
+
+    def find(self, value) -> list:
+        """
+        Boxes ([x0, y0, x1, y1], one per text line) of the first occurrence of
+        `value` as a run of consecutive words; [] when it is not on the page.
+        A single-word value also matches inside a longer word ("No:INV-7").
+        """
+        tokens = [key for key in (word_key(t) for t in str(value).split()) if key]
+        if not tokens or not len(self):
+            return []
+        keys, count = self.keys, len(tokens)
+        for start in np.flatnonzero(keys == tokens[0]):
+            if start + count <= len(keys) and list(keys[start:start + count]) == tokens:
+                return self._line_boxes(start, start + count)
+        if count == 1:
+            inside = np.flatnonzero(np.char.find(keys, tokens[0]) >= 0)
+            if len(inside):
+                return self._line_boxes(inside[0], inside[0] + 1)
+        return []
+
+    def _line_boxes(self, start: int, stop: int) -> list:
+        boxes, lines = self.boxes[start:stop], self.lines[start:stop]
+        regions = []
+        for line in np.unique(lines):
+            b = boxes[lines == line]
+            regions.append([float(b[:, 0].min()), float(b[:, 1].min()), float(b[:, 2].max()), float(b[:, 3].max())])
+        return regions
+
+
+# ---------------------------------------------------------------------
+# 🏗️ Builders
+# ---------------------------------------------------------------------
+def from_tesseract_data(data: dict, size) -> tuple:
+    """
+    (text, WordBoxes in image pixels) from pytesseract.image_to_data(...,
+    output_type=Output.DICT). Text is rebuilt like image_to_string: words of
+    a line joined by spaces, lines by newlines, blocks by a blank line.
+    """
+    words, boxes, lines = [], [], []
+    out_lines, current, last_block = [], None, None
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        if not word or float(data["conf"][i]) < 0:
+            continue
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if line_key != current:
+            if last_block is not None and line_key[0] != last_block:
+                out_lines.append([])
+            out_lines.append([])
+            current, last_block = line_key, line_key[0]
+        out_lines[-1].append(word)
+        left, top = data["left"][i], data["top"][i]
+        words.append(word)
+        boxes.append((left, top, left + data["width"][i], top + data["height"][i]))
+        lines.append(len(out_lines) - 1)
+    text = "\n".join(" ".join(line) for line in out_lines)
+    return text, WordBoxes(words, np.array(boxes, dtype=np.float32).reshape(-1, 4), lines, size)
+
+
+def from_text_lines(text_lines, size) -> tuple:
+    """
+    (text, WordBoxes) from recognized lines [(text, [x0, y0, x1, y1])], as
+    produced by line-level engines (PaddleOCR). Each word gets the slice of
+    its line box proportional to its character span.
+    """
+    words, boxes, lines, out_lines = [], [], [], []
+    for number, (line, (x0, y0, x1, y1)) in enumerate(text_lines):
+        out_lines.append(line)
+        per_char = (x1 - x0) / max(1, len(line))
+        position = 0
+        for word in line.split():
+            start = line.index(word, position)
+            position = start + len(word)
+            words.append(word)
+            boxes.append((x0 + start * per_char, y0, x0 + position * per_char, y1))
+            lines.append(number)
+    return "\n".join(out_lines), WordBoxes(words, np.array(boxes, dtype=np.float32).reshape(-1, 4), lines, size)
+
+
+def from_mupdf_words(entries, size) -> WordBoxes:
+    """
+    WordBoxes (normalized) from PyMuPDF page.get_text("words") entries:
+    (x0, y0, x1, y1, word, block_no, line_no, word_no), in points.
+    """
+    words, boxes, lines, line_ids = [], [], [], {}
+    for x0, y0, x1, y1, word, block, line, _ in entries:
+        words.append(word)
+        boxes.append((x0, y0, x1, y1))
+        lines.append(line_ids.setdefault((block, line), len(line_ids)))
+    raw = WordBoxes(words, np.array(boxes, dtype=np.float32).reshape(-1, 4), lines, size)
+    return raw.normalized(size)
+
+
+# ---------------------------------------------------------------------
+# 📦 Compact serialization
+# ---------------------------------------------------------------------
+_BOX_SCALE = 65535  # normalized coordinates stored as uint16 (page / 65535 precision)
+
+
+def pack_pages(pages: dict) -> bytes:
+    """
+    zlib blob of {page index: normalized WordBoxes}: a JSON header (page
+    sizes, word counts, words) followed by uint16 boxes and int32 line numbers.
+    """
+    items = sorted(pages.items())
+    header = {
+        "pages": [[index, len(words), words.size[0], words.size[1]] for index, words in items],
+        "words": "\n".join(w for _, words in items for w in words.words),  # words never contain whitespace
+    }
+    boxes = np.concatenate([words.boxes for _, words in items] or [np.zeros((0, 4), np.float32)])
+    lines = np.concatenate([words.lines for _, words in items] or [np.zeros(0, np.int32)])
+    encoded = json.dumps(header).encode("utf-8")
+    quantized = np.rint(np.clip(boxes, 0, 1) * _BOX_SCALE).astype("<u2")
+    return zlib.compress(struct.pack("<I", len(encoded)) + encoded + quantized.tobytes()
+                         + lines.astype("<i4").tobytes(), 6)
+
+
+def unpack_pages(blob: bytes) -> dict:
+    """Inverse of pack_pages (boxes come back within 1/65535 of the page size)."""
+    raw = zlib.decompress(blob)
+    size = struct.unpack_from("<I", raw)[0]
+    header = json.loads(raw[4:4 + size].decode("utf-8"))
+    total = sum(count for _, count, _, _ in header["pages"])
+    words = header["words"].split("\n") if total else []
+    offset = 4 + size
+    boxes = np.frombuffer(raw, dtype="<u2", count=total * 4, offset=offset).reshape(-1, 4)
+    lines = np.frombuffer(raw, dtype="<i4", count=total, offset=offset + total * 8)
+    pages, start = {}, 0
+    for index, count, width, height in header["pages"]:
+        stop = start + count
+        pages[index] = WordBoxes(words[start:stop], boxes[start:stop].astype(np.float32) / _BOX_SCALE,
+                                 lines[start:stop], (width, height))
+        start = stop
+    return pages
@@ -0,0 +1,137 @@
+"""
+services/metrics.py
+Per-stage latency instrumentation.
+- Stages add their wall time to a plain dict of timings (a few perf_counter
+  calls per request, so the overhead is negligible).
+- The API process aggregates those timings into fixed-bucket histograms per
+  (stage, document type) and renders them in Prometheus text format, together
+  with p50 / p95 / p99 estimates.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency buckets: 1 ms … 2 min
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def add_time(timings: dict, name: str, seconds: float):
+    """Accumulate `seconds` under `name` (stages can run more than once per request)."""
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(timings: dict, name: str):
+    """Time the enclosed block into timings[name]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(timings, name, time.perf_counter() - started)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with quantile estimates."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / n, self.max)
+            cumulative += n
+        return self.max
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in labels.items())
+
+
+class StageMetrics:
+    """Thread-safe registry of stage histograms keyed by (stage, document type)."""
+
+    def __init__(self, prefix: str = "idu"):
+        self.prefix = prefix
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, timings: dict, document_type: str):
+        with self._lock:
+            for stage, seconds in timings.items():
+                key = (stage, document_type or "unknown")
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.observe(seconds)
+
+    def summary(self) -> dict:
+        """{stage: {document_type: {"count", "p50", "p95", "p99"}}} for quick inspection."""
+        out = {}
+        with self._lock:
+            for (stage, doc_type), h in sorted(self._histograms.items()):
+                out.setdefault(stage, {})[doc_type] = {
+                    "count": h.count,
+                    **{f"p{int(q * 100)}": round(h.quantile(q), 6) for q in QUANTILES},
+                }
+        return out
+
+    def render(self, gauges: dict = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Wall time per pipeline stage.", f"# TYPE {name} histogram"]
+        quantile_lines = []
+        with self._lock:
+            for (stage, doc_type), h in sorted(self._histograms.items()):
+                labels = _labels(stage=stage, document_type=doc_type)
+                cumulative = 0
+                for bound, n in zip(self.buckets_of(h), h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+                for q in QUANTILES:
+                    quantile_lines.append(
+                        f'{self.prefix}_stage_duration_quantile_seconds{{{labels},quantile="{q}"}} {h.quantile(q):.6f}'
+                    )
+        if quantile_lines:
+            lines.append(f"# HELP {self.prefix}_stage_duration_quantile_seconds Estimated latency quantiles per stage.")
+            lines.append(f"# TYPE {self.prefix}_stage_duration_quantile_seconds gauge")
+            lines.extend(quantile_lines)
+        for gauge, (help_text, samples) in (gauges or {}).items():
+            lines.append(f"# HELP {self.prefix}_{gauge} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            for labels, value in samples:
+                lines.append(f"{self.prefix}_{gauge}{{{_labels(**labels)}}} {value}" if labels
+                             else f"{self.prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def buckets_of(h: Histogram):
+        return [*(repr(b) for b in h.buckets), "+Inf"]
+
+
+# ✅ Shared registry used by the API process
+stage_metrics = StageMetrics()
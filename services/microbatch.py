@@ -0,0 +1,126 @@
+"""
+services/microbatch.py
+Dynamic micro-batching for model inference.
+- Callers submit single inputs (thread-safe) and get a Future; one batching
+  thread gathers concurrent submissions and runs fn(list of inputs) once
+  per batch, which is where a CPU model gets its throughput.
+- A batch is flushed when it reaches max_batch_size or when its oldest input
+  has waited max_wait_ms, so a lone request pays at most that much latency.
+- Inputs are queued per length bucket (e.g. ≤32, ≤64, … tokens) and batches
+  never mix buckets: padding each batch to its longest input then wastes
+  at most one bucket step instead of the longest input of the whole queue.
+"""
+
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class _Item:
+    __slots__ = ("value", "length", "future", "deadline")
+
+    def __init__(self, value, length: int, deadline: float):
+        self.value = value
+        self.length = length
+        self.future = Future()
+        self.deadline = deadline
+
+
+class MicroBatcher:
+    """Run fn(batch) -> results (one per input, same order) over dynamically gathered batches."""
+
+    def __init__(self, fn, max_batch_size: int = 16, max_wait_ms: float = 5.0, buckets=(), length=len,
+                 name: str = "microbatch"):
+        self.fn = fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.buckets = sorted(buckets)  # upper length bounds; longer inputs share one last bucket
+        self.length = length
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.counters = {"batches": 0, "items": 0, "padded": 0, "tokens": 0, "max_batch": 0}
+
+    # -----------------------------------------------------------------
+    def submit(self, value) -> Future:
+        """Queue one input; the Future resolves to its result (or fn's exception)."""
+        self._ensure_running()
+        item = _Item(value, self.length(value), time.monotonic() + self.max_wait)
+        self._queue.put(item)
+        return item.future
+
+    def map(self, values) -> list:
+        """Submit several inputs (e.g. every window of a document) and wait for all results."""
+        futures = [self.submit(value) for value in values]
+        return [future.result() for future in futures]
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        batches = counters["batches"] or 1
+        counters["mean_batch"] = round(counters["items"] / batches, 2)
+        counters["padding_ratio"] = round(counters["padded"] / counters["tokens"], 3) if counters["tokens"] else 0.0
+        return counters
+
+    # -----------------------------------------------------------------
+    def _ensure_running(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _bucket(self, length: int) -> int:
+        return bisect.bisect_left(self.buckets, length)
+
+    def _loop(self):
+        pending = {}  # bucket -> [_Item], oldest first
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(items[0].deadline for items in pending.values()) - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                for items in pending.values():
+                    self._run(items)
+                return
+            if item is not None:
+                items = pending.setdefault(self._bucket(item.length), [])
+                items.append(item)
+                if len(items) >= self.max_batch_size:
+                    self._run(pending.pop(self._bucket(item.length)))
+            now = time.monotonic()
+            for bucket in [b for b, items in pending.items() if items[0].deadline <= now]:
+                self._run(pending.pop(bucket))
+
+    def _run(self, items):
+        try:
+            results = self.fn([item.value for item in items])
+        except Exception as e:  # the callers see the failure; the batching thread keeps going
+            for item in items:
+                item.future.set_exception(e)
+        else:
+            for item, result in zip(items, results):
+                item.future.set_result(result)
+        longest = max(item.length for item in items)
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["items"] += len(items)
+            self.counters["max_batch"] = max(self.counters["max_batch"], len(items))
+            self.counters["tokens"] += sum(item.length for item in items)
+            self.counters["padded"] += sum(longest - item.length for item in items)
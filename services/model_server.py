@@ -0,0 +1,121 @@
+"""
+services/model_server.py
+One field extraction model per host, shared by every pool worker.
+- With EXTRACTION_BACKEND=transformer, the API process (and the batch
+  runner) start a model server: a multiprocessing manager process that loads
+  the checkpoint once (services.field_model). Its address goes into the
+  environment the pool workers are spawned with (FIELD_MODEL_SERVER).
+- A worker's "extraction:transformer" backend is then a proxy to that model:
+  extract() sends the text and gets the fields back. The server runs each
+  client call in its own thread, so the windows of concurrent requests from
+  all workers meet in the model's MicroBatcher (grouped by length, up to
+  FIELD_MODEL_MAX_BATCH per forward pass, a partial batch flushed after
+  FIELD_MODEL_MAX_WAIT_MS) instead of OCR_WORKERS copies of the model each
+  running one document.
+- FIELD_MODEL_SERVING=local skips the server: every process loads its own copy.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+from multiprocessing.managers import BaseManager
+
+from services.pool import OCR_MP_START
+
+# ✅ Model serving configuration (override through environment variables)
+FIELD_MODEL_SERVING = os.getenv("FIELD_MODEL_SERVING", "shared")  # shared | local (one copy per process)
+
+# Environment variable carrying the running server's address to pool workers
+SERVER_ENV = "FIELD_MODEL_SERVER"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _served_model():
+    """The server's one FieldModel, loaded on first use (runs inside the server process)."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from services.field_model import load_field_model
+            _model = load_field_model()
+            if _model is None:
+                raise RuntimeError("no field extraction model to serve")
+    return _model
+
+
+class FieldModelManager(BaseManager):
+    """Manager hosting the field model; every client connection is served by its own thread."""
+
+
+FieldModelManager.register("FieldModel", callable=_served_model, exposed=("extract", "extract_batch", "stats"))
+
+
+def encode_address(address) -> str:
+    return json.dumps(address)
+
+
+def connect(address: str):
+    """Proxy to the served model (extract, extract_batch, stats) at an encode_address() string."""
+    address = json.loads(address)
+    manager = FieldModelManager(address=tuple(address) if isinstance(address, list) else address)
+    manager.connect()
+    return manager.FieldModel()
+
+
+class ModelServer:
+    """Starts and stops the model server of this process and the workers it spawns."""
+
+    def __init__(self):
+        self._manager = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._manager is not None
+
+    def start(self) -> bool:
+        """Start the server when the transformer backend is configured and a checkpoint exists."""
+        from services.field_model import FIELD_MODEL_PATH
+        from services.ocr import EXTRACTION_BACKEND
+        if (EXTRACTION_BACKEND != "transformer" or FIELD_MODEL_SERVING != "shared"
+                or not os.path.exists(os.path.join(FIELD_MODEL_PATH, "config.json"))):
+            return False
+        with self._lock:
+            if self._manager is not None:
+                return True
+            manager = FieldModelManager(ctx=multiprocessing.get_context(OCR_MP_START))
+            manager.start()
+            try:
+                manager.FieldModel().stats()  # load the checkpoint now, not on the first request
+            except Exception as e:
+                print(f"⚠️ Field model server failed to start, workers load their own model: {e}")
+                manager.shutdown()
+                return False
+            self._manager = manager
+            os.environ[SERVER_ENV] = encode_address(manager.address)  # inherited by pool workers
+        print(f"🧠 Field model server running at {manager.address}")
+        return True
+
+    def stats(self):
+        """Micro-batching counters of the served model, or None when no server runs."""
+        with self._lock:
+            manager = self._manager
+        if manager is None:
+            return None
+        try:
+            return manager.FieldModel().stats()
+        except Exception as e:  # the server process died
+            return {"error": str(e)}
+
+    def shutdown(self):
+        with self._lock:
+            manager, self._manager = self._manager, None
+            os.environ.pop(SERVER_ENV, None)
+        if manager is not None:
+            manager.shutdown()
+
+
+# ✅ Shared server handle (started by api.main and services.batch)
+model_server = ModelServer()
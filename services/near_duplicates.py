@@ -0,0 +1,260 @@
+"""
+services/near_duplicates.py
+Near-duplicate detection over OCR text (MinHash + locality-sensitive hashing).
+- The same invoice scanned twice, or re-exported with a new timestamp, has a
+  different SHA-256 and slightly different OCR text; exact-hash caching
+  misses it. Here a document is the set of its word 3-grams ("shingles"),
+  and two documents are near duplicates when the Jaccard similarity of
+  their shingle sets is at least NEAR_DUPLICATE_THRESHOLD.
+- MinHash: 128 salted hashes of the shingles, keeping the minimum of each;
+  the fraction of equal positions in two signatures estimates Jaccard.
+- LSH: the signature is cut into 32 bands of 4 values and each band hashed
+  to one 64-bit bucket key. Documents sharing any bucket are candidates, so
+  a lookup is 32 primary-key probes (SQLite, WITHOUT ROWID) plus a
+  comparison with the few candidates: well under a millisecond at hundreds
+  of thousands of documents, with no index held in memory.
+  P(candidate) = 1 - (1 - J^4)^32: 0.99 at J = 0.6, 0.05 at J = 0.2.
+- The pipeline looks each document up after OCR and adds it afterwards;
+  matches are only reported under "near_duplicate" by default. Two invoices
+  from one template can be 0.6 similar and still differ in number and
+  amount, so nothing is reused from a mere near match. With
+  NEAR_DUPLICATE_ACTION=reuse, a match with exactly the same text (after
+  whitespace normalization) or at least NEAR_DUPLICATE_REUSE_THRESHOLD
+  similar lends its stored document type; fields are always extracted from
+  the new text, and the decision is reused only when they come out equal.
+- The index is bounded: past NEAR_DUPLICATES_MAX_DOCUMENTS (or
+  NEAR_DUPLICATES_MAX_AGE_DAYS) the oldest signatures and their buckets are
+  pruned, checked every PRUNE_EVERY additions.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+# ✅ Near-duplicate index configuration (override through environment variables)
+NEAR_DUPLICATES_ENABLED = os.getenv("NEAR_DUPLICATES_ENABLED", "1") != "0"
+NEAR_DUPLICATES_PATH = os.getenv("NEAR_DUPLICATES_PATH", os.path.join(".cache", "near_duplicates.sqlite3"))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.6"))   # estimated Jaccard
+NEAR_DUPLICATE_ACTION = os.getenv("NEAR_DUPLICATE_ACTION", "flag")               # flag | reuse
+NEAR_DUPLICATE_REUSE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_REUSE_THRESHOLD", "0.95"))  # reuse below exact text
+NEAR_DUPLICATES_MAX_DOCUMENTS = int(os.getenv("NEAR_DUPLICATES_MAX_DOCUMENTS", "500000"))  # 0 = unbounded
+NEAR_DUPLICATES_MAX_AGE_DAYS = float(os.getenv("NEAR_DUPLICATES_MAX_AGE_DAYS", "365"))     # 0 = keep forever
+
+# MinHash / LSH shape (changing any of them needs a fresh index)
+NUM_PERM = 128
+BANDS, ROWS = 32, 4
+SHINGLE_WORDS = 3
+# Retention is enforced once every this many additions (per process)
+PRUNE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    id          INTEGER PRIMARY KEY,
+    sha256      TEXT NOT NULL,
+    ocr_engine  TEXT NOT NULL,
+    filename    TEXT,
+    signature   BLOB NOT NULL,            -- NUM_PERM little-endian uint32
+    text_sha256 TEXT,                     -- hash of the whitespace-normalized text
+    created_at  REAL NOT NULL,
+    UNIQUE (sha256, ocr_engine)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    key  INTEGER NOT NULL,                -- hash of one band of a signature
+    id   INTEGER NOT NULL,
+    PRIMARY KEY (key, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS signatures_created ON signatures (created_at);
+"""
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SHIFT_32 = np.uint64(32)
+
+
+class MinHasher:
+    """Shingles text and computes MinHash signatures and LSH bucket keys."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, shingle_words: int = SHINGLE_WORDS,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations do not split into {bands} bands")
+        self.num_perm, self.bands, self.rows = num_perm, bands, num_perm // bands
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: h(x) = high 32 bits of (a·x + b) mod 2^64, a odd
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self.band_salt = rng.integers(1, 1 << 63, bands, dtype=np.uint64)
+
+    def shingles(self, text: str):
+        """Unique 32-bit hashes of the word n-grams of the lowercased text."""
+        words = _WORD.findall((text or "").lower())
+        n = min(self.shingle_words, len(words))
+        if n == 0:
+            return np.zeros(0, dtype=np.uint64)
+        grams = {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str):
+        """uint32[num_perm] MinHash signature, or None for text without words."""
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+        with np.errstate(over="ignore"):
+            hashed = (np.outer(shingles, self.a) + self.b) >> _SHIFT_32  # uint64 arithmetic wraps around
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature) -> list:
+        """One signed 64-bit bucket key per band (band index salted in)."""
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = self.band_salt.copy()
+        with np.errstate(over="ignore"):
+            for column in range(self.rows):  # multiply-xor mixing; uint64 wraps around
+                keys = (keys ^ rows[:, column]) * np.uint64(0x100000001B3)
+                keys ^= keys >> np.uint64(29)
+        return keys.view(np.int64).tolist()
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 of the text with whitespace collapsed (same text, different bytes or layout)."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+def similarity(first, second) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(first == second)) / len(first)
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index of document signatures (SQLite)."""
+
+    def __init__(self, path: str = None, enabled: bool = None, threshold: float = None, hasher: MinHasher = None,
+                 max_documents: int = None, max_age_days: float = None):
+        self.path = path or NEAR_DUPLICATES_PATH
+        self.enabled = NEAR_DUPLICATES_ENABLED if enabled is None else enabled
+        self.threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.hasher = hasher or MinHasher()
+        self.max_documents = NEAR_DUPLICATES_MAX_DOCUMENTS if max_documents is None else max_documents
+        self.max_age_days = NEAR_DUPLICATES_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self._local = threading.local()  # one open connection per thread keeps lookups cheap
+        self._added = 0
+
+    @contextmanager
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            if "text_sha256" not in {row[1] for row in conn.execute("PRAGMA table_info(signatures)")}:
+                conn.execute("ALTER TABLE signatures ADD COLUMN text_sha256 TEXT")  # index from before the column
+            self._local.conn = conn
+        yield conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -----------------------------------------------------------------
+    def signature(self, text: str):
+        return self.hasher.signature(text)
+
+    def query(self, signature, exclude: str = None, threshold: float = None, text_sha256: str = None):
+        """
+        Most similar indexed document at or above the threshold, as
+        {"sha256", "ocr_engine", "filename", "similarity", "exact"}, or None.
+        `exclude` skips a content hash (the document itself); "exact" is True
+        when the match's text digest equals `text_sha256` (preferred on ties).
+        """
+        if signature is None:
+            return None
+        threshold = self.threshold if threshold is None else threshold
+        keys = self.hasher.band_keys(signature)
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT s.sha256, s.ocr_engine, s.filename, s.signature, s.text_sha256 FROM signatures s"
+                f" WHERE s.id IN (SELECT id FROM buckets WHERE key IN ({','.join('?' * len(keys))}))",
+                keys,
+            ).fetchall()
+        best = None
+        for sha256, ocr_engine, filename, blob, digest in rows:
+            if sha256 == exclude:
+                continue
+            score = similarity(signature, np.frombuffer(blob, dtype="<u4"))
+            exact = text_sha256 is not None and digest == text_sha256
+            if score >= threshold and (best is None or (exact, score) > (best["exact"], best["similarity"])):
+                best = {"sha256": sha256, "ocr_engine": ocr_engine, "filename": filename,
+                        "similarity": round(score, 4), "exact": exact}
+        return best
+
+    def add(self, sha256: str, ocr_engine: str, filename: str, signature, text_sha256: str = None) -> bool:
+        """Index a document (once per content hash + engine). True when it was new."""
+        if signature is None:
+            return False
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO signatures (sha256, ocr_engine, filename, signature, text_sha256, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha256, ocr_engine, filename, signature.astype("<u4").tobytes(), text_sha256, time.time()),
+                )
+                added = cursor.rowcount == 1
+                if added:
+                    conn.executemany("INSERT OR IGNORE INTO buckets (key, id) VALUES (?, ?)",
+                                     [(key, cursor.lastrowid) for key in self.hasher.band_keys(signature)])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if added:
+            self._added += 1
+            if self._added % PRUNE_EVERY == 0:
+                self.prune()
+        return added
+
+    def prune(self) -> int:
+        """Drop signatures past max_documents (oldest first) or max_age_days, with their buckets."""
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = []
+                if self.max_age_days:
+                    expired += conn.execute("SELECT id, signature FROM signatures WHERE created_at < ?",
+                                            (time.time() - self.max_age_days * 86400,)).fetchall()
+                if self.max_documents:
+                    excess = conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0] - self.max_documents
+                    if excess > 0:
+                        expired += conn.execute("SELECT id, signature FROM signatures ORDER BY created_at, id LIMIT ?",
+                                                (excess,)).fetchall()
+                expired = dict(expired)
+                # recompute each signature's band keys so the bucket deletes are primary-key lookups
+                conn.executemany("DELETE FROM buckets WHERE key = ? AND id = ?",
+                                 [(key, row_id) for row_id, blob in expired.items()
+                                  for key in self.hasher.band_keys(np.frombuffer(blob, dtype="<u4"))])
+                conn.executemany("DELETE FROM signatures WHERE id = ?", [(row_id,) for row_id in expired])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._db() as conn:
+            documents = conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+        return {"enabled": self.enabled, "documents": documents, "threshold": self.threshold,
+                "action": NEAR_DUPLICATE_ACTION, "reuse_threshold": NEAR_DUPLICATE_REUSE_THRESHOLD,
+                "max_documents": self.max_documents, "max_age_days": self.max_age_days}
+
+
+# ✅ Shared index (one per process; pool workers write directly, WAL mode)
+near_duplicate_index = NearDuplicateIndex()
@@ -1,55 +1,182 @@
 # services/ocr.py
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
 import re
 import os
-from PyPDF2 import PdfReader
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# ✅ Poppler path (update if needed)
-POPLER_PATH = r"C:\Users\Lakhan Pal\Downloads\Release-25.07.0-0\poppler-25.07.0\Library\bin"
+# Poppler path and rasterization DPI live with the shared Document
+from services.document import open_document, POPLER_PATH
+from services.backends import backends
+from services.metrics import add_time
+from services.pool import OCR_WORKERS
 
-# ✅ Tesseract path (update if installed elsewhere)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# ✅ Scanned-PDF OCR settings
+# Parallel Tesseract runs per document. Every one of the OCR_WORKERS pool
+# workers runs its own, so the default splits the cores between them
+# (1 per document with the default OCR_WORKERS = CPU count).
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, OCR_WORKERS)))))
+OCR_PAGE_BATCH = int(os.getenv("OCR_PAGE_BATCH", str(max(4, OCR_PAGE_WORKERS))))  # pages rasterized (and batched) at once
+# A PDF page whose text layer has fewer characters than this is OCR'd instead
+MIN_TEXT_LAYER_CHARS = int(os.getenv("MIN_TEXT_LAYER_CHARS", "16"))
+# ✅ Page budget for long PDFs (services.pipeline): classify from the first
+# PAGE_BUDGET_FIRST_PAGES pages, then read PAGE_BUDGET_STEP more at a time while
+# fields are missing, never past PAGE_BUDGET_MAX_PAGES (0 = read every page)
+PAGE_BUDGET_FIRST_PAGES = int(os.getenv("PAGE_BUDGET_FIRST_PAGES", "0"))
+PAGE_BUDGET_MAX_PAGES = int(os.getenv("PAGE_BUDGET_MAX_PAGES", "20"))
+PAGE_BUDGET_STEP = int(os.getenv("PAGE_BUDGET_STEP", str(OCR_PAGE_BATCH)))
+# ✅ Field extraction: "rules" (regex, services/fields.py) or "transformer" (services/field_model.py)
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "rules")
 
 
 # ---------------------------------------------------------------------
-# 🧩 OCR Text Extraction (supports PDF & image)
+# 🧩 Page-parallel OCR
 # ---------------------------------------------------------------------
-def extract_text_from_image(file_path: str) -> str:
+def _page_runs(indexes, batch: int):
+    """Split page indexes into contiguous runs of at most `batch` pages."""
+    run = []
+    for i in sorted(indexes):
+        if run and (i != run[-1] + 1 or len(run) >= batch):
+            yield run
+            run = []
+        run.append(i)
+    if run:
+        yield run
+
+
+def ocr_engine_name(name: str = None) -> str:
+    """Resolve a requested engine name (None → OCR_ENGINE default)."""
+    return name or backends.default("ocr")
+
+
+def _timed_recognize(engine, images):
+    """
+    [(text, WordBoxes normalized to the original page or None)], plus the
+    preprocessing and recognition seconds.
     """
-    Extract text from PDFs and image files using OCR.
-    Automatically detects file type and handles multi-page PDFs.
+    started = time.perf_counter()
+    sizes = [image.size for image in images]
+    geometries = [None] * len(images)
+    if engine.preprocess:
+        from services.preprocess import prepare_page  # NumPy loads with the first scan
+        images, geometries = zip(*[prepare_page(image) for image in images])
+    prepared = time.perf_counter()
+    pages = []
+    for (text, words), size, geometry in zip(engine.recognize_layout(list(images)), sizes, geometries):
+        if words is not None:
+            words = words.normalized(size, geometry.to_source if geometry else None)
+        pages.append((text, words))
+    return pages, prepared - started, time.perf_counter() - prepared
+
+
+def _ocr_pages(doc, indexes, engine_name: str = None, on_page=None):
+    """
+    OCR the given pages run by run (contiguous page ranges).
+    Only two runs of bitmaps are alive at any time (the one being OCR'd and
+    the next one being rasterized), so memory stays bounded for long scans.
+    Pages are preprocessed (grayscale, deskew, crop, rescale) unless the
+    engine opts out, then go to the engine in memory: one call per page for engines
+    like Tesseract (pages run in parallel), one call per run for batching
+    engines like PaddleOCR. Images and OCR results are memoized on the
+    Document, so pages already OCR'd are not done again.
+    on_page(index) is called as each page's text becomes available.
     """
-    text_all = ""
+    todo = [i for i in indexes if i not in doc.ocr_results]
+    if not todo:
+        return
+    engine = backends.get("ocr", ocr_engine_name(engine_name))
+    workers = 1 if engine.batch_pages else max(1, OCR_PAGE_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []  # (page indexes, raster seconds, future) of the run being OCR'd
+        for run in _page_runs(todo, max(1, OCR_PAGE_BATCH)):
+            started = time.perf_counter()
+            pages = doc.page_images(run[0], run[-1] + 1)
+            raster_share = (time.perf_counter() - started) / len(run)
+            _collect(doc, engine, pending, on_page)
+            if engine.batch_pages:
+                pending = [(run, raster_share, executor.submit(_timed_recognize, engine, pages))]
+            else:
+                pending = [([i], raster_share, executor.submit(_timed_recognize, engine, [page]))
+                           for i, page in zip(run, pages)]
+            del pages
+        _collect(doc, engine, pending, on_page)
+
+
+def _collect(doc, engine, pending, on_page=None):
+    for indexes, raster_seconds, future in pending:
+        pages, prep_seconds, ocr_seconds = future.result()
+        add_time(doc.timings, "ocr.preprocess", prep_seconds)
+        add_time(doc.timings, f"ocr.{engine.name}", ocr_seconds)
+        ocr_seconds += prep_seconds
+        for index, (text, words) in zip(indexes, pages):
+            doc.ocr_results[index] = text
+            if words is not None:
+                doc.ocr_words[index] = words
+            stats = doc.page_stats.setdefault(index, {"strategy": "ocr", "seconds": 0.0})
+            stats["strategy"] = "ocr"
+            stats["engine"] = engine.name
+            stats["seconds"] = round(stats["seconds"] + raster_seconds + ocr_seconds / len(indexes), 4)
+            if on_page:
+                on_page(index)
 
-    # 🔹 If it's a PDF
-    if file_path.lower().endswith(".pdf"):
+
+# ---------------------------------------------------------------------
+# 🧩 OCR Text Extraction (supports PDF & image)
+# ---------------------------------------------------------------------
+def _pdf_page_texts(doc, engine_name: str = None, on_page=None, indexes=None) -> list:
+    """
+    Per-page strategy: use the native text layer where one exists and OCR
+    only the pages without it. doc.page_stats records the choice and time.
+    indexes limits the work to some pages (default: all, in order).
+    """
+    indexes = range(doc.page_count) if indexes is None else list(indexes)
+    needs_ocr = []
+    for i in indexes:
+        started = time.perf_counter()
         try:
-            # Try to extract text directly (digital PDF)
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            if text.strip():
-                return text.strip()
+            layer = doc.text_layer(i)
         except Exception:
-            pass  # fallback to OCR below if text extraction fails
+            layer = ""  # unreadable text layer → OCR this page
+        seconds = time.perf_counter() - started
+        if len(layer.strip()) >= MIN_TEXT_LAYER_CHARS:
+            doc.page_stats[i] = {"strategy": "text_layer", "seconds": round(seconds, 4)}
+            if on_page:
+                on_page(i)
+        else:
+            doc.page_stats[i] = {"strategy": "ocr", "seconds": seconds}
+            needs_ocr.append(i)
+
+    if needs_ocr:
+        _ocr_pages(doc, needs_ocr, engine_name, on_page)
+    return [doc.ocr_results[i] if i in doc.ocr_results else doc.text_layer(i) for i in indexes]
+
+
+def extract_text_from_image(source, engine: str = None, on_page=None, pages=None) -> str:
+    """
+    Extract text from PDFs and image files.
+    Accepts a services.document.Document or a file path.
+    PDF pages with a native text layer skip OCR; the rest are OCR'd in parallel.
+    engine picks the OCR backend ("tesseract", "paddle"; default OCR_ENGINE).
+    on_page(index) is called as soon as each page's text is known (text layer
+    pages first, then OCR'd pages run by run); read it with page_text().
+    pages restricts a PDF to some page indexes (e.g. range(3)); images have one page.
+    """
+    with open_document(source) as doc:
+        # 🔹 If it's a PDF
+        if doc.is_pdf:
+            return "\n".join(page.strip() for page in _pdf_page_texts(doc, engine, on_page, pages)).strip()
+
+        # 🔹 If it's an image
+        else:
+            _ocr_pages(doc, [0], engine, on_page)
+            return doc.ocr_results[0].strip()
 
-        # 🔹 Fallback to OCR (scanned PDF)
-        pages = convert_from_path(file_path, dpi=200, poppler_path=POPLER_PATH)
-        for i, page in enumerate(pages):
-            img_path = f"{file_path}_page_{i}.jpg"
-            page.save(img_path, "JPEG")
-            text = pytesseract.image_to_string(Image.open(img_path))
-            text_all += text + "\n"
-            os.remove(img_path)
-        return text_all.strip()
 
-    # 🔹 If it's an image
-    else:
-        text = pytesseract.image_to_string(Image.open(file_path))
-        return text.strip()
+def page_text(doc, index: int) -> str:
+    """Text of one page read so far (OCR result, else the PDF text layer)."""
+    if index in doc.ocr_results:
+        return doc.ocr_results[index].strip()
+    return doc.text_layer(index).strip()
 
 
 # ---------------------------------------------------------------------
@@ -58,20 +185,19 @@ def extract_text_from_image(file_path: str) -> str:
 def detect_document_type(text: str) -> str:
     """
     Identify the type of document based on extracted text.
+    Uses the trained classifier (services/classifier.py) when a model is
+    available, else the keyword lists of services/fields.py (one pass).
     """
-    text_lower = text.lower()
-
-    if any(keyword in text_lower for keyword in ["invoice", "amount", "bill", "gst", "total due", "billed to"]):
-        return "invoice"
+    return detect_document_types([text])[0]
 
-    elif any(keyword in text_lower for keyword in ["resume", "curriculum vitae", "experience", "education", "skills", "objective"]):
-        return "resume"
 
-    elif any(keyword in text_lower for keyword in ["report", "summary", "findings", "analysis", "project report"]):
-        return "report"
-
-    else:
-        return "unknown"
+def detect_document_types(texts) -> list:
+    """detect_document_type for a batch: one sparse matrix product for the whole batch."""
+    model = backends.optional("classifier", "linear")
+    if model is None:
+        keywords = backends.get("extraction", "rules").DOCUMENT_CLASSIFIER
+        return [keywords.classify(text) for text in texts]
+    return model.predict(texts)
 
 
 # ---------------------------------------------------------------------
@@ -80,101 +206,61 @@ def detect_document_type(text: str) -> str:
 def extract_key_fields(doc_type: str, text: str) -> dict:
     """
     Extract structured fields based on the document type.
+    Field patterns and skill vocabularies are declared in services/fields.py.
     """
-    fields = {}
-
-    # ==============================================================
-    # 🧾 INVOICE
-    # ==============================================================
-    if doc_type == "invoice":
-        clean_text = text.replace("\n", " ").replace("\r", " ")
-
-        # 🔹 Invoice Number
-        invoice_no = re.search(
-            r"(?:invoice\s*(?:no|number|#)[:\s-]*([A-Z0-9-]+))", clean_text, re.IGNORECASE
-        )
-
-        # 🔹 Total / Amount
-        total = re.search(
-            r"(?:total\s*(?:amount)?|amount\s*(?:due|payable)?)[\s:₹$]*([\d,]+(?:\.\d{1,2})?)",
-            clean_text, re.IGNORECASE
-        )
-
-        # 🔹 Date (DD/MM/YYYY or YYYY-MM-DD)
-        date = re.search(
-            r"\b(?:\d{2}[/-]\d{2}[/-]\d{4}|\d{4}[/-]\d{2}[/-]\d{2})\b", clean_text
-        )
-
-        fields = {
-            "invoice_no": invoice_no.group(1).strip() if invoice_no else None,
-            "total_amount": total.group(1).strip() if total else None,
-            "date": date.group(0) if date else None
-        }
+    engine = backends.get("extraction", "rules").FIELD_ENGINES.get(doc_type)
 
     # ==============================================================
-    # 👨‍💻 RESUME
+    # ❓ UNKNOWN
     # ==============================================================
-    elif doc_type == "resume":
-        # 🔹 Clean OCR text
-        clean_text = text.replace("\n", " ").replace("\r", " ").strip()
-
-        # 🔹 Email
-        email_match = re.search(
-            r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", clean_text
-        )
-        email = email_match.group(0).lower() if email_match else None
-
-        # 🔹 Phone Number
-        phone_match = re.search(r"\b(?:\+91[-\s]?)?\d{10}\b", clean_text)
-        phone = phone_match.group(0) if phone_match else None
-
-        # 🔹 Name Detection (better)
-        name = None
-        name_match = re.search(r"Name[:\s]*([A-Z][A-Za-z\s]+)", text)
-        if name_match:
-            name = name_match.group(1).strip()
-        else:
-            # Look at first few lines for capitalized full name
-            lines = text.strip().splitlines()
-            for line in lines[:5]:
-                line = line.strip()
-                if re.match(r"^[A-Z][a-zA-Z\s]{2,25}$", line):
-                    name = line
-                    break
-
-        # 🔹 Skills (AI stack)
-        skill_keywords = [
-            "Python", "Java", "C++", "AI", "Machine Learning", "Deep Learning",
-            "Data Science", "NLP", "TensorFlow", "PyTorch", "SQL", "Flask", "Django"
-        ]
-        skills = [s for s in skill_keywords if re.search(s, text, re.IGNORECASE)]
-
-        fields = {
-            "name": name,
-            "email": email,
-            "phone": phone,
-            "skills": skills
-        }
+    if engine is None:
+        return {"note": "No structured fields found for this document type."}
 
-    # ==============================================================
-    # 📊 REPORT
-    # ==============================================================
-    elif doc_type == "report":
-        title = re.search(r"(?:Report Title|Title)[:\s]*(.*)", text)
-        date = re.search(
-            r"\b(?:\d{2}[/-]\d{2}[/-]\d{4}|\d{4}[/-]\d{2}[/-]\d{2})\b", text
-        )
-        summary = re.search(r"(?:Summary|Abstract)[:\s]*(.*)", text)
-        fields = {
-            "title": title.group(1).strip() if title else None,
-            "date": date.group(0) if date else None,
-            "summary": summary.group(1).strip() if summary else None
-        }
+    fields = engine.extract(text or "")
+    if EXTRACTION_BACKEND == "transformer":
+        fields = _merge_model_fields(fields, text or "")
 
-    # ==============================================================
-    # ❓ UNKNOWN
-    # ==============================================================
-    else:
-        fields = {"note": "No structured fields found for this document type."}
+    # 👨‍💻 Resume: no "Name:" label → look for a capitalized full name up top
+    if doc_type == "resume" and not fields.get("name"):
+        fields["name"] = _name_from_first_lines(text or "")
 
     return fields
+
+
+def missing_fields(doc_type: str, fields: dict, empty_lists_final: bool = False) -> list:
+    """
+    Fields the rules of doc_type declare that have no value yet (none for
+    unknown types), skills included for types with a vocabulary. With
+    empty_lists_final an empty list counts as found: a resume may simply
+    list none of the known skills.
+    """
+    engine = backends.get("extraction", "rules").FIELD_ENGINES.get(doc_type)
+    if engine is None:
+        return []
+    names = [rule[0] for rule in engine.rules] + (["skills"] if engine.vocabulary is not None else [])
+    return [name for name in names
+            if not fields.get(name) and not (empty_lists_final and isinstance(fields.get(name), list))]
+
+
+def _merge_model_fields(fields: dict, text: str) -> dict:
+    """Model values override the regex ones it found; regex fills the rest (and all of it without a model)."""
+    if not text.strip():
+        return fields
+    try:
+        model = backends.optional("extraction", "transformer")
+        found = model.extract(text) if model is not None else {}
+    except Exception as e:
+        print(f"⚠️ Transformer field extraction failed, using regex rules: {e}")
+        return fields
+    return {**fields, **{name: value for name, value in found.items() if name in fields and value}}
+
+
+def _name_from_first_lines(text: str):
+    for line in text.strip().splitlines()[:5]:
+        line = line.strip()
+        if _NAME_LINE.match(line):
+            return line
+    return None
+
+
+_NAME_LINE = re.compile(r"^[A-Z][a-zA-Z\s]{2,25}$")
@@ -0,0 +1,171 @@
+"""
+services/ocr_engines.py
+OCR engines behind one interface, registered in services.backends as the
+"ocr" backends and chosen per request (ocr_engine=...) or by OCR_ENGINE.
+- tesseract: one Tesseract process per page; pages run in parallel threads.
+  image_to_data gives the text and every word's box in the same call. Each
+  process gets OMP_THREAD_LIMIT=TESSERACT_OMP_THREADS in its own environment
+  (never the caller's), so OCR is the same in pool workers, thread pools and
+  the batch runner.
+- paddle: PaddleOCR on CPU. Models are loaded once per worker process (the
+  backend registry memoizes the engine) and a whole run of pages goes
+  through one call: text boxes of all pages are recognized as one batch.
+Engine packages are imported when the engine is first created, never at
+module load.
+"""
+
+import copy
+import os
+import threading
+
+# ✅ OCR engine configuration (override through environment variables)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract")
+TESSERACT_CMD = os.getenv(
+    "TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else "tesseract"
+)
+# OpenMP threads per Tesseract process: parallelism comes from pages and workers
+TESSERACT_OMP_THREADS = os.getenv("TESSERACT_OMP_THREADS", os.getenv("OMP_THREAD_LIMIT", "1"))
+PADDLE_LANG = os.getenv("PADDLE_LANG", "en")
+PADDLE_CPU_THREADS = int(os.getenv("PADDLE_CPU_THREADS", "1"))   # per worker; parallelism comes from workers
+PADDLE_REC_BATCH = int(os.getenv("PADDLE_REC_BATCH", "32"))      # text boxes per recognizer call
+PADDLE_DROP_SCORE = float(os.getenv("PADDLE_DROP_SCORE", "0.5"))
+
+
+class OcrEngine:
+    """
+    Interface of an OCR backend.
+    recognize(images) takes PIL page images and returns one text per image;
+    recognize_layout(images) returns (text, services.layout.WordBoxes in
+    image pixels, or None when the engine has no boxes) per image.
+    batch_pages=True means a run of pages should go through one call;
+    otherwise the caller runs single pages concurrently.
+    preprocess=True means pages are cleaned up first (services.preprocess).
+    """
+
+    name = "base"
+    batch_pages = False
+    preprocess = True
+
+    def recognize(self, images) -> list:
+        raise NotImplementedError
+
+    def recognize_layout(self, images) -> list:
+        return [(text, None) for text in self.recognize(images)]
+
+
+class TesseractEngine(OcrEngine):
+    name = "tesseract"
+    batch_pages = False
+
+    def __init__(self, cmd: str = None):
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = cmd or TESSERACT_CMD
+        _limit_tesseract_threads(pytesseract.pytesseract)
+        self._pytesseract = pytesseract
+
+    def recognize_one(self, image) -> str:
+        return self._pytesseract.image_to_string(image)
+
+    def recognize(self, images) -> list:
+        return [self.recognize_one(image) for image in images]
+
+    def recognize_layout_one(self, image) -> tuple:
+        from services.layout import from_tesseract_data
+        data = self._pytesseract.image_to_data(image, output_type=self._pytesseract.Output.DICT)
+        return from_tesseract_data(data, image.size)
+
+    def recognize_layout(self, images) -> list:
+        return [self.recognize_layout_one(image) for image in images]
+
+
+def _limit_tesseract_threads(module):
+    """
+    Give every Tesseract subprocess OMP_THREAD_LIMIT in its own environment.
+    pytesseract builds the Popen arguments in subprocess_args(); wrapping it
+    leaves os.environ untouched.
+    """
+    if getattr(module.subprocess_args, "limits_threads", False):
+        return
+    base = module.subprocess_args
+
+    def subprocess_args(*args, **kwargs):
+        popen_kwargs = base(*args, **kwargs)
+        popen_kwargs["env"] = {**(popen_kwargs.get("env") or os.environ), "OMP_THREAD_LIMIT": TESSERACT_OMP_THREADS}
+        return popen_kwargs
+
+    subprocess_args.limits_threads = True
+    module.subprocess_args = subprocess_args
+
+
+class PaddleEngine(OcrEngine):
+    """
+    PaddleOCR (CPU). Detection runs per page, then the text boxes of every
+    page in the call are angle-classified and recognized in shared batches.
+    The predictors are not thread-safe, so calls are serialized per engine.
+    """
+
+    name = "paddle"
+    batch_pages = True
+    preprocess = False  # its detector handles color, skew and scale itself
+
+    def __init__(self, lang: str = None, cpu_threads: int = None):
+        from paddleocr import PaddleOCR
+        self._ocr = PaddleOCR(
+            lang=lang or PADDLE_LANG, use_angle_cls=True, use_gpu=False, show_log=False,
+            cpu_threads=cpu_threads or PADDLE_CPU_THREADS, rec_batch_num=PADDLE_REC_BATCH,
+        )
+        self._lock = threading.Lock()
+        try:  # helpers shipped inside the paddleocr package (2.6.x layout)
+            from tools.infer.predict_system import sorted_boxes
+            from tools.infer.utility import get_rotate_crop_image
+            self._sorted_boxes, self._crop = sorted_boxes, get_rotate_crop_image
+        except ImportError:
+            self._sorted_boxes = self._crop = None
+
+    @staticmethod
+    def _to_array(image):
+        import numpy as np
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])  # BGR like cv2
+
+    def recognize(self, images) -> list:
+        return [text for text, _ in self.recognize_layout(images)]
+
+    def recognize_layout(self, images) -> list:
+        from services.layout import from_text_lines
+        arrays = [self._to_array(image) for image in images]
+        with self._lock:
+            if self._crop is None:
+                pages = [self._recognize_page(array) for array in arrays]
+            else:
+                pages = self._recognize_batched(arrays)
+        return [from_text_lines(lines, image.size) for lines, image in zip(pages, images)]
+
+    @staticmethod
+    def _bounds(quad) -> list:
+        xs, ys = [p[0] for p in quad], [p[1] for p in quad]
+        return [min(xs), min(ys), max(xs), max(ys)]
+
+    def _recognize_page(self, array) -> list:
+        result = self._ocr.ocr(array, cls=True)
+        lines = result[0] if result and result[0] else []
+        return [(text, self._bounds(quad)) for quad, (text, score) in lines if score >= PADDLE_DROP_SCORE]
+
+    def _recognize_batched(self, arrays) -> list:
+        """[(text, [x0, y0, x1, y1]), ...] per page."""
+        crops, owners = [], []
+        for page, array in enumerate(arrays):
+            boxes, _ = self._ocr.text_detector(array)
+            if boxes is None:
+                continue
+            for box in self._sorted_boxes(boxes):
+                crops.append(self._crop(array, copy.deepcopy(box)))
+                owners.append((page, self._bounds(box)))
+
+        lines = [[] for _ in arrays]
+        if crops:
+            crops, _, _ = self._ocr.text_classifier(crops)
+            results, _ = self._ocr.text_recognizer(crops)
+            for (page, bounds), (text, score) in zip(owners, results):
+                if score >= PADDLE_DROP_SCORE:
+                    lines[page].append((text, bounds))
+        return lines
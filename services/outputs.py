@@ -0,0 +1,209 @@
+"""
+services/outputs.py
+Storage for generated files (explainability images) served under /outputs.
+- Content-addressed names: the file is named after the SHA-256 of its
+  encoded bytes, so concurrent uploads never overwrite each other, identical
+  images are stored once, and a name can be cached by browsers forever.
+- Compressed formats: WebP (default) or JPEG, PNG when lossless is needed.
+- Retention: files older than OUTPUTS_MAX_AGE_SECONDS and, oldest first,
+  anything beyond OUTPUTS_MAX_BYTES are deleted by a background sweeper
+  (recency = mtime, refreshed whenever a cached result points at the file).
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+# ✅ Output storage configuration (override through environment variables)
+OUTPUTS_DIR = os.getenv("OUTPUTS_DIR", os.path.join(".cache", "outputs"))  # untracked: the sweeper deletes files
+OUTPUTS_URL = "/outputs"
+OUTPUTS_MAX_BYTES = int(os.getenv("OUTPUTS_MAX_BYTES", str(256 * 1024 * 1024)))
+OUTPUTS_MAX_AGE_SECONDS = int(os.getenv("OUTPUTS_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+OUTPUTS_SWEEP_SECONDS = float(os.getenv("OUTPUTS_SWEEP_SECONDS", "60"))
+OUTPUT_IMAGE_FORMAT = os.getenv("OUTPUT_IMAGE_FORMAT", "webp")   # webp | jpeg | png
+OUTPUT_IMAGE_QUALITY = int(os.getenv("OUTPUT_IMAGE_QUALITY", "80"))
+
+# Pillow format name, file extension and save options per output format
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "webp", {"method": 4}),
+    "jpeg": ("JPEG", "jpg", {"optimize": True}),
+    "png": ("PNG", "png", {"compress_level": 6}),
+}
+# Unfinished writes (a crashed worker) are cleaned up after this long
+STALE_TMP_SECONDS = 3600
+
+
+class OutputStore:
+    """Content-addressed files in one directory, bounded by age and total size."""
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_age_seconds: int = None,
+                 url_prefix: str = OUTPUTS_URL):
+        self.directory = directory or OUTPUTS_DIR
+        self.max_bytes = OUTPUTS_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_seconds = OUTPUTS_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._disk_bytes = None   # written by this process since the last sweep
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.counters = {"stores": 0, "reused": 0, "evictions": 0, "sweeps": 0}
+
+    # -----------------------------------------------------------------
+    # 💾 Writing
+    # -----------------------------------------------------------------
+    def save_bytes(self, data: bytes, extension: str) -> str:
+        """Store data under its content hash; returns the web path (/outputs/<hash>.<ext>)."""
+        name = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        path = os.path.join(self.directory, name)
+        if self._touch(path):
+            with self._lock:
+                self.counters["reused"] += 1
+            return f"{self.url_prefix}/{name}"
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)  # same content under the same name: a race is harmless
+
+        with self._lock:
+            self.counters["stores"] += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+                if self._disk_bytes > self.max_bytes:
+                    self._wake.set()  # let the sweeper run now instead of at its next tick
+        return f"{self.url_prefix}/{name}"
+
+    def save_image(self, image, fmt: str = None, quality: int = None) -> str:
+        """Encode a PIL image (OUTPUT_IMAGE_FORMAT by default) and store it."""
+        fmt = (fmt or OUTPUT_IMAGE_FORMAT).lower()
+        pil_format, extension, options = IMAGE_FORMATS.get(fmt, IMAGE_FORMATS["png"])
+        if pil_format in ("WEBP", "JPEG"):
+            options = {**options, "quality": quality or OUTPUT_IMAGE_QUALITY}
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=pil_format, **options)
+        return self.save_bytes(buffer.getvalue(), extension)
+
+    # -----------------------------------------------------------------
+    # 🔎 Lookups
+    # -----------------------------------------------------------------
+    def path_for(self, url: str):
+        """Local file behind a web path from this store (None for other values)."""
+        if not isinstance(url, str) or not url.startswith(self.url_prefix + "/"):
+            return None
+        name = url[len(self.url_prefix) + 1:]
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            return None
+        return os.path.join(self.directory, name)
+
+    def _touch(self, path: str) -> bool:
+        try:
+            os.utime(path, None)  # refresh recency for LRU eviction
+            return True
+        except OSError:
+            return False
+
+    def touch(self, url: str) -> bool:
+        """
+        Mark a stored file as recently used. False when `url` points into this
+        store but the file has been evicted; True for anything else.
+        """
+        path = self.path_for(url)
+        return path is None or self._touch(path)
+
+    # -----------------------------------------------------------------
+    # 🧹 Retention
+    # -----------------------------------------------------------------
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return [], []
+        entries, stale = [], []
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            if name.endswith(".tmp"):
+                if now - st.st_mtime > STALE_TMP_SECONDS:
+                    stale.append(path)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries, stale
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self) -> int:
+        """Delete expired files, then the least recently used until under budget. Returns bytes kept."""
+        now = time.time()
+        entries, stale = self._entries()
+        for path in stale:
+            self._remove(path)
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age_seconds > 0 and now - mtime > self.max_age_seconds
+            if (expired or total > self.max_bytes) and self._remove(path):
+                total -= size
+                removed += 1
+        with self._lock:
+            self.counters["evictions"] += removed
+            self.counters["sweeps"] += 1
+            self._disk_bytes = total
+        return total
+
+    def start_sweeper(self, interval: float = None):
+        """Run evict() every `interval` seconds (and when this process fills the budget)."""
+        if self._sweeper is not None:
+            return
+        interval = OUTPUTS_SWEEP_SECONDS if interval is None else interval
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.evict()
+                except Exception as e:  # keep sweeping; a bad file must not stop retention
+                    print(f"⚠️ Output sweep failed: {e}")
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._sweeper = threading.Thread(target=loop, name="outputs-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        if self._sweeper is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._sweeper.join(timeout=5)
+        self._sweeper = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_bytes = self._disk_bytes
+            counters = dict(self.counters)
+        if disk_bytes is None:
+            disk_bytes = sum(size for _, size, _ in self._entries()[0])
+        return {**counters, "disk_bytes": disk_bytes, "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds}
+
+
+# ✅ Shared store (workers write, the API process sweeps and serves)
+output_store = OutputStore()
@@ -0,0 +1,339 @@
+"""
+services/pipeline.py
+End-to-end document analysis pipeline.
+- Runs OCR → type detection → field extraction → decision → explainability
+  (a JSON box overlay of the fields; a rendered PNG only when asked for).
+- Kept as a plain top-level function so it can be shipped to a worker process.
+- Optional on_stage(stage, state) callback reports progress ("running"/"done").
+- Optional on_event(event) callback receives partial results as they are
+  known (see EVENTS): each page's text, then type, fields, decision, overlay.
+- Every stage is timed; the result carries a "timings" block (seconds).
+- OCR text, word layout and stage outputs are persisted per document
+  (services.document_store); a document seen before skips OCR, and
+  services.reprocess re-runs only stages whose STAGE_VERSIONS changed.
+- Every document's OCR text is looked up in and added to a MinHash/LSH
+  index (services.near_duplicates); a near match is reported under
+  "near_duplicate". With NEAR_DUPLICATE_ACTION=reuse, an exact-text (or
+  NEAR_DUPLICATE_REUSE_THRESHOLD) match lends its stored type; fields are
+  still extracted from the new text and its decision is reused only when
+  they are equal.
+- Page budget (PAGE_BUDGET_FIRST_PAGES > 0): long PDFs are classified from
+  their first pages and further pages are read only while the type is
+  unknown or its fields are missing (an empty skills list counts as missing
+  for one more step only), up to PAGE_BUDGET_MAX_PAGES; "page_budget" lists
+  the pages read.
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from services.ocr import (extract_text_from_image, detect_document_type, extract_key_fields, ocr_engine_name,
+                          page_text, missing_fields, EXTRACTION_BACKEND, PAGE_BUDGET_FIRST_PAGES,
+                          PAGE_BUDGET_MAX_PAGES, PAGE_BUDGET_STEP)
+from services.decision_engine import make_decision
+from services.explainability import field_overlay, highlight_text_areas
+from services.document import open_document
+from services.document_store import document_store, decompress_text, OUTPUT_COLUMNS
+from services.backends import backends
+from services.metrics import add_time, span
+
+# ✅ Bump whenever a stage changes its output, so cached results are not reused
+PIPELINE_VERSION = "2025.3"
+
+# Stage names, in execution order
+STAGES = ("ocr", "classify", "extract", "decide", "explain")
+
+# ✅ Per-stage output versions: bump one to have services.reprocess re-run
+# that stage (and the stages depending on it) over stored documents
+STAGE_VERSIONS = {"ocr": "2025.3", "classify": "1", "extract": "1", "decide": "1", "explain": "1"}
+
+# Partial-result events passed to on_event, as {"event": name, ...}:
+#   stage          {"stage", "state"}           a stage starts ("running") / ends ("done")
+#   page           {"page", "page_count", "text", "strategy", "seconds", …}   one page read
+#   text           {"text"}                     whole text, when reused from the document store
+#   document_type  {"document_type"}
+#   fields         {"fields_extracted"}
+#   decision       {"decision", "confidence_score"}
+#   overlay        {"overlay", "explainability_map"}
+EVENTS = ("stage", "page", "text", "document_type", "fields", "decision", "overlay")
+
+
+def result_events(result: dict):
+    """The stage events of a finished result (e.g. one answered from the cache), in pipeline order."""
+    yield {"event": "document_type", "document_type": result.get("document_type")}
+    yield {"event": "fields", "fields_extracted": result.get("fields_extracted")}
+    yield {"event": "decision", "decision": result.get("decision"), "confidence_score": result.get("confidence_score")}
+    # results cached before overlays existed get an empty one, shaped like field_overlay()'s
+    yield {"event": "overlay", "overlay": result.get("overlay") or {"pages": [], "regions": []},
+           "explainability_map": result.get("explainability_map")}
+
+
+@contextmanager
+def _stage(doc, on_stage, name: str):
+    if on_stage:
+        on_stage(name, "running")
+    started = time.perf_counter()
+    yield
+    add_time(doc.timings, name, time.perf_counter() - started)
+    if on_stage:
+        on_stage(name, "done")
+
+
+def _stage_events(on_stage, on_event):
+    """on_stage callback that also sends "stage" events."""
+    def report(stage: str, state: str):
+        on_event({"event": "stage", "stage": stage, "state": state})
+        if on_stage:
+            on_stage(stage, state)
+    return report
+
+
+@lru_cache(maxsize=1)
+def stage_versions() -> dict:
+    """
+    STAGE_VERSIONS with the fingerprints of what the stages load folded in:
+    the classifier model into "classify", the field model (when
+    EXTRACTION_BACKEND=transformer) into "extract", the decision table into
+    "decide", and the page budget (which pages are read) into "ocr".
+    """
+    versions = dict(STAGE_VERSIONS)
+    if PAGE_BUDGET_FIRST_PAGES:
+        versions["ocr"] = f"{versions['ocr']}+pages{PAGE_BUDGET_FIRST_PAGES}.{PAGE_BUDGET_MAX_PAGES}.{PAGE_BUDGET_STEP}"
+    if EXTRACTION_BACKEND == "transformer":
+        # hash the checkpoint files; the model itself is only loaded where fields are extracted
+        from services.field_model import FIELD_MODEL_PATH, field_model_fingerprint
+        usable = (backends.available("extraction", "transformer")
+                  and os.path.exists(os.path.join(FIELD_MODEL_PATH, "config.json")))
+        versions["extract"] = f"{versions['extract']}.{field_model_fingerprint() if usable else 'rules'}"
+    classifier = backends.optional("classifier", "linear")
+    versions["classify"] = f"{versions['classify']}.{classifier.fingerprint if classifier else 'keywords'}"
+    versions["decide"] = f"{versions['decide']}.{backends.get('decision', 'rules').fingerprint}"
+    return versions
+
+
+def result_version(ocr_engine: str = None, explain_image: bool = False) -> str:
+    """
+    Version under which results are cached: pipeline version + digest of the
+    stage versions + OCR engine used (+ "png" when the result links a
+    rendered explainability image).
+    """
+    digest = hashlib.sha256(json.dumps(stage_versions(), sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    version = f"{PIPELINE_VERSION}.{digest}+{ocr_engine_name(ocr_engine)}"
+    return f"{version}+png" if explain_image else version
+
+
+def analyze_file(source, on_stage=None, ocr_engine: str = None, explain_image: bool = False, on_event=None) -> dict:
+    """
+    Run the full analysis pipeline on a Document (or a file path).
+    Returns a dict matching api.schemas.InferenceResponse.
+    ocr_engine selects the OCR backend for scanned pages (default OCR_ENGINE).
+    explain_image also renders the field boxes into a PNG (explainability_map);
+    the JSON overlay is always returned.
+    on_event(event) receives partial results as each page and stage finishes;
+    it must not raise (a worker's queue.put, for instance).
+    Any scratch files live in the document's private temp dir and are removed here.
+    """
+    with open_document(source) as doc:
+        try:
+            return _run_stages(doc, on_stage, ocr_engine, explain_image, on_event)
+        finally:
+            doc.close()
+
+
+def _load_stored(doc, engine: str, versions: dict):
+    """Stored row for this document whose OCR is still current, or None."""
+    if not document_store.enabled:
+        return None
+    try:
+        with span(doc.timings, "store.load"):
+            stored = document_store.load(doc.sha256, engine)
+    except Exception as e:  # the store is an optimization; never fail the pipeline on it
+        print(f"⚠️ Document store read failed: {e}")
+        return None
+    if stored is None or stored["versions"].get("ocr") != versions["ocr"]:
+        return None
+    return stored
+
+
+def _save_stored(doc, engine: str, text: str, versions: dict, outputs: dict, stored=None, pages=None):
+    if not document_store.enabled:
+        return
+    try:
+        with span(doc.timings, "store.save"):
+            if stored is not None:  # unchanged OCR: bump the hit, never rewrite the text and layout blobs
+                current = {**json.loads(json.dumps(outputs)), "versions": versions}  # as stored (JSON)
+                if current != {**{column: stored[column] for column in OUTPUT_COLUMNS}, "versions": stored["versions"]}:
+                    document_store.update_outputs([{**current, "sha256": doc.sha256, "ocr_engine": engine}])
+                document_store.touch(doc.sha256, engine)
+                return
+            from services.layout import pack_pages  # NumPy; not needed to import a worker
+            indexes = range(doc.page_count) if pages is None else pages
+            layout = pack_pages({index: doc.word_boxes(index) for index in indexes})
+            document_store.save(doc.sha256, engine, doc.filename, doc.page_count, text, layout,
+                                doc.page_stats, versions, outputs)
+    except Exception as e:
+        print(f"⚠️ Document store write failed: {e}")
+
+
+def _near_duplicate(doc, text: str):
+    """(index, signature, text digest, closest earlier document at or above the threshold or None)."""
+    from services import near_duplicates  # NumPy; not needed to import a worker
+    index = near_duplicates.near_duplicate_index
+    if not index.enabled:
+        return None, None, None, None
+    try:
+        with span(doc.timings, "dedup.lookup"):
+            signature, digest = index.signature(text), near_duplicates.text_digest(text)
+            return index, signature, digest, index.query(signature, exclude=doc.sha256, text_sha256=digest)
+    except Exception as e:  # like the document store: an optimization, never a failure
+        print(f"⚠️ Near-duplicate lookup failed: {e}")
+        return None, None, None, None
+
+
+def _reusable_outputs(match, versions: dict):
+    """
+    Stored row of a match close enough to reuse (NEAR_DUPLICATE_ACTION=reuse:
+    same text, or at least NEAR_DUPLICATE_REUSE_THRESHOLD similar) whose
+    type, fields and decision are still current.
+    """
+    from services import near_duplicates
+    if match is None or near_duplicates.NEAR_DUPLICATE_ACTION != "reuse" or not document_store.enabled:
+        return None
+    if not match["exact"] and match["similarity"] < near_duplicates.NEAR_DUPLICATE_REUSE_THRESHOLD:
+        return None
+    try:
+        earlier = document_store.load(match["sha256"], match["ocr_engine"])
+    except Exception as e:
+        print(f"⚠️ Document store read failed: {e}")
+        return None
+    if earlier is None or any(earlier["versions"].get(stage) != versions[stage]
+                              for stage in ("classify", "extract", "decide")):
+        return None
+    return earlier
+
+
+def _index_document(doc, engine: str, index, signature, digest: str):
+    if index is None:
+        return
+    try:
+        with span(doc.timings, "dedup.add"):
+            index.add(doc.sha256, engine, doc.filename, signature, digest)
+    except Exception as e:
+        print(f"⚠️ Near-duplicate index write failed: {e}")
+
+
+def _page_budget(doc):
+    """(first pages, page cap) when the page budget applies to this document, else None."""
+    if not PAGE_BUDGET_FIRST_PAGES or not doc.is_pdf or doc.page_count <= PAGE_BUDGET_FIRST_PAGES:
+        return None
+    return PAGE_BUDGET_FIRST_PAGES, min(doc.page_count, max(PAGE_BUDGET_MAX_PAGES, PAGE_BUDGET_FIRST_PAGES))
+
+
+def _read_more(doc, ocr_engine, on_page, text: str, next_page: int, budget) -> tuple:
+    """Page budget: (text with the next PAGE_BUDGET_STEP pages appended, next unread page)."""
+    more = range(next_page, min(next_page + max(1, PAGE_BUDGET_STEP), budget[1]))
+    with span(doc.timings, "ocr.more_pages"):
+        more_text = extract_text_from_image(doc, ocr_engine, on_page, more)
+    return "\n".join(part for part in (text, more_text) if part), more.stop
+
+
+def _run_stages(doc, on_stage=None, ocr_engine: str = None, explain_image: bool = False, on_event=None) -> dict:
+    started = time.perf_counter()
+    emit = on_event or (lambda event: None)
+    on_page = None
+    if on_event is not None:
+        on_stage = _stage_events(on_stage, on_event)
+
+        def on_page(index):
+            emit({"event": "page", "page": index + 1, "page_count": doc.page_count,
+                  "text": page_text(doc, index), **doc.page_stats.get(index, {})})
+    engine = ocr_engine_name(ocr_engine)
+    versions = stage_versions()
+    stored = _load_stored(doc, engine, versions)
+    budget = _page_budget(doc)
+
+    # --- Step 1: OCR / Text extraction (reused from the document store when current)
+    with _stage(doc, on_stage, "ocr"):
+        if stored is not None:
+            text = decompress_text(stored["text"])
+            if stored["layout"]:
+                from services.layout import unpack_pages
+                doc.ocr_words.update(unpack_pages(stored["layout"]))
+            doc.page_stats.update(stored["page_stats"] or {})
+            emit({"event": "text", "text": text})
+        else:
+            text = extract_text_from_image(doc, ocr_engine, on_page, range(budget[0]) if budget else None)
+
+    # --- Near-duplicate lookup (a rescan or re-export of an earlier document)
+    index, signature, digest, match = _near_duplicate(doc, text)
+    reused = _reusable_outputs(match, versions)
+    reused_stages = []
+
+    # --- Step 2: Document type & key field extraction
+    # Page budget: read further pages only while the type is unknown or fields
+    # are missing (a stored text already went through this under the same budget)
+    next_page = budget[0] if budget and stored is None else None
+    with _stage(doc, on_stage, "classify"):
+        doc_type = reused["document_type"] if reused else detect_document_type(text)
+        if reused:
+            reused_stages.append("classify")
+        while doc_type == "unknown" and next_page is not None and next_page < budget[1]:
+            text, next_page = _read_more(doc, ocr_engine, on_page, text, next_page, budget)
+            doc_type = detect_document_type(text)
+    emit({"event": "document_type", "document_type": doc_type})
+    with _stage(doc, on_stage, "extract"):
+        key_fields = extract_key_fields(doc_type, text)  # always from this text, even for a near duplicate
+        # an empty list (no known skills) is final once pages past the first were read
+        while (next_page is not None and next_page < budget[1]
+               and missing_fields(doc_type, key_fields, empty_lists_final=next_page > budget[0])):
+            text, next_page = _read_more(doc, ocr_engine, on_page, text, next_page, budget)
+            key_fields = extract_key_fields(doc_type, text)
+    emit({"event": "fields", "fields_extracted": key_fields})
+
+    # --- Step 3: Decision logic
+    with _stage(doc, on_stage, "decide"):
+        if reused and key_fields == reused["fields"]:
+            decision, confidence = reused["decision"], reused["confidence"]
+            reused_stages.append("decide")
+        else:
+            decision, confidence = make_decision(doc_type, key_fields)
+    emit({"event": "decision", "decision": decision, "confidence_score": confidence})
+
+    # --- Step 4: Explainability (field boxes; rendered image only on request)
+    with _stage(doc, on_stage, "explain"):
+        pages_read = sorted(doc.page_stats) if budget else None
+        overlay = field_overlay(doc, key_fields, pages_read)
+        explain_map = highlight_text_areas(doc, key_fields, overlay) if explain_image else None
+    emit({"event": "overlay", "overlay": overlay, "explainability_map": explain_map or "N/A"})
+
+    _save_stored(doc, engine, text, versions, {"document_type": doc_type, "fields": key_fields, "decision": decision,
+                                               "confidence": confidence, "overlay": overlay}, stored, pages_read)
+    _index_document(doc, engine, index, signature, digest)
+    near_duplicate = {**match, "reused": reused_stages} if match else None
+
+    return {
+        "document_type": doc_type,
+        "fields_extracted": key_fields,
+        "decision": decision,
+        "confidence_score": confidence,
+        "explainability_map": explain_map or "N/A",
+        "overlay": overlay,
+        "near_duplicate": near_duplicate,
+        "page_budget": {
+            "first_pages": budget[0],
+            "max_pages": budget[1],
+            "page_count": doc.page_count,
+            "pages_processed": [i + 1 for i in pages_read],
+            "missing_fields": missing_fields(doc_type, key_fields, empty_lists_final=True),
+        } if budget else None,
+        "pages": [{"page": i + 1, **doc.page_stats[i]} for i in sorted(doc.page_stats)],
+        "timings": _rounded({**doc.timings, "total": time.perf_counter() - started}),
+    }
+
+
+def _rounded(timings: dict) -> dict:
+    return {name: round(seconds, 6) for name, seconds in timings.items()}
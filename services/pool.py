@@ -0,0 +1,155 @@
+"""
+services/pool.py
+Bounded worker pool for the CPU-bound pipeline stages
+(pdf2image rasterization, pytesseract OCR, PIL drawing).
+- Work runs in separate processes so one scan never blocks the event loop.
+- Admission is bounded: running + waiting jobs never exceed
+  OCR_WORKERS + OCR_QUEUE_SIZE, anything beyond that is refused at once.
+- A process pool whose worker died (segfault, OOM kill) is broken for good:
+  it is dropped and the next submit starts a fresh one.
+- event_queue() gives a queue a running job can report progress on (a
+  multiprocessing manager queue for worker processes).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from services.backends import warm_up_worker
+
+# ✅ Pool configuration (override through environment variables)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", OCR_WORKERS * 4))
+OCR_EXECUTOR = os.getenv("OCR_EXECUTOR", "process")  # "process" or "thread"
+OCR_MP_START = os.getenv("OCR_MP_START", "spawn")
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when every worker is busy and the admission queue is full."""
+
+
+class WorkerPool:
+    """
+    Executor wrapper with a fixed number of admission slots.
+    The underlying executor is created lazily on first submit.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, kind: str = None,
+                 initializer=None):
+        self.max_workers = max(1, max_workers or OCR_WORKERS)
+        self.max_pending = OCR_QUEUE_SIZE if max_pending is None else max(0, max_pending)
+        self.kind = kind or OCR_EXECUTOR
+        self.capacity = self.max_workers + self.max_pending
+        self.initializer = initializer
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+
+    # -----------------------------------------------------------------
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "thread":
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, initializer=self.initializer
+                    )
+                else:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(OCR_MP_START),
+                        initializer=self.initializer,
+                    )
+            return self._executor
+
+    def _discard(self, executor):
+        """Drop a broken executor so the next submit creates a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already replaced
+            self._executor = None
+        print("⚠️ Worker pool is broken (a worker process died); starting a new one.")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.capacity
+
+    # -----------------------------------------------------------------
+    def submit(self, fn, *args, block: bool = False, **kwargs):
+        """
+        Submit fn(*args, **kwargs) to the pool.
+        Raises PoolSaturated when no slot is free (unless block=True).
+        Returns a concurrent.futures.Future.
+        """
+        if not self._slots.acquire(blocking=block):
+            raise PoolSaturated(f"Worker pool is full ({self.capacity} jobs in flight).")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                self._discard(executor)
+                executor = self._get_executor()
+                future = executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+
+        def done(finished):
+            self._release()
+            if not finished.cancelled() and isinstance(finished.exception(), BrokenProcessPool):
+                self._discard(executor)
+
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Async helper: submit and await the result without blocking the event loop.
+        A job whose worker died raises BrokenProcessPool; the pool is replaced.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def event_queue(self):
+        """
+        A queue that a submitted job can put() on while the caller reads it.
+        Worker processes get a proxy to a queue in a manager process
+        (started on first use); thread workers a plain queue.Queue.
+        """
+        if self.kind == "thread":
+            return queue.Queue()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context(OCR_MP_START).Manager()
+            return self._manager.Queue()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+        if manager is not None:
+            manager.shutdown()
+
+
+# ✅ Shared pool used by the API process (workers preload BACKEND_WARMUP)
+pipeline_pool = WorkerPool(initializer=warm_up_worker)
@@ -0,0 +1,196 @@
+"""
+services/preprocess.py
+Page clean-up in front of OCR, vectorized with NumPy.
+- Grayscale (or Otsu-binarized) instead of full color.
+- Deskew: projection-profile search over small angles on sampled ink pixels.
+- Crop empty margins (speckles are ignored).
+- Rescale so text lines come out near PREPROCESS_LINE_PX pixels high: large
+  photos of pages shrink a lot, tiny print is enlarged for accuracy.
+The result is a smaller, single-channel image, so encoding it for
+Tesseract and recognizing it both take less time and memory.
+prepare_page() also returns the PageGeometry that maps word boxes found on
+the cleaned image back onto the original page.
+"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+# ✅ Preprocessing configuration (override through environment variables)
+PREPROCESS_MODE = os.getenv("OCR_PREPROCESS", "gray")               # gray | binary | off
+PREPROCESS_LINE_PX = int(os.getenv("OCR_PREPROCESS_LINE_PX", "28"))  # target text line height
+PREPROCESS_MAX_SKEW = float(os.getenv("OCR_PREPROCESS_MAX_SKEW", "5"))  # degrees searched each way
+MIN_SCALE, MAX_SCALE = 0.35, 2.0
+SCALE_DEADBAND = 0.2        # leave the size alone within ±20 % of the target
+SKEW_SAMPLE_POINTS = 20000  # ink pixels used for the skew search
+MIN_SKEW_DEGREES = 0.1
+
+
+def otsu_threshold(hist) -> int:
+    """
+    Gray level that best separates ink from paper (Otsu, from a 256-bin
+    histogram); -1 for a uniform page, where nothing counts as ink.
+    """
+    hist = np.asarray(hist[:256], dtype=np.float64)
+    total = hist.sum()
+    if total == 0:
+        return -1
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (cum_mean[-1] - cum_mean) / weight_fg
+        between = np.nan_to_num(weight_bg * weight_fg * (mean_bg - mean_fg) ** 2)
+    return int(np.argmax(between)) if between.max() > 0 else -1
+
+
+def ink_mask(page: Image.Image) -> np.ndarray:
+    """True where a pixel of a grayscale page is ink (darker than the Otsu threshold)."""
+    return np.asarray(page) <= otsu_threshold(page.histogram())
+
+
+def _row_profile(ys: np.ndarray, xs: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """Ink count per projected row, one profile per angle (shape: angles × rows)."""
+    rad = np.deg2rad(angles)[:, None]
+    rows = np.rint(ys[None, :] * np.cos(rad) + xs[None, :] * np.sin(rad)).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+    width = int(rows.max()) + 1
+    flat = rows + np.arange(len(angles))[:, None] * width
+    return np.bincount(flat.ravel(), minlength=len(angles) * width).reshape(len(angles), width)
+
+
+def _skew_from_points(ys: np.ndarray, xs: np.ndarray, max_angle: float) -> float:
+    if len(ys) < 200 or max_angle <= 0:
+        return 0.0
+    step = max(1, len(ys) // SKEW_SAMPLE_POINTS)
+    ys = ys[::step].astype(np.float64)
+    xs = xs[::step].astype(np.float64)
+    xs -= xs.mean()
+
+    def sharpness(angles):  # straight text lines → peaky profile → large sum of squares
+        return (_row_profile(ys, xs, angles).astype(np.float64) ** 2).sum(axis=1)
+
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 0.5)
+    best = coarse[np.argmax(sharpness(coarse))]
+    fine = np.arange(best - 0.5, best + 0.5 + 1e-9, 0.05)
+    return float(fine[np.argmax(sharpness(fine))])
+
+
+def estimate_skew(mask: np.ndarray, max_angle: float = None) -> float:
+    """
+    Angle (degrees, counter-clockwise) the text is rotated by; rotate by the
+    negative to straighten. Coarse 0.5° search, then 0.05° refinement.
+    """
+    ys, xs = np.nonzero(mask)
+    return _skew_from_points(ys, xs, PREPROCESS_MAX_SKEW if max_angle is None else max_angle)
+
+
+def _runs(active: np.ndarray):
+    """(start, stop) of every run of True values in a 1-D boolean array."""
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def content_box(mask: np.ndarray):
+    """(left, top, right, bottom) around the ink, ignoring isolated speckles; None if blank."""
+    height, width = mask.shape
+    rows = mask.sum(axis=1) > max(2, width // 500)
+    cols = mask.sum(axis=0) > max(2, height // 500)
+    if not rows.any() or not cols.any():
+        return None
+    top, bottom = np.flatnonzero(rows)[[0, -1]]
+    left, right = np.flatnonzero(cols)[[0, -1]]
+    return int(left), int(top), int(right) + 1, int(bottom) + 1
+
+
+def line_height(row_counts: np.ndarray, width: int) -> float:
+    """Median height (px) of the text lines in a horizontal ink profile; 0 if none."""
+    starts, stops = _runs(row_counts > max(2, width // 500))
+    heights = stops - starts
+    heights = heights[heights >= 3]  # rules and speckles are not text lines
+    return float(np.median(heights)) if len(heights) else 0.0
+
+
+class PageGeometry:
+    """How prepare_page moved the pixels: crop offset, then scale, then rotation."""
+
+    def __init__(self, offset=(0, 0), scale=(1.0, 1.0), angle=0.0, scaled_size=None, rotated_size=None):
+        self.offset = offset
+        self.scale = scale
+        self.angle = angle
+        self.scaled_size = scaled_size
+        self.rotated_size = rotated_size
+
+    def to_source(self, boxes) -> np.ndarray:
+        """Boxes (n, 4: x0, y0, x1, y1) on the prepared image → boxes on the original page."""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        xs, ys = boxes[:, [0, 2, 2, 0]], boxes[:, [1, 1, 3, 3]]  # all four corners
+        if self.angle:
+            # PIL rotated by -angle around the centre; rotate the corners back by +angle
+            rad = np.deg2rad(self.angle)
+            dx, dy = xs - self.rotated_size[0] / 2, ys - self.rotated_size[1] / 2
+            xs = dx * np.cos(rad) + dy * np.sin(rad) + self.scaled_size[0] / 2
+            ys = -dx * np.sin(rad) + dy * np.cos(rad) + self.scaled_size[1] / 2
+        xs = xs / self.scale[0] + self.offset[0]
+        ys = ys / self.scale[1] + self.offset[1]
+        return np.stack([xs.min(axis=1), ys.min(axis=1), xs.max(axis=1), ys.max(axis=1)], axis=1)
+
+
+def preprocess_page(image: Image.Image, mode: str = None) -> Image.Image:
+    """
+    Straightened, cropped, resized single-channel copy of a page for OCR.
+    mode: "gray" (default), "binary" (black/white, smallest) or "off".
+    """
+    return prepare_page(image, mode)[0]
+
+
+def prepare_page(image: Image.Image, mode: str = None):
+    """
+    (preprocessed page, PageGeometry) — see preprocess_page.
+    Measurements are made once on the full page; cropping and resizing come
+    before the rotation, so the expensive resampling runs on fewer pixels.
+    """
+    mode = mode or PREPROCESS_MODE
+    if mode == "off":
+        return image, PageGeometry()
+
+    page = image.convert("L")
+    mask = ink_mask(page)
+    box = content_box(mask)
+    if box is None:
+        return page, PageGeometry()  # blank page: nothing to straighten, crop or measure
+
+    # --- Skew and text line height, from the ink pixels inside the content box
+    left, top, right, bottom = box
+    ys, xs = np.nonzero(mask[top:bottom, left:right])
+    angle = _skew_from_points(ys, xs, PREPROCESS_MAX_SKEW)
+    straightened = _row_profile(ys.astype(np.float64), xs - xs.mean(), np.array([angle]))[0]
+    height = line_height(straightened, right - left)
+
+    # --- Crop empty margins (keep a little white border; Tesseract likes one)
+    pad = max(8, PREPROCESS_LINE_PX // 2)
+    crop_left, crop_top = max(0, left - pad), max(0, top - pad)
+    page = page.crop((crop_left, crop_top, min(page.width, right + pad), min(page.height, bottom + pad)))
+    geometry = PageGeometry(offset=(crop_left, crop_top))
+
+    # --- Adapt resolution to the text size
+    if height:
+        scale = min(MAX_SCALE, max(MIN_SCALE, PREPROCESS_LINE_PX / height))
+        if abs(scale - 1.0) > SCALE_DEADBAND:
+            size = (max(1, round(page.width * scale)), max(1, round(page.height * scale)))
+            geometry.scale = (size[0] / page.width, size[1] / page.height)
+            page = page.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+    # --- Deskew (PIL resamples in C)
+    if abs(angle) >= MIN_SKEW_DEGREES:
+        geometry.angle, geometry.scaled_size = angle, page.size
+        page = page.rotate(-angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+        geometry.rotated_size = page.size
+
+    if mode == "binary":
+        threshold = otsu_threshold(page.histogram())
+        page = page.point(lambda v: 255 if v > threshold else 0)
+    return page, geometry
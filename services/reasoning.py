@@ -1,6 +1,8 @@
 # services/reasoning.py
 import re
 
+from services.backends import backends
+
 def _parse_amount(amount_str):
     try:
         if not amount_str:
@@ -21,22 +23,20 @@ def validate_invoice(fields: dict) -> dict:
     # Placeholder: we don't have line-items to compute; return Unchecked with confidence
     return {"decision": "Unchecked", "confidence": 0.5, "reason": "no_line_items_to_verify"}
 
+def rank_resumes(fields_list, full_texts):
+    """
+    rank_resume for many resumes at once (vectorized with NumPy).
+    Returns (decisions, scores) arrays. Weights, keywords and thresholds
+    are the "resume_score" entry of the decision rule table.
+    """
+    return backends.get("decision", "rules").resume_scores(list(fields_list), list(full_texts))
+
+
 def rank_resume(fields: dict, full_text: str) -> dict:
     """
     Simple resume scoring:
     - presence of email and phone
     - keywords: experience, python, machine learning, ai, leadership
     """
-    score = 0.0
-    if fields.get("email"):
-        score += 0.3
-    if fields.get("phone"):
-        score += 0.2
-
-    text = (full_text or "").lower()
-    keywords = ["experience", "python", "machine learning", "deep learning", "nlp", "ai", "leadership"]
-    found = sum(1 for k in keywords if k in text)
-    score += min(found * 0.08, 0.4)  # up to 0.4
-
-    decision = "Recommended" if score >= 0.6 else "Consider" if score >= 0.3 else "Reject"
-    return {"decision": decision, "score": round(score, 2)}
+    decisions, scores = rank_resumes([fields or {}], [full_text])
+    return {"decision": str(decisions[0]), "score": float(scores[0])}
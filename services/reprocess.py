@@ -0,0 +1,145 @@
+"""
+services/reprocess.py
+Incremental reprocessing of the documents in services.document_store.
+- Each stored row records the stage versions its outputs were produced with;
+  only stages whose version differs from services.pipeline.stage_versions()
+  (and the stages depending on them) are re-run.
+- Everything runs from the stored OCR text and word layout: no file, no
+  rasterization, no OCR. Text is decompressed only for rows that re-classify
+  or re-extract, layout only for rows that re-explain.
+- Types and decisions for a whole chunk are computed in one batched call
+  each (detect_document_types, make_decisions), and each chunk is written
+  back in a single transaction.
+- Rows whose OCR version is stale need their original file; they are counted
+  and left untouched (re-upload or re-run the batch for those).
+
+    python -m services.reprocess                    # bring every stored result up to date
+    python -m services.reprocess --dry-run          # only report what would be re-run
+    python -m services.reprocess --refresh-cache    # also answer re-uploads from the result cache
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+from services.decision_engine import make_decisions
+from services.document_store import DocumentStore, decompress_text, document_store
+from services.explainability import locate_fields
+from services.layout import unpack_pages
+from services.ocr import detect_document_types, extract_key_fields
+from services.pipeline import stage_versions, result_version
+
+# Downstream stages and what each one reads from (OCR output is the root)
+DEPENDS_ON = {"classify": (), "extract": ("classify",), "decide": ("extract",), "explain": ("extract",)}
+
+
+def stale_stages(stored: dict, current: dict) -> tuple:
+    """Downstream stages to re-run: changed versions plus everything depending on them, in order."""
+    rerun = []
+    for stage, parents in DEPENDS_ON.items():
+        if stored.get(stage) != current[stage] or any(parent in rerun for parent in parents):
+            rerun.append(stage)
+    return tuple(rerun)
+
+
+def _response(row: dict) -> dict:
+    """api.schemas.InferenceResponse built from a stored row (no timings: nothing was timed)."""
+    return {
+        "document_type": row["document_type"],
+        "fields_extracted": row["fields"],
+        "decision": row["decision"],
+        "confidence_score": row["confidence"],
+        "explainability_map": "N/A",
+        "overlay": row["overlay"],
+        "pages": [{"page": i + 1, **stats} for i, stats in sorted((row["page_stats"] or {}).items())],
+    }
+
+
+def reprocess_chunk(rows: list, current: dict, counts: Counter) -> list:
+    """Re-run the stale stages of a chunk of stored rows in place; returns the updated rows."""
+    work = []
+    for row in rows:
+        if row["versions"].get("ocr") != current["ocr"]:
+            counts["needs_ocr"] += 1
+            continue
+        stages = stale_stages(row["versions"], current)
+        if not stages:
+            counts["current"] += 1
+            continue
+        counts.update(stages)
+        work.append((row, stages))
+
+    texts = {id(row): decompress_text(row["text"]) for row, stages in work if "extract" in stages}
+    classifying = [row for row, stages in work if "classify" in stages]
+    for row, doc_type in zip(classifying, detect_document_types([texts[id(row)] for row in classifying])):
+        row["document_type"] = doc_type
+    for row, stages in work:
+        if "extract" in stages:
+            row["fields"] = extract_key_fields(row["document_type"], texts[id(row)])
+
+    deciding = [row for row, stages in work if "decide" in stages]
+    if deciding:
+        decisions, confidences = make_decisions([r["document_type"] for r in deciding],
+                                                [r["fields"] or {} for r in deciding])
+        for row, decision, confidence in zip(deciding, decisions, confidences):
+            row["decision"], row["confidence"] = str(decision), float(confidence)
+
+    for row, stages in work:
+        if "explain" in stages:
+            pages = unpack_pages(row["layout"]) if row["layout"] else {}
+            row["overlay"] = locate_fields(sorted(pages.items()), row["fields"])
+        row["versions"] = {**row["versions"], **{stage: current[stage] for stage in stages}}
+    return [row for row, _ in work]
+
+
+def reprocess(store: DocumentStore = None, chunk_size: int = 1000, dry_run: bool = False, cache=None) -> dict:
+    """
+    Bring every stored document up to the current stage versions.
+    `cache` (a services.cache.ResultCache) also receives the refreshed results.
+    Returns counts: documents seen, per re-run stage, "current", "needs_ocr".
+    """
+    store = store or document_store
+    current = stage_versions()
+    counts = Counter()
+    for rows in store.iter_chunks(chunk_size):
+        counts["documents"] += len(rows)
+        if dry_run:
+            for row in rows:
+                if row["versions"].get("ocr") != current["ocr"]:
+                    counts["needs_ocr"] += 1
+                else:
+                    counts.update(stale_stages(row["versions"], current) or ("current",))
+            continue
+        updated = reprocess_chunk(rows, current, counts)
+        if updated:
+            store.update_outputs(updated)
+        if cache is not None:
+            from services.cache import content_key
+            for row in updated:
+                cache.put(content_key(row["sha256"], result_version(row["ocr_engine"])), _response(row))
+    return dict(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run stale pipeline stages over stored documents.")
+    parser.add_argument("--db", default=None, help="Document store path (default DOCUMENT_STORE_PATH)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be re-run")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Write refreshed results to the result cache under the current version")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.refresh_cache:
+        from services.cache import result_cache
+        cache = result_cache
+    started = time.perf_counter()
+    counts = reprocess(DocumentStore(args.db, enabled=True), args.chunk_size, args.dry_run, cache)
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(counts), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
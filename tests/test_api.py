@@ -1,35 +1,117 @@
 # tests/test_api.py
 """
 Automated tests for FastAPI backend.
-Covers root endpoint and /extract_text/ (with and without files).
+Covers the root endpoint, /analyze_document/ (missing file, digital PDF) and
+its Server-Sent Events variant /analyze_document/stream.
 """
 
+import json
+
 from fastapi.testclient import TestClient
-from api.main import app
-import io
+import api.main as main
+from benchmarks.synthetic import make_document
+from services import near_duplicates, pipeline
+from services.cache import ResultCache
+from services.document_store import DocumentStore
+from services.near_duplicates import NearDuplicateIndex
+from services.pool import WorkerPool
 
-client = TestClient(app)
+client = TestClient(main.app)
 
 def test_root():
     res = client.get("/")
     assert res.status_code == 200
-    assert "Document Understanding" in res.json()["message"]
-
-def test_extract_no_file():
-    res = client.post("/extract_text/")
-    assert res.status_code in [400, 422]
-
-def test_extract_invalid_file_type():
-    fake_file = io.BytesIO(b"not a pdf")
-    res = client.post("/extract_text/", files={"file": ("fake.txt", fake_file, "text/plain")})
-    assert res.status_code == 400
-    assert "Only PDF" in res.json()["detail"]
-
-def test_extract_with_pdf():
-    # create a simple fake PDF in memory
-    pdf_bytes = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\ntrailer<</Root 1 0 R>>%%EOF"
-    res = client.post("/extract_text/", files={"file": ("sample.pdf", io.BytesIO(pdf_bytes), "application/pdf")})
+    assert "API is running" in res.json()["message"]
+
+def test_analyze_no_file():
+    res = client.post("/analyze_document/")
+    assert res.status_code == 422
+
+def test_analyze_digital_invoice(monkeypatch, tmp_path):
+    # Real pipeline on a thread pool; a text-layer PDF needs no Tesseract
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path)))
+    monkeypatch.setattr(pipeline, "document_store", DocumentStore(str(tmp_path / "documents.sqlite3")))
+    monkeypatch.setattr(near_duplicates, "near_duplicate_index", NearDuplicateIndex(str(tmp_path / "near.sqlite3")))
+    doc = make_document("invoice", "digital")
+    res = client.post("/analyze_document/", files={"file": (doc.filename, doc.data, "application/pdf")})
+    main.pipeline_pool.shutdown()
     assert res.status_code == 200
     data = res.json()
-    assert "file_name" in data
-    assert "extracted_text" in data
+    assert data["document_type"] == "invoice"
+    assert data["fields_extracted"]["invoice_no"].startswith("INV-")
+    assert data["pages"][0]["strategy"] == "text_layer"
+
+def test_ocr_engine_is_validated_and_passed_through(monkeypatch, tmp_path):
+    seen = []
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path)))
+    monkeypatch.setattr(main, "analyze_file", lambda doc, ocr_engine=None, explain_image=False: seen.append(ocr_engine) or {
+        "document_type": "report", "fields_extracted": {}, "decision": "Analyzed",
+        "confidence_score": 0.88, "explainability_map": "N/A"})
+    files = {"file": ("scan.png", b"same bytes", "image/png")}
+
+    assert client.post("/analyze_document/?ocr_engine=nope", files=files).status_code == 400
+    assert client.post("/analyze_document/?ocr_engine=tesseract", files=files).status_code == 200
+    assert client.post("/analyze_document/", files=files).status_code == 200  # default engine: cached
+    if not main.backends.available("ocr", "paddle"):
+        assert "not installed" in client.post("/analyze_document/?ocr_engine=paddle", files=files).json()["detail"]
+    main.pipeline_pool.shutdown()
+    assert seen == ["tesseract"]
+
+def _events(res):
+    """(name, data) pairs of a text/event-stream body."""
+    events = []
+    for block in res.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_stream_sends_partial_results_then_the_result(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path)))
+    monkeypatch.setattr(pipeline, "document_store", DocumentStore(str(tmp_path / "documents.sqlite3")))
+    monkeypatch.setattr(near_duplicates, "near_duplicate_index", NearDuplicateIndex(str(tmp_path / "near.sqlite3")))
+    doc = make_document("invoice", "digital", pages=2)
+    files = {"file": (doc.filename, doc.data, "application/pdf")}
+    res = client.post("/analyze_document/stream", files=files)
+    assert res.status_code == 200 and res.headers["content-type"].startswith("text/event-stream")
+    events = _events(res)
+    names = [name for name, _ in events if name != "stage"]
+    assert names == ["page", "page", "document_type", "fields", "decision", "overlay", "result"]
+    pages = [data for name, data in events if name == "page"]
+    assert [p["page"] for p in pages] == [1, 2] and pages[0]["page_count"] == 2
+    assert pages[0]["strategy"] == "text_layer" and "INV-" in pages[0]["text"]
+    result = events[-1][1]
+    assert result["document_type"] == "invoice" and dict(events)["fields"]["fields_extracted"] == result["fields_extracted"]
+
+    # Repeat upload: answered from the cache, same events without the pages
+    cached = _events(client.post("/analyze_document/stream", files=files))
+    main.pipeline_pool.shutdown()
+    assert [name for name, _ in cached] == ["document_type", "fields", "decision", "overlay", "result"]
+    assert cached[-1][1] == result
+    assert _shapes(cached) == {name: shape for name, shape in _shapes(events).items() if name in dict(cached)}
+
+
+def _shapes(events):
+    """{event name: {key: value type}} (the last event of each name)."""
+    return {name: {key: type(value) for key, value in data.items()} for name, data in events}
+
+
+def test_cached_stream_without_overlay_keeps_the_live_shape():
+    events = [(event.pop("event"), event) for event in pipeline.result_events(
+        {"document_type": "invoice", "fields_extracted": {}, "decision": "Approved", "confidence_score": 0.9,
+         "explainability_map": "N/A"})]  # cached before overlays were stored
+    assert dict(events)["overlay"]["overlay"] == {"pages": [], "regions": []}
+
+def test_stream_reports_pipeline_errors(monkeypatch, tmp_path):
+    def failing(doc, ocr_engine=None, explain_image=False, on_event=None):
+        on_event({"event": "stage", "stage": "ocr", "state": "running"})
+        raise RuntimeError("unreadable file")
+
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path)))
+    monkeypatch.setattr(main, "analyze_file", failing)
+    res = client.post("/analyze_document/stream", files={"file": ("scan.png", b"broken", "image/png")})
+    main.pipeline_pool.shutdown()
+    assert _events(res) == [("stage", {"stage": "ocr", "state": "running"}), ("error", {"detail": "unreadable file"})]
@@ -0,0 +1,56 @@
+"""
+Tests for services/backends.py (lazy backend registry and warm-up).
+"""
+
+import pytest
+
+from benchmarks import startup
+from services.backends import BackendRegistry, BackendUnavailable
+
+
+def test_backends_load_once_on_first_use():
+    calls = []
+    registry = BackendRegistry()
+    registry.register("ocr", "fake", lambda: calls.append(1) or "engine")
+    assert calls == [] and not registry.is_loaded("ocr", "fake")
+    assert registry.get("ocr") == "engine" and registry.get("ocr", "fake") == "engine"
+    assert calls == [1] and registry.status()["ocr"]["fake"]["loaded"]
+
+
+def test_missing_backend_is_reported_not_fatal():
+    def missing():
+        import not_a_real_package  # noqa: F401
+
+    registry = BackendRegistry()
+    registry.register("ocr", "missing", missing)
+    registry.register("ocr", "ok", lambda: "ok", default=True)
+    assert registry.default("ocr") == "ok"
+    with pytest.raises(BackendUnavailable):
+        registry.get("ocr", "missing")
+    assert registry.optional("ocr", "missing") is None
+
+    report = registry.warm_up("ocr:missing, ocr:ok, ocr:nope")
+    assert "not installed" in report["ocr:missing"]
+    assert isinstance(report["ocr:ok"], float)
+    assert report["ocr:nope"] == "unknown backend"
+
+
+def test_failing_loader_is_cached_as_unavailable():
+    calls = []
+
+    def corrupt():
+        calls.append(1)
+        raise RuntimeError("corrupt checkpoint")
+
+    registry = BackendRegistry()
+    registry.register("extraction", "broken", corrupt)
+    assert registry.optional("extraction", "broken") is None
+    assert registry.optional("extraction", "broken") is None
+    assert calls == [1] and not registry.available("extraction", "broken")
+    assert "failed to load" in registry.status()["extraction"]["broken"]["error"]
+
+
+def test_fresh_worker_imports_no_heavy_backend():
+    result = startup.measure("worker", repeat=1)
+    assert result["heavy_modules"] == []
+    assert result["import_seconds"] > 0
@@ -0,0 +1,75 @@
+"""
+Tests for the benchmark harness: synthetic corpus, statistics and baseline comparison.
+"""
+
+from benchmarks import run
+from benchmarks.synthetic import generate_corpus, make_document
+
+
+def test_digital_pdf_has_text_layer_and_page_count():
+    doc = make_document("invoice", "digital", pages=3)
+    assert doc.is_pdf and doc.page_count == 3
+    assert "Invoice No: INV-" in doc.text_layer(0)
+    assert "Total Amount:" in doc.text_layer(2)
+
+
+def test_scanned_forms_have_no_text_layer():
+    scanned = make_document("resume", "scanned", pages=2)
+    assert scanned.page_count == 2 and scanned.text_layer(0).strip() == ""
+    image = make_document("resume", "image", pages=5)
+    assert not image.is_pdf and image.filename.endswith(".png")
+
+
+def test_corpus_is_deterministic():
+    first = generate_corpus(("report",), ("digital", "image"), page_counts=(1, 2), copies=2)
+    second = generate_corpus(("report",), ("digital", "image"), page_counts=(1, 2), copies=2)
+    assert len(first) == 2 * 2 + 2  # images are single-page only
+    assert [d.sha256 for d in first] == [d.sha256 for d in second]
+    assert len({d.sha256 for d in first}) == len(first)
+
+
+def test_percentiles_and_summary():
+    values = [float(v) for v in range(1, 101)]
+    assert run.percentile(values, 0.5) == 50.5
+    assert run.percentile(values, 0.99) == 99.01
+    stats = run.summarize({"ocr": [0.3, 0.1, 0.2]})["ocr"]
+    assert stats["count"] == 3 and stats["p50"] == 0.2
+
+
+def _report(docs_per_sec, ocr_p95):
+    return {"corpus": {"pages": [1]}, "modes": {"services": {
+        "docs_per_sec": docs_per_sec, "peak_rss_mb": {"self": 100.0},
+        "stages": {"ocr": {"p95": ocr_p95}, "decide": {"p95": 0.0001}},
+    }}}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = _report(10.0, 0.5)
+    assert run.compare(_report(9.0, 0.55), baseline, 0.25)["regressions"] == []
+
+    result = run.compare(_report(5.0, 1.0), baseline, 0.25)
+    assert {r["metric"] for r in result["regressions"]} == {"services.docs_per_sec", "services.ocr.p95"}
+
+    faster = run.compare(_report(20.0, 0.5), baseline, 0.25)
+    assert faster["improvements"][0]["metric"] == "services.docs_per_sec"
+
+
+def test_services_benchmark_on_digital_pdfs():
+    corpus = generate_corpus(("invoice",), ("digital",), page_counts=(1,), copies=2)
+    report = run.bench_services(corpus)
+    assert report["documents"] == 2 and report["errors"] == []
+    assert {"ocr", "classify", "extract", "decide", "explain", "total"} <= set(report["stages"])
+    assert report["field_accuracy"] == 1.0  # the text layer is the ground truth
+
+
+def test_field_score_and_accuracy_regression():
+    doc = make_document("invoice", "digital")
+    score = run.FieldScore()
+    score.add(doc.truth_text, {})
+    assert score.total > 0 and score.accuracy == 0.0
+
+    baseline, current = _report(10.0, 0.5), _report(10.0, 0.5)
+    baseline["modes"]["services"]["field_accuracy"] = 0.95
+    current["modes"]["services"]["field_accuracy"] = 0.90
+    metrics = {r["metric"] for r in run.compare(current, baseline, 0.25)["regressions"]}
+    assert metrics == {"services.field_accuracy"}
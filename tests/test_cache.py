@@ -0,0 +1,72 @@
+"""
+Tests for the content-addressed result cache (memory LRU + disk tier).
+"""
+
+import io
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from services.cache import ResultCache, content_key
+from services.pool import WorkerPool
+
+client = TestClient(main.app)
+
+
+def test_memory_lru_falls_back_to_disk(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), memory_items=1, max_disk_bytes=10**6, ttl_seconds=60)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # evicted from memory, served from disk
+    assert cache.get("a") == {"v": 1}  # promoted back into memory
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_ttl_and_size_eviction(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), memory_items=0, max_disk_bytes=10**6, ttl_seconds=60)
+    cache.put("old", {"v": 1})
+    stale = time.time() - 120
+    os.utime(tmp_path / "old.json", (stale, stale))
+    assert cache.get("old") is None
+
+    small = ResultCache(directory=str(tmp_path / "small"), memory_items=0, max_disk_bytes=40, ttl_seconds=0)
+    small.put("first", {"payload": "x" * 10})
+    time.sleep(0.01)
+    small.put("second", {"payload": "y" * 10})
+    assert small.get("first") is None
+    assert small.get("second") == {"payload": "y" * 10}
+
+
+def test_content_key_includes_version():
+    assert content_key("abc", "1") != content_key("abc", "2")
+
+
+def test_repeat_upload_is_served_from_cache(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def fake_pipeline(path, ocr_engine=None, explain_image=False):
+        calls.append(path)
+        return {
+            "document_type": "report",
+            "fields_extracted": {},
+            "decision": "Analyzed",
+            "confidence_score": 0.88,
+            "explainability_map": "N/A",
+        }
+
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(main, "pipeline_pool", pool)
+    monkeypatch.setattr(main, "analyze_file", fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+
+    for _ in range(2):
+        res = client.post("/analyze_document/", files={"file": ("r.pdf", io.BytesIO(b"same"), "application/pdf")})
+        assert res.status_code == 200
+    assert len(calls) == 1
+    assert client.get("/cache/stats").json()["memory_hits"] == 1
+    pool.shutdown()
@@ -0,0 +1,84 @@
+"""
+Tests for the hashed-feature document classifier (services/classifier.py)
+and how services.ocr / services.pipeline use it.
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import KINDS, document_pages
+from services import ocr, pipeline
+from services.backends import backends, _Backend
+from services.classifier import HashingVectorizer, LinearClassifier, load_classifier
+
+# Texts the keyword scan routes wrongly (first type with a keyword hit wins)
+MISROUTED = [
+    ("Report Title: Budget review\nSummary: quarterly revenue growth\nFindings\nInvoice backlog grew", "report"),
+    ("RESUME\nName: Asha Verma\nSkills: Python, SQL\nExpected amount: 12 LPA\nExperience", "resume"),
+]
+
+
+def _fit(texts, labels, vectorizer, steps=120, lr=2.0) -> LinearClassifier:
+    """Full-batch softmax regression in NumPy (training/train.py does the same with an EmbeddingBag)."""
+    indptr, indices, values = vectorizer.transform(texts)
+    rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+    targets = np.eye(len(KINDS))[[KINDS.index(label) for label in labels]]
+    weights = np.zeros((vectorizer.n_features, len(KINDS)), np.float32)
+    bias = np.zeros(len(KINDS), np.float32)
+    for _ in range(steps):
+        scores = LinearClassifier(weights, bias, KINDS, vectorizer).decision_function(indptr, indices, values)
+        probabilities = np.exp(scores - scores.max(axis=1, keepdims=True))
+        gradient = (probabilities / probabilities.sum(axis=1, keepdims=True) - targets) / len(texts)
+        for column in range(len(KINDS)):
+            weights[:, column] -= lr * np.bincount(indices, weights=values * gradient[rows, column],
+                                                   minlength=vectorizer.n_features)
+        bias -= lr * gradient.sum(axis=0)
+    return LinearClassifier(weights, bias, KINDS, vectorizer)
+
+
+@pytest.fixture(scope="module")
+def model():
+    texts, labels = [], []
+    for seed in range(60):
+        kind = KINDS[seed % len(KINDS)]
+        lines = [line for page in document_pages(kind, pages=1, seed=seed) for line in page]
+        texts.append("\n".join(lines[:8 + seed % 20]))
+        labels.append(kind)
+    return _fit(texts, labels, HashingVectorizer(n_features=2 ** 14))
+
+
+def test_hashed_features_are_normalized_and_fold_digits():
+    vectorizer = HashingVectorizer(n_features=2 ** 12)
+    indptr, indices, values = vectorizer.transform(["Invoice No INV-123 total", "invoice no inv-9 TOTAL", "", "!!"])
+    assert list(np.diff(indptr)) == [9, 9, 0, 0]  # 5 unigrams (inv, 0) + 4 bigrams; none for empty texts
+    first, second = slice(indptr[0], indptr[1]), slice(indptr[1], indptr[2])
+    assert np.array_equal(indices[first], indices[second]) and np.allclose(values[first], values[second])
+    assert np.isclose(np.square(values[first]).sum(), 1.0)
+    assert np.all(indices < 2 ** 12)
+
+
+def test_trained_model_fixes_keyword_misrouting(model, monkeypatch):
+    texts = [text for text, _ in MISROUTED]
+    assert [ocr.detect_document_type(text) for text in texts] == ["invoice", "invoice"]  # keyword rules
+
+    monkeypatch.setitem(backends._backends, ("classifier", "linear"), _Backend("classifier", "linear", lambda: model))
+    assert ocr.detect_document_types(texts) == [label for _, label in MISROUTED]
+    assert [ocr.detect_document_type(text) for text in texts] == ocr.detect_document_types(texts)
+    assert ocr.detect_document_type("") == "unknown"
+
+    pipeline.stage_versions.cache_clear()
+    try:
+        assert pipeline.stage_versions()["classify"].endswith(model.fingerprint)
+    finally:
+        pipeline.stage_versions.cache_clear()
+
+
+def test_artifact_round_trip(model, tmp_path):
+    path = str(tmp_path / "doc_classifier.npz")
+    assert load_classifier(path) is None  # no artifact: keyword fallback
+    model.save(path)
+    loaded = load_classifier(path)
+    assert loaded.classes == list(KINDS) and loaded.vectorizer.config() == model.vectorizer.config()
+    texts = [text for text, _ in MISROUTED]
+    assert loaded.predict(texts) == model.predict(texts)
+    assert np.allclose(loaded.predict_proba(texts), model.predict_proba(texts), atol=1e-2)  # float16 weights
@@ -0,0 +1,72 @@
+"""
+Tests for the compiled decision rule table (services/decision_rules.py) and
+the single-document / batch / re-scoring entry points built on it.
+"""
+
+import io
+import json
+
+import numpy as np
+
+from services import decision_engine
+from services.decision_engine import make_decision, make_decisions
+from services.decision_rules import compile_rules, load_rules
+from services.reasoning import rank_resume, rank_resumes
+
+CASES = [
+    ("invoice", {"total_amount": "999.99"}, ("Approved", 0.95)),
+    ("invoice", {"total_amount": "1,000"}, ("Needs Review", 0.85)),
+    ("Invoice", {"total_amount": "50000"}, ("Needs Review", 0.85)),
+    ("invoice", {"total_amount": "₹50,000.01"}, ("Rejected", 0.90)),
+    ("invoice", {"total_amount": "n/a"}, ("Needs Review", 0.75)),   # not a number → default
+    ("invoice", {}, ("Needs Review", 0.75)),
+    ("resume", {"skills": ["Python", "Machine Learning"]}, ("Shortlisted", 0.92)),
+    ("resume", {"skills": ["Java"]}, ("Needs Review", 0.70)),
+    ("report", {}, ("Analyzed", 0.88)),
+    ("unknown", {"note": "No structured fields found for this document type."}, ("Needs Review", 0.75)),
+    (None, {}, ("Needs Review", 0.75)),
+]
+
+
+def test_single_and_batch_decisions_agree(capsys):
+    for doc_type, fields, expected in CASES:
+        assert make_decision(doc_type, fields) == expected
+    decisions, confidences = make_decisions([c[0] for c in CASES], [c[1] for c in CASES])
+    assert list(zip(decisions, confidences)) == [c[2] for c in CASES]
+    assert capsys.readouterr().out == ""  # no per-call logging
+
+
+def test_threshold_change_from_config(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"types": {"invoice": {"rules": [
+        {"field": "total_amount", "op": "<=", "value": 5000, "decision": "Approved", "confidence": 0.9},
+    ], "otherwise": {"decision": "Escalate", "confidence": 0.6}}}}))
+    table = compile_rules(load_rules(str(path)))
+    decisions, confidences = table.decide(["invoice", "invoice", "report"],
+                                          [{"total_amount": "5,000"}, {"total_amount": "7000"}, {}])
+    assert list(decisions) == ["Approved", "Escalate", "Analyzed"]  # other types keep the defaults
+    assert np.allclose(confidences, [0.9, 0.6, 0.88])
+
+
+def test_resume_ranking_batch_matches_single():
+    fields = [{"email": "a@b.co", "phone": "9999999999"}, {"email": "a@b.co"}, {}]
+    texts = ["Experience: Python, machine learning, NLP, leadership", "python", ""]
+    decisions, scores = rank_resumes(fields, texts)
+    assert list(decisions) == ["Recommended", "Consider", "Reject"]
+    assert [rank_resume(f, t) for f, t in zip(fields, texts)] == [
+        {"decision": d, "score": s} for d, s in zip(decisions, scores)]
+    assert rank_resume(fields[0], texts[0]) == {"decision": "Recommended", "score": 0.9}
+
+
+def test_rescore_stored_results(monkeypatch, tmp_path):
+    source = tmp_path / "results.ndjson"
+    source.write_text("\n".join(json.dumps(r) for r in [
+        {"file": "a.pdf", "status": "ok", "document_type": "invoice",
+         "fields_extracted": {"total_amount": "120"}, "decision": "Needs Review", "confidence_score": 0.85},
+        {"file": "b.pdf", "status": "error", "error": "broken"},
+    ]) + "\n")
+    out = tmp_path / "out.ndjson"
+    decision_engine.main([str(source), "--output", str(out), "--chunk-size", "1"])
+    rows = [json.loads(line) for line in io.StringIO(out.read_text())]
+    assert rows[0]["decision"] == "Approved" and rows[0]["confidence_score"] == 0.95
+    assert rows[1] == {"file": "b.pdf", "status": "error", "error": "broken"}
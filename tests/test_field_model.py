@@ -0,0 +1,129 @@
+"""
+Tests for transformer field extraction (services/field_model.py) and its
+regex fallback in services.ocr.extract_key_fields.
+"""
+
+import re
+
+import numpy as np
+import pytest
+
+from services import ocr
+from services.backends import backends, _Backend
+from services.field_model import FieldModel, field_model_fingerprint
+from services.microbatch import MicroBatcher
+
+INVOICE = "Invoice No: INV 2024\nDate: 2024-01-02\nTotal: 1,250.00"
+LABELS = ["O", "B-invoice_no", "I-invoice_no", "B-total_amount"]
+TAGS = {"INV": 1, "2024": 2, "1,250.00": 3}  # token → label id the fake network predicts
+
+
+class _WhitespaceTokenizer:
+    """Fast-tokenizer stand-in: one token per word, windows of `max_length` tokens."""
+    pad_token_id = 0
+
+    def __call__(self, text, max_length, stride, **_):
+        words = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+        step = max_length - stride
+        starts = range(0, max(len(words) - stride, 1), step)
+        return {
+            "input_ids": [[TAGS.get(text[s:e], 10) for s, e in words[i:i + max_length]] for i in starts],
+            "offset_mapping": [words[i:i + max_length] for i in starts],
+        }
+
+
+def _fake_model(max_tokens=64, stride=2, max_batch_size=4, max_wait_ms=1) -> FieldModel:
+    model = FieldModel.__new__(FieldModel)
+    model.labels = LABELS
+    model.tokenizer = _WhitespaceTokenizer()
+    model.max_tokens, model.stride = max_tokens, stride
+    model.runner = lambda ids, mask: np.eye(len(LABELS))[np.where(ids < len(LABELS), ids, 0)]
+    model.fingerprint = "fake"
+    model.batcher = MicroBatcher(model._forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                                 buckets=(8, 64))
+    return model
+
+
+def test_spans_are_decoded_across_batched_windows():
+    model = _fake_model(max_tokens=4, stride=1)  # INVOICE splits into several windows
+    assert model.extract(INVOICE) == {"invoice_no": "INV 2024", "total_amount": "1,250.00"}
+    assert model.extract_batch(["", INVOICE]) == [{}, model.extract(INVOICE)]
+    assert model.stats()["max_batch"] > 1
+
+
+def test_model_values_override_regex_and_regex_fills_gaps(monkeypatch):
+    assert ocr.extract_key_fields("invoice", INVOICE)["invoice_no"] == "INV"  # regex stops at the space
+    monkeypatch.setattr(ocr, "EXTRACTION_BACKEND", "transformer")
+    model = _fake_model()
+    monkeypatch.setitem(backends._backends, ("extraction", "transformer"),
+                        _Backend("extraction", "transformer", lambda: model))
+    assert ocr.extract_key_fields("invoice", INVOICE) == {
+        "invoice_no": "INV 2024", "total_amount": "1,250.00", "date": "2024-01-02"}
+
+
+def test_regex_fallback_without_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr, "EXTRACTION_BACKEND", "transformer")
+    expected = {"invoice_no": "INV", "total_amount": "1,250.00", "date": "2024-01-02"}
+    monkeypatch.setitem(backends._backends, ("extraction", "transformer"),
+                        _Backend("extraction", "transformer", lambda: None))  # no checkpoint
+    assert ocr.extract_key_fields("invoice", INVOICE) == expected
+
+    def broken():
+        raise RuntimeError("corrupt checkpoint")
+
+    monkeypatch.setitem(backends._backends, ("extraction", "transformer"),
+                        _Backend("extraction", "transformer", broken))
+    assert ocr.extract_key_fields("invoice", INVOICE) == expected
+    assert field_model_fingerprint(str(tmp_path)) == field_model_fingerprint(str(tmp_path / "missing"))
+
+
+def test_model_server_batches_concurrent_workers(monkeypatch):
+    import threading
+    from services import backends as backends_module, model_server
+
+    model = _fake_model(max_batch_size=2, max_wait_ms=2000)  # a lone request would wait 2 s
+    monkeypatch.setattr(model_server, "_model", model)
+    server = model_server.FieldModelManager().get_server()  # served from a thread here, a process in production
+    server.stop_event = threading.Event()  # serve_forever() without its sys.exit() on stop
+    threading.Thread(target=server.accepter, daemon=True).start()  # one server thread per connection
+    monkeypatch.setenv(model_server.SERVER_ENV, model_server.encode_address(server.address))
+
+    results = []
+
+    def worker():  # one pool worker: its transformer backend is a proxy to the server
+        results.append(backends_module._load_field_model().extract(INVOICE))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert results == [{"invoice_no": "INV 2024", "total_amount": "1,250.00"}] * 2
+    assert model.stats()["batches"] == 1 and model.stats()["max_batch"] == 2  # one shared forward pass
+
+
+def test_tiny_checkpoint_end_to_end(tmp_path):
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from services.field_model import load_field_model, make_tiny_checkpoint
+
+    path = make_tiny_checkpoint(str(tmp_path / "field-extractor"))
+    model = load_field_model(path)
+    assert model.runner.name == "torch-int8" and "invoice_no" in model.fields
+    results = model.extract_batch([INVOICE, INVOICE.lower()])
+    assert all(isinstance(value, str) and value for found in results for value in found.values())
+    assert set().union(*results) <= set(model.fields)
+
+
+def test_stage_version_fingerprints_without_loading(monkeypatch):
+    from services import pipeline
+    monkeypatch.setattr(pipeline, "EXTRACTION_BACKEND", "transformer")
+    loads = []
+    monkeypatch.setitem(backends._backends, ("extraction", "transformer"),
+                        _Backend("extraction", "transformer", lambda: loads.append(1)))
+    pipeline.stage_versions.cache_clear()
+    try:
+        assert pipeline.stage_versions()["extract"].endswith((".rules", field_model_fingerprint()))
+    finally:
+        pipeline.stage_versions.cache_clear()
+    assert loads == []
@@ -0,0 +1,42 @@
+"""
+Tests for the compiled extraction engine (services/fields.py) behind services.ocr.
+"""
+
+from services.fields import Vocabulary
+from services.ocr import detect_document_type, extract_key_fields
+
+
+def test_invoice_fields_single_pass():
+    text = "ACME Pvt Ltd\nInvoice No: INV-2024-001\nDate: 12/03/2024\nTotal Amount: ₹12,500.00"
+    assert extract_key_fields("invoice", text) == {
+        "invoice_no": "INV-2024-001", "total_amount": "12,500.00", "date": "12/03/2024"
+    }
+
+
+def test_resume_fields_and_whole_word_skills():
+    text = ("Jane Doe\nJANE.DOE@Example.com  +91 9876543210\n"
+            "Skills: C++, JavaScript, machine\nlearning, email marketing, pytorch")
+    fields = extract_key_fields("resume", text)
+    assert fields["name"] == "Jane Doe"
+    assert fields["email"] == "jane.doe@example.com"
+    assert fields["phone"] == "9876543210"
+    # "Java" inside "JavaScript" and "AI" inside "email" are not skills
+    assert fields["skills"] == ["C++", "Machine Learning", "PyTorch"]
+
+
+def test_same_position_fields_are_all_found():
+    fields = extract_key_fields("resume", "9876543210@gmail.com")
+    assert fields["phone"] == "9876543210"
+    assert fields["email"] == "9876543210@gmail.com"
+
+
+def test_document_type_priority():
+    assert detect_document_type("Experience ... total due 500") == "invoice"
+    assert detect_document_type("Project REPORT\nEducation") == "resume"
+    assert detect_document_type("Findings and conclusions") == "report"
+    assert detect_document_type("") == "unknown"
+
+
+def test_vocabulary_reports_overlapping_terms():
+    vocab = Vocabulary(["machine", "machine learning", "learning", "c", "c++"], whole_words=True)
+    assert set(vocab.iter_matches("machine learning in c++")) == {"machine", "machine learning", "learning", "c++"}
@@ -0,0 +1,78 @@
+"""
+Tests for the SQLite-backed job queue and the /jobs endpoints.
+"""
+
+import io
+import time
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+import services.jobs as jobs
+from services.cache import ResultCache
+from services.document import Document
+from services.metrics import StageMetrics
+from services.pool import WorkerPool
+
+client = TestClient(main.app)
+
+
+def _fake_pipeline(doc, on_stage=None, ocr_engine=None):
+    for stage in jobs.STAGES:
+        on_stage(stage, "running")
+        on_stage(stage, "done")
+    return {"document_type": "invoice", "fields_extracted": {"total_amount": "500"},
+            "decision": "Approved", "confidence_score": 0.95, "explainability_map": "N/A",
+            "timings": {"ocr": 0.5, "total": 0.75}}
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    store = jobs.JobStore(str(tmp_path))
+    job_id = store.create(Document(b"pdf", "a.pdf"))
+    assert store.claim_next() == job_id
+    assert store.claim_next() is None
+
+    # Simulate a restart: the runner that claimed the job no longer exists
+    with store._db() as conn:
+        conn.execute("UPDATE jobs SET runner_pid = 999999999 WHERE id = ?", (job_id,))
+    restarted = jobs.JobStore(str(tmp_path))
+    assert restarted.recover() == 1
+    assert restarted.get(job_id)["status"] == "queued"
+    assert restarted.load_input(job_id).data == b"pdf"
+
+
+def test_job_lifecycle_through_api(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "analyze_file", _fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+    monkeypatch.setattr(main, "stage_metrics", StageMetrics())
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    main.start_jobs(jobs.JobStore(str(tmp_path / "jobs")), pool)
+    try:
+        res = client.post("/jobs", files={"file": ("inv.pdf", io.BytesIO(b"%PDF"), "application/pdf")})
+        assert res.status_code == 202
+        job_id = res.json()["job_id"]
+
+        for _ in range(100):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] == "done":
+                break
+            time.sleep(0.05)
+        assert job["status"] == "done"
+        assert job["progress"] == {stage: "done" for stage in jobs.STAGES}
+        assert job["result"]["decision"] == "Approved"
+        assert job["result"]["timings"] is None
+        assert "timings" not in main.job_store.get(job_id)["result"]
+
+        for _ in range(100):
+            if main.result_cache.stats()["stores"]:
+                break
+            time.sleep(0.05)
+        assert main.stage_metrics.summary()["total"]["invoice"]["count"] == 1
+
+        # The same bytes again are answered from the result cache without queueing
+        again = client.post("/jobs", files={"file": ("inv.pdf", io.BytesIO(b"%PDF"), "application/pdf")})
+        assert again.json()["status"] == "done"
+        assert client.get("/jobs/unknown").status_code == 404
+    finally:
+        main.stop_jobs()
+        pool.shutdown()
@@ -0,0 +1,89 @@
+"""
+Tests for word boxes (services.layout) and the field overlay built from them.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import services.ocr as ocr
+from benchmarks.synthetic import make_document
+from services import layout, preprocess
+from services.backends import backends, _Backend
+from services.document import Document
+from services.explainability import field_overlay, highlight_text_areas
+from services.ocr_engines import OcrEngine
+from services.outputs import output_store
+
+
+def _tesseract_data(rows):
+    """image_to_data(output_type=DICT) shape from (block, par, line, text, left, top, width, height)."""
+    keys = ("block_num", "par_num", "line_num", "text", "left", "top", "width", "height")
+    data = {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+    data["conf"] = [-1 if not row[3] else 91.5 for row in rows]
+    return data
+
+
+def test_tesseract_data_gives_text_and_word_boxes():
+    text, words = layout.from_tesseract_data(_tesseract_data([
+        (1, 0, 0, "", 0, 0, 800, 100),  # block header row, no text
+        (1, 1, 1, "Invoice", 10, 10, 80, 20), (1, 1, 1, "No:", 95, 10, 30, 20),
+        (1, 1, 1, "INV-42", 130, 10, 60, 20),
+        (2, 1, 1, "Total", 10, 60, 50, 20), (2, 1, 1, "₹1,200.00", 65, 60, 90, 20),
+    ]), (800, 100))
+    assert text == "Invoice No: INV-42\n\nTotal ₹1,200.00"
+    assert words.boxes.dtype == np.float32 and words.boxes.shape == (5, 4)
+    assert words.find("INV-42") == [[130, 10, 190, 30]]
+    assert words.find("1,200.00") == [[65, 60, 155, 80]]  # currency sign ignored
+    assert words.find("Invoice No") == [[10, 10, 125, 30]]
+    assert words.find("missing") == []
+
+
+def test_values_spanning_lines_get_one_box_per_line():
+    _, words = layout.from_text_lines([("Name: Priya", [0, 0, 110, 10]), ("Nair Email", [0, 12, 100, 22])], (200, 100))
+    words = words.normalized((200, 100))
+    assert np.allclose(words.find("Priya\nNair"), [[0.3, 0.0, 0.55, 0.1], [0.0, 0.12, 0.2, 0.22]])
+
+
+def test_ocr_boxes_are_mapped_back_through_preprocessing(monkeypatch):
+    page = Image.new("L", (1200, 1500), 255)
+    draw = ImageDraw.Draw(page)
+    for row in range(12):
+        draw.rectangle((200, 300 + row * 40, 900, 320 + row * 40), fill=0)
+    page = page.rotate(2, resample=Image.BILINEAR, fillcolor=255)
+    prepared, geometry = preprocess.prepare_page(page)
+
+    class BoxEngine(OcrEngine):
+        name = "boxes"
+
+        def recognize_layout(self, images):
+            # one "word" covering the whole prepared page
+            return [("TEXT", layout.WordBoxes(["TEXT"], [[0, 0, *image.size]], size=image.size)) for image in images]
+
+    engine = BoxEngine()
+    monkeypatch.setitem(backends._backends, ("ocr", "boxes"), _Backend("ocr", "boxes", lambda: engine))
+    monkeypatch.setitem(backends._defaults, "ocr", "boxes")
+    doc = Document(b"png", "scan.png")
+    doc._images[0] = page
+    assert ocr.extract_text_from_image(doc) == "TEXT"
+    expected = geometry.to_source([[0, 0, *prepared.size]])[0] / [1200, 1500, 1200, 1500]
+    assert np.allclose(doc.word_boxes(0).boxes[0], np.clip(expected, 0, 1), atol=1e-4)
+    x0, y0, x1, y1 = doc.word_boxes(0).boxes[0]
+    assert x0 < 200 / 1200 and x1 > 900 / 1200  # covers the ink, not just the crop
+
+
+@pytest.mark.skipif(backends.optional("pdf", "pymupdf") is None, reason="PyMuPDF not installed")
+def test_overlay_and_reduced_png_from_text_layer(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    with make_document("invoice", "digital") as doc:
+        text = ocr.extract_text_from_image(doc)
+        fields = ocr.extract_key_fields(ocr.detect_document_type(text), text)
+        overlay = field_overlay(doc, fields)
+        assert {r["field"] for r in overlay["regions"]} == {"invoice_no", "total_amount", "date"}
+        assert overlay["pages"] == [{"page": 1, "width": 612.0, "height": 792.0}]
+        assert all(0 <= v <= 1 for r in overlay["regions"] for v in r["box"])
+
+        path = highlight_text_areas(doc, fields, overlay)
+        with Image.open(output_store.path_for(path)) as image:
+            assert max(image.size) <= 1000
+        assert not doc._images  # rendered small with PyMuPDF, not rasterized at OCR DPI
@@ -0,0 +1,75 @@
+"""
+Tests for per-stage latency instrumentation: services.metrics and /metrics.
+"""
+
+import io
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from services.cache import ResultCache
+from services.metrics import Histogram, StageMetrics, span
+from services.pool import WorkerPool
+
+client = TestClient(main.app)
+
+
+def _fake_pipeline(doc, ocr_engine=None, explain_image=False):
+    return {"document_type": "invoice", "fields_extracted": {}, "decision": "Approved",
+            "confidence_score": 0.9, "explainability_map": "N/A",
+            "timings": {"ocr": 0.2, "classify": 0.001, "total": 0.25}}
+
+
+def test_histogram_quantiles_stay_inside_buckets():
+    h = Histogram(buckets=(0.1, 0.5, 1.0))
+    for value in [0.05] * 90 + [0.7] * 10:
+        h.observe(value)
+    assert 0.0 < h.quantile(0.5) <= 0.1
+    assert 0.5 < h.quantile(0.99) <= 0.7  # never above the largest observation
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_span_accumulates_repeated_stages():
+    timings = {}
+    for _ in range(2):
+        with span(timings, "ocr.tesseract"):
+            pass
+    assert set(timings) == {"ocr.tesseract"} and timings["ocr.tesseract"] >= 0
+
+
+def test_prometheus_rendering():
+    metrics = StageMetrics()
+    metrics.observe({"ocr": 0.3}, "invoice")
+    text = metrics.render({"pool_in_flight": ("In flight.", [({}, 2)])})
+    assert '# TYPE idu_stage_duration_seconds histogram' in text
+    assert 'idu_stage_duration_seconds_bucket{stage="ocr",document_type="invoice",le="+Inf"} 1' in text
+    assert 'idu_stage_duration_quantile_seconds{stage="ocr",document_type="invoice",quantile="0.95"}' in text
+    assert "idu_pool_in_flight 2" in text
+    assert metrics.summary()["ocr"]["invoice"]["count"] == 1
+
+
+def test_timings_are_opt_in_and_exported(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "stage_metrics", StageMetrics())
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "analyze_file", _fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path)))
+
+    plain = client.post("/analyze_document/", files={"file": ("a.pdf", io.BytesIO(b"one"), "application/pdf")})
+    assert plain.status_code == 200 and "timings" not in plain.json()
+
+    timed = client.post("/analyze_document/?timings=true",
+                        files={"file": ("b.pdf", io.BytesIO(b"two"), "application/pdf")})
+    assert timed.json()["timings"]["ocr"] == 0.2
+
+    # Cache hits are answered without timings but still count as requests
+    client.post("/analyze_document/", files={"file": ("a.pdf", io.BytesIO(b"one"), "application/pdf")})
+    summary = main.stage_metrics.summary()
+    assert summary["ocr"]["invoice"]["count"] == 2
+    assert summary["request"]["invoice"]["count"] == 3
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'stage="classify",document_type="invoice"' in res.text
+    assert 'idu_result_cache_events{event="memory_hits"} 1' in res.text
+    main.pipeline_pool.shutdown()
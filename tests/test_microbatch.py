@@ -0,0 +1,69 @@
+"""
+Tests for services/microbatch.py (dynamic micro-batching).
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.microbatch import MicroBatcher
+
+
+def test_concurrent_submissions_share_bounded_batches():
+    batches = []
+
+    def fn(batch):
+        batches.append(list(batch))
+        return [value * 2 for value in batch]
+
+    batcher = MicroBatcher(fn, max_batch_size=8, max_wait_ms=50, length=lambda value: 1)
+    results = {}
+
+    def worker(start):
+        results[start] = batcher.map(range(start, start + 10))
+
+    threads = [threading.Thread(target=worker, args=(start,)) for start in range(0, 40, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert all(results[start] == [value * 2 for value in range(start, start + 10)] for start in results)
+    assert sum(len(batch) for batch in batches) == 40 and max(len(batch) for batch in batches) <= 8
+    assert batcher.stats()["mean_batch"] > 1  # requests were merged, not run one by one
+
+
+def test_batches_never_mix_length_buckets():
+    batches = []
+    batcher = MicroBatcher(lambda batch: batches.append(batch) or batch, max_batch_size=32, max_wait_ms=20,
+                           buckets=(4, 8))
+    values = ["ab", "abcdefg", "abc", "abcdef", "abcdefghijkl", "a"]
+    assert batcher.map(values) == values
+    batcher.close()
+    assert sorted(sorted(batch) for batch in batches) == [["a", "ab", "abc"], ["abcdef", "abcdefg"], ["abcdefghijkl"]]
+    assert batcher.stats()["padded"] == (3 - 2) + (3 - 1) + (7 - 6)
+
+
+def test_lone_item_is_flushed_at_the_deadline():
+    batcher = MicroBatcher(lambda batch: batch, max_batch_size=64, max_wait_ms=30)
+    started = time.perf_counter()
+    assert batcher.submit("x").result(timeout=2) == "x"
+    assert 0.02 <= time.perf_counter() - started < 1
+    batcher.close()
+
+
+def test_batch_failure_reaches_every_caller():
+    def fn(batch):
+        if "bad" in batch:
+            raise ValueError("boom")
+        return batch
+
+    batcher = MicroBatcher(fn, max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit("ok"), batcher.submit("bad")]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+    assert batcher.submit("fine").result(timeout=5) == "fine"  # the batching thread survived
+    batcher.close()
@@ -0,0 +1,108 @@
+"""
+Tests for the MinHash/LSH near-duplicate index (services/near_duplicates.py)
+and its use in services.pipeline.
+"""
+
+import re
+
+import pytest
+
+from benchmarks.synthetic import digital_pdf, document_pages
+from services import near_duplicates, pipeline
+from services.document import Document
+from services.document_store import DocumentStore
+from services.near_duplicates import MinHasher, NearDuplicateIndex, similarity
+
+
+def _text(kind, seed):
+    return "\n".join(line for page in document_pages(kind, pages=1, seed=seed) for line in page)
+
+
+def _reexported(page_lines):
+    """Same pages with every date replaced (a re-export with a new timestamp)."""
+    return [[re.sub(r"\d{2}/\d{2}/\d{4}", "01/01/2031", line) for line in lines] for lines in page_lines]
+
+
+def test_signatures_estimate_text_similarity():
+    hasher = MinHasher()
+    original = _text("invoice", 1)
+    reexported = re.sub(r"\d{2}/\d{2}/\d{4}", "01/01/2031", original)
+    assert similarity(hasher.signature(original), hasher.signature(original.upper())) == 1.0
+    assert similarity(hasher.signature(original), hasher.signature(reexported)) >= 0.9
+    assert max(similarity(hasher.signature(original), hasher.signature(_text("invoice", seed)))
+               for seed in range(2, 12)) < near_duplicates.NEAR_DUPLICATE_THRESHOLD
+    assert hasher.signature("") is None and hasher.signature("— !") is None
+    assert len(hasher.band_keys(hasher.signature(original))) == 32
+
+
+def test_index_persists_and_updates_incrementally(tmp_path):
+    path = str(tmp_path / "near.sqlite3")
+    index = NearDuplicateIndex(path, enabled=True)
+    texts = {f"sha-{seed}": _text(kind, seed) for seed, kind in enumerate(["invoice", "resume", "report"] * 4)}
+    for sha, text in texts.items():
+        assert index.add(sha, "tesseract", f"{sha}.pdf", index.signature(text))
+    assert not index.add("sha-0", "tesseract", "again.pdf", index.signature(texts["sha-0"]))  # once per document
+    index.close()
+
+    reopened = NearDuplicateIndex(path, enabled=True)
+    assert reopened.stats()["documents"] == len(texts)
+    probe = reopened.signature(re.sub(r"\d{2}/\d{2}/\d{4}", "01/01/2031", texts["sha-4"]))
+    match = reopened.query(probe)
+    assert match["sha256"] == "sha-4" and match["filename"] == "sha-4.pdf" and match["similarity"] >= 0.9
+    assert reopened.query(probe, exclude="sha-4") is None
+    assert reopened.query(reopened.signature(_text("invoice", 99))) is None
+
+
+def test_index_prunes_oldest_and_expired_signatures(tmp_path, monkeypatch):
+    index = NearDuplicateIndex(str(tmp_path / "near.sqlite3"), enabled=True, max_documents=3, max_age_days=0)
+    texts = [_text("report", seed) for seed in range(5)]
+    for seed, text in enumerate(texts):
+        index.add(f"sha-{seed}", "tesseract", None, index.signature(text), near_duplicates.text_digest(text))
+    assert index.prune() == 2 and index.stats()["documents"] == 3
+    assert index.query(index.signature(texts[0])) is None  # oldest gone, buckets too
+    assert index.query(index.signature(texts[4]))["sha256"] == "sha-4"
+    with index._db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == 3 * near_duplicates.BANDS
+
+    index.max_age_days = 1
+    monkeypatch.setattr(near_duplicates.time, "time", lambda: 10 ** 12)  # far in the future
+    assert index.prune() == 3 and index.stats()["documents"] == 0
+
+
+@pytest.mark.parametrize("action, rescan, reused", [
+    ("flag", "reexport", []),                     # default: report only
+    ("reuse", "reexport", ["classify"]),          # near match: fields re-extracted, the new date differs
+    ("reuse", "exact", ["classify", "decide"]),   # same text, different bytes
+])
+def test_pipeline_flags_or_reuses_near_duplicates(action, rescan, reused, monkeypatch, tmp_path):
+    monkeypatch.setattr(near_duplicates, "near_duplicate_index", NearDuplicateIndex(str(tmp_path / "near.sqlite3")))
+    monkeypatch.setattr(near_duplicates, "NEAR_DUPLICATE_ACTION", action)
+    monkeypatch.setattr(pipeline, "document_store", DocumentStore(str(tmp_path / "documents.sqlite3")))
+    pages = document_pages("invoice", pages=1, seed=3)
+
+    first = pipeline.analyze_file(Document(digital_pdf(pages), "invoice.pdf"))
+    assert first["near_duplicate"] is None
+
+    calls = []
+    real_decision = pipeline.make_decision
+    monkeypatch.setattr(pipeline, "make_decision", lambda *args: calls.append(args) or real_decision(*args))
+    data = digital_pdf(_reexported(pages)) if rescan == "reexport" else digital_pdf(pages) + b"\n% rescan\n"
+    second = pipeline.analyze_file(Document(data, "invoice-rescan.pdf"))
+    match = second["near_duplicate"]
+    assert match["filename"] == "invoice.pdf" and match["similarity"] >= 0.9
+    assert match["exact"] == (rescan == "exact") and match["reused"] == reused
+    assert len(calls) == (0 if "decide" in reused else 1)
+    assert second["fields_extracted"]["invoice_no"] == first["fields_extracted"]["invoice_no"]
+    assert (second["fields_extracted"] == first["fields_extracted"]) == (rescan == "exact")
+    assert second["decision"] == first["decision"] and "dedup.lookup" in second["timings"]
+
+
+def test_reuse_needs_exact_text_or_reuse_threshold(monkeypatch, tmp_path):
+    monkeypatch.setattr(near_duplicates, "near_duplicate_index", NearDuplicateIndex(str(tmp_path / "near.sqlite3")))
+    monkeypatch.setattr(near_duplicates, "NEAR_DUPLICATE_ACTION", "reuse")
+    monkeypatch.setattr(near_duplicates, "NEAR_DUPLICATE_REUSE_THRESHOLD", 1.01)
+    monkeypatch.setattr(pipeline, "document_store", DocumentStore(str(tmp_path / "documents.sqlite3")))
+    pages = document_pages("invoice", pages=1, seed=3)
+    pipeline.analyze_file(Document(digital_pdf(pages), "invoice.pdf"))
+    second = pipeline.analyze_file(Document(digital_pdf(_reexported(pages)), "invoice-reexport.pdf"))
+    assert second["near_duplicate"]["reused"] == []
@@ -0,0 +1,132 @@
+"""
+Tests for services/ocr.py (Tesseract and poppler are replaced by fakes).
+"""
+
+import os
+import random
+import time
+import types
+
+import pytest
+from PIL import Image
+
+import services.document as document
+import services.ocr as ocr
+from services.backends import backends, _Backend
+from services.ocr_engines import OcrEngine, TESSERACT_OMP_THREADS, _limit_tesseract_threads
+from services.document import Document
+from services.explainability import highlight_text_areas
+
+
+class FakeEngine(OcrEngine):
+    """Reads the page number back from the first pixel; records call sizes."""
+
+    preprocess = False
+
+    def __init__(self, name="fake", batch_pages=False, text=None):
+        self.name, self.batch_pages, self.text = name, batch_pages, text
+        self.calls = []
+        self.modes = []
+
+    def recognize(self, images):
+        self.calls.append(len(images))
+        self.modes.extend(image.mode for image in images)
+        time.sleep(random.random() / 100)  # finish out of order
+        return [self.text or f"PAGE{image.getpixel((0, 0))[0]}" for image in images]
+
+
+def _install(monkeypatch, engine, default=True):
+    monkeypatch.setitem(backends._backends, ("ocr", engine.name), _Backend("ocr", engine.name, lambda: engine))
+    if default:
+        monkeypatch.setitem(backends._defaults, "ocr", engine.name)
+    return engine
+
+
+def _fake_scan(monkeypatch, page_count):
+    calls = []
+
+    def fake_convert(path, dpi, first_page, last_page, **kwargs):
+        calls.append((first_page, last_page))
+        return [Image.new("RGB", (600, 400), (n, n, n)) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(document, "convert_from_path", fake_convert)
+    _install(monkeypatch, FakeEngine())
+    doc = Document(b"%PDF-1.4", "scan.pdf")
+    doc._page_count = page_count
+    return doc, calls
+
+
+def test_scanned_pdf_is_ocrd_in_page_ranges_and_order(monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_PAGE_BATCH", 3)
+    doc, calls = _fake_scan(monkeypatch, 7)
+    with doc:
+        text = ocr.extract_text_from_image(doc)
+        assert {s["strategy"] for s in doc.page_stats.values()} == {"ocr"}
+    assert calls == [(1, 3), (4, 6), (7, 7)]
+    assert text.split("\n") == [f"PAGE{n}" for n in range(1, 8)]
+
+
+def test_pages_are_rasterized_and_ocrd_once_per_request(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ocr, "OCR_PAGE_BATCH", 2)
+    doc, calls = _fake_scan(monkeypatch, 5)
+    with doc:
+        first = ocr.extract_text_from_image(doc)
+        assert ocr.extract_text_from_image(doc) == first
+        assert highlight_text_areas(doc, {"name": "x"}).startswith("/outputs/")
+    assert calls == [(1, 2), (3, 4), (5, 5)]
+
+
+def test_mixed_pdf_only_ocrs_pages_without_text_layer(monkeypatch):
+    fitz = backends.optional("pdf", "pymupdf")
+    if fitz is None:
+        pytest.skip("PyMuPDF not installed")
+    pdf = fitz.open()
+    for n in range(4):
+        page = pdf.new_page()
+        if n != 2:  # page 3 is a "scan" without a text layer
+            page.insert_text((72, 72), f"Digital page {n + 1} with a native text layer")
+    data = pdf.tobytes()
+
+    calls = []
+    monkeypatch.setattr(document, "convert_from_path", lambda path, dpi, first_page, last_page, **kwargs:
+                        calls.append((first_page, last_page)) or [Image.new("RGB", (10, 10))])
+    _install(monkeypatch, FakeEngine(text="Scanned page 3"))
+
+    with Document(data, "mixed.pdf") as doc:
+        text = ocr.extract_text_from_image(doc)
+        strategies = [doc.page_stats[i]["strategy"] for i in range(4)]
+    assert calls == [(3, 3)]
+    assert strategies == ["text_layer", "text_layer", "ocr", "text_layer"]
+    assert text.splitlines()[2] == "Scanned page 3"
+
+
+def test_engine_is_chosen_per_call_and_batching_engines_get_whole_runs(monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_PAGE_BATCH", 3)
+    doc, calls = _fake_scan(monkeypatch, 7)
+    batching = _install(monkeypatch, FakeEngine("batching", batch_pages=True), default=False)
+    with doc:
+        text = ocr.extract_text_from_image(doc, engine="batching")
+        assert {s["engine"] for s in doc.page_stats.values()} == {"batching"}
+        assert "ocr.batching" in doc.timings
+    assert batching.calls == [3, 3, 1]  # one recognize() call per run of pages
+    assert text.split("\n") == [f"PAGE{n}" for n in range(1, 8)]
+
+
+def test_pages_are_preprocessed_for_engines_that_want_it(monkeypatch):
+    doc, _ = _fake_scan(monkeypatch, 2)
+    engine = _install(monkeypatch, FakeEngine(text="ok"))
+    engine.preprocess = True
+    with doc:
+        ocr.extract_text_from_image(doc)
+        assert "ocr.preprocess" in doc.timings
+    assert engine.modes == ["L", "L"]  # color pages reach the engine as grayscale
+
+
+def test_tesseract_thread_limit_stays_in_the_subprocess(monkeypatch):
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    module = types.SimpleNamespace(subprocess_args=lambda include_stdout=True: {"env": {"PATH": "/bin"}})
+    _limit_tesseract_threads(module)
+    _limit_tesseract_threads(module)  # once per module, however many engines are created
+    assert module.subprocess_args() == {"env": {"PATH": "/bin", "OMP_THREAD_LIMIT": TESSERACT_OMP_THREADS}}
+    assert "OMP_THREAD_LIMIT" not in os.environ
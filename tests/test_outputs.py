@@ -0,0 +1,92 @@
+"""
+Tests for services/outputs.py (content-addressed, size/age bounded outputs).
+"""
+
+import io
+import os
+import time
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import api.main as main
+from services.cache import ResultCache
+from services.outputs import OutputStore
+from services.pool import WorkerPool
+
+client = TestClient(main.app)
+
+
+def _age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_names_are_content_hashes(tmp_path):
+    store = OutputStore(directory=str(tmp_path))
+    first = store.save_bytes(b"same", "webp")
+    assert store.save_bytes(b"same", "webp") == first  # stored once, reused
+    assert store.save_bytes(b"other", "webp") != first
+    assert len(os.listdir(tmp_path)) == 2
+    assert store.counters["reused"] == 1
+
+    jpeg = store.save_image(Image.new("RGBA", (40, 20), "red"), fmt="jpeg")
+    assert jpeg.endswith(".jpg")
+    with Image.open(store.path_for(jpeg)) as image:
+        assert image.format == "JPEG"
+
+
+def test_eviction_by_age_then_least_recently_used(tmp_path):
+    store = OutputStore(directory=str(tmp_path), max_bytes=250, max_age_seconds=3600)
+    old, lru, recent, newest = (store.save_bytes(bytes([i]) * 100, "png") for i in range(4))
+    _age(store.path_for(old), 7200)      # past max age
+    _age(store.path_for(lru), 600)
+    _age(store.path_for(recent), 300)
+    open(os.path.join(tmp_path, "x.png.1.2.tmp"), "wb").close()
+    _age(os.path.join(tmp_path, "x.png.1.2.tmp"), 7200)
+
+    assert store.evict() == 200
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(store.path_for(u)) for u in (recent, newest))
+    assert store.touch(recent) and not store.touch(lru)
+    assert store.touch("N/A") and store.path_for("/outputs/../secret") is None
+
+
+def test_sweeper_runs_in_background(tmp_path):
+    store = OutputStore(directory=str(tmp_path), max_bytes=150)
+    store.start_sweeper(interval=30)
+    try:
+        for i in range(3):
+            store.save_bytes(bytes([i]) * 100, "png")
+        deadline = time.time() + 5
+        while store.stats()["disk_bytes"] > 150 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        store.stop_sweeper()
+    assert len(os.listdir(tmp_path)) == 1  # woken by the over-budget write, not the 30 s tick
+
+
+def test_cached_result_with_evicted_image_is_recomputed(monkeypatch, tmp_path):
+    store = OutputStore(directory=str(tmp_path / "outputs"))
+    calls = []
+
+    def fake_pipeline(doc, ocr_engine=None, explain_image=False):
+        calls.append(explain_image)
+        return {"document_type": "report", "fields_extracted": {}, "decision": "Analyzed",
+                "confidence_score": 0.88, "explainability_map": store.save_bytes(b"img", "webp")}
+
+    monkeypatch.setattr(main, "output_store", store)
+    monkeypatch.setattr(main, "pipeline_pool", WorkerPool(max_workers=1, max_pending=0, kind="thread"))
+    monkeypatch.setattr(main, "analyze_file", fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+
+    def post():
+        return client.post("/analyze_document/?explain_image=true",
+                           files={"file": ("r.pdf", io.BytesIO(b"same"), "application/pdf")}).json()
+
+    image = post()["explainability_map"]
+    post()
+    assert calls == [True]               # second request: cache hit, image still there
+    os.remove(store.path_for(image))
+    assert post()["explainability_map"] == image
+    assert calls == [True, True]         # image evicted → recomputed
+    main.pipeline_pool.shutdown()
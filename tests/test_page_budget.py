@@ -0,0 +1,80 @@
+"""
+Tests for the page budget of services.pipeline (PAGE_BUDGET_* settings):
+first pages only, more pages while the type is unknown or fields are
+missing, capped.
+"""
+
+import pytest
+
+from benchmarks.synthetic import digital_pdf, document_pages, make_document
+from services import near_duplicates, pipeline
+from services.document import Document
+from services.document_store import DocumentStore
+from services.near_duplicates import NearDuplicateIndex
+
+
+@pytest.fixture
+def budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, "document_store", DocumentStore(str(tmp_path / "documents.sqlite3")))
+    monkeypatch.setattr(near_duplicates, "near_duplicate_index", NearDuplicateIndex(enabled=False))
+
+    def configure(first_pages, max_pages=6, step=2):
+        monkeypatch.setattr(pipeline, "PAGE_BUDGET_FIRST_PAGES", first_pages)
+        monkeypatch.setattr(pipeline, "PAGE_BUDGET_MAX_PAGES", max_pages)
+        monkeypatch.setattr(pipeline, "PAGE_BUDGET_STEP", step)
+        pipeline.stage_versions.cache_clear()
+
+    yield configure
+    pipeline.stage_versions.cache_clear()
+
+
+def test_budget_stops_once_fields_are_found(budget):
+    budget(2)
+    events = []
+    result = pipeline.analyze_file(make_document("report", "digital", pages=30), on_event=events.append)
+    assert result["page_budget"] == {"first_pages": 2, "max_pages": 6, "page_count": 30,
+                                     "pages_processed": [1, 2], "missing_fields": []}
+    assert [page["page"] for page in result["pages"]] == [1, 2]
+    assert [event["page"] for event in events if event["event"] == "page"] == [1, 2]
+    assert {region["page"] for region in result["overlay"]["regions"]} <= {1, 2}
+    assert "+pages2" in pipeline.stage_versions()["ocr"]
+
+
+def test_missing_fields_pull_more_pages_up_to_the_cap(budget):
+    budget(2, max_pages=5, step=2)
+    doc = make_document("invoice", "digital", pages=12)  # the total sits on the last page
+    result = pipeline.analyze_file(doc)
+    assert result["page_budget"]["pages_processed"] == [1, 2, 3, 4, 5]
+    assert result["page_budget"]["missing_fields"] == ["total_amount"]
+    assert "ocr.more_pages" in result["timings"]
+
+    budget(0)  # no budget: every page is read and the total is found
+    full = pipeline.analyze_file(make_document("invoice", "digital", pages=12))
+    assert full["page_budget"] is None and len(full["pages"]) == 12
+    assert full["fields_extracted"]["total_amount"] and "+pages" not in pipeline.stage_versions()["ocr"]
+
+
+def test_short_documents_are_read_whole(budget):
+    budget(4)
+    result = pipeline.analyze_file(make_document("invoice", "digital", pages=3))
+    assert result["page_budget"] is None and len(result["pages"]) == 3
+
+
+def test_unknown_type_pulls_more_pages_to_classify(budget):
+    budget(2, max_pages=8, step=2)
+    cover = [["Lorem ipsum dolor sit amet"], ["Consectetur adipiscing elit"], ["Sed do eiusmod tempor"]]
+    doc = Document(digital_pdf(cover + document_pages("invoice", pages=1, seed=1) + cover * 2), "scan.pdf")
+    result = pipeline.analyze_file(doc)
+    assert result["document_type"] == "invoice"
+    assert result["page_budget"]["pages_processed"] == [1, 2, 3, 4]
+    assert result["fields_extracted"]["invoice_no"] and result["page_budget"]["missing_fields"] == []
+
+
+def test_empty_skills_end_the_budget_after_one_step(budget):
+    budget(2, max_pages=8, step=2)
+    pages = [[line for line in lines if not line.startswith("Skills")]
+             for lines in document_pages("resume", pages=10, seed=2)]
+    result = pipeline.analyze_file(Document(digital_pdf(pages), "resume.pdf"))
+    assert result["document_type"] == "resume" and result["fields_extracted"]["skills"] == []
+    assert result["page_budget"]["pages_processed"] == [1, 2, 3, 4]  # one extra step, not up to the cap
+    assert result["page_budget"]["missing_fields"] == []
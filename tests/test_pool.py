@@ -0,0 +1,99 @@
+"""
+Tests for the bounded worker pool and the 503 overload path of /analyze_document/.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from services.cache import ResultCache
+from services.pool import WorkerPool, PoolSaturated
+
+client = TestClient(main.app)
+
+
+def _wait(event):
+    event.wait(5)
+    return "done"
+
+
+def test_pool_rejects_when_full():
+    pool = WorkerPool(max_workers=1, max_pending=1, kind="thread")
+    gate = threading.Event()
+    futures = [pool.submit(_wait, gate) for _ in range(2)]
+    assert pool.saturated
+    with pytest.raises(PoolSaturated):
+        pool.submit(_wait, gate)
+    gate.set()
+    assert [f.result() for f in futures] == ["done", "done"]
+    assert pool.in_flight == 0
+    pool.shutdown()
+
+
+def test_process_pool_runs_work():
+    pool = WorkerPool(max_workers=2, max_pending=0, kind="process")
+    assert pool.submit(sum, [1, 2, 3]).result(timeout=60) == 6
+    pool.shutdown()
+
+
+def test_broken_process_pool_is_replaced():
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="process")
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result(timeout=60)  # the worker dies
+    assert pool.submit(sum, [1, 2, 3]).result(timeout=60) == 6
+    pool.shutdown()
+
+
+def test_analyze_document_returns_503_when_saturated(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    gate = threading.Event()
+    pool.submit(_wait, gate)
+    monkeypatch.setattr(main, "pipeline_pool", pool)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+
+    res = client.post("/analyze_document/", files={"file": ("a.png", io.BytesIO(b"x"), "image/png")})
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == str(main.RETRY_AFTER_SECONDS)
+    gate.set()
+    pool.shutdown()
+
+
+def test_analyze_document_returns_503_when_worker_dies(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(main, "pipeline_pool", pool)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+
+    def dies(*args, **kwargs):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    monkeypatch.setattr(main, "analyze_file", dies)
+    res = client.post("/analyze_document/", files={"file": ("a.png", io.BytesIO(b"x"), "image/png")})
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == str(main.RETRY_AFTER_SECONDS)
+    pool.shutdown()
+
+
+def test_analyze_document_runs_in_pool(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(main, "pipeline_pool", pool)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+    monkeypatch.setattr(main, "analyze_file", lambda path, ocr_engine=None, explain_image=False: {
+        "document_type": "report",
+        "fields_extracted": {},
+        "decision": "Analyzed",
+        "confidence_score": 0.88,
+        "explainability_map": "N/A",
+    })
+
+    res = client.post("/analyze_document/", files={"file": ("a.png", io.BytesIO(b"x"), "image/png")})
+    assert res.status_code == 200
+    assert res.json()["decision"] == "Analyzed"
+    pool.shutdown()
@@ -0,0 +1,54 @@
+"""
+Tests for services/preprocess.py (NumPy page clean-up before OCR).
+"""
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from services import preprocess
+
+
+def _page(text_px=20, size=(1200, 1500), lines=12, color="RGB"):
+    page = Image.new(color, size, "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=text_px)
+    for row in range(lines):
+        draw.text((200, 300 + row * int(text_px * 1.6)), "Invoice total amount due 1,234.00 " * 2,
+                  fill="black", font=font)
+    return page
+
+
+def test_otsu_separates_ink_from_paper():
+    gray = np.array([[30] * 10 + [220] * 90], dtype=np.uint8)
+    hist = np.bincount(gray.ravel(), minlength=256)
+    assert 30 <= preprocess.otsu_threshold(hist) < 220
+    assert preprocess.otsu_threshold(np.bincount([255] * 5, minlength=256)) == -1  # blank page
+
+
+def test_skew_is_estimated_and_removed():
+    page = _page().convert("L").rotate(3, resample=Image.BILINEAR, fillcolor=255)
+    assert abs(preprocess.estimate_skew(preprocess.ink_mask(page)) - 3) < 0.3
+    out = preprocess.preprocess_page(page)
+    assert abs(preprocess.estimate_skew(preprocess.ink_mask(out))) < 0.3
+
+
+def test_margins_are_cropped_and_output_is_grayscale():
+    out = preprocess.preprocess_page(_page(text_px=int(preprocess.PREPROCESS_LINE_PX * 0.8)))
+    assert out.mode == "L"
+    assert out.width < 1200 and out.height < 1500 / 2
+
+
+def test_resolution_follows_text_size():
+    big = preprocess.preprocess_page(_page(text_px=80, size=(4000, 3000), lines=6))
+    mask = preprocess.ink_mask(big)
+    height = preprocess.line_height(mask.sum(axis=1), big.width)
+    assert abs(height - preprocess.PREPROCESS_LINE_PX) <= preprocess.PREPROCESS_LINE_PX * 0.35
+
+
+def test_binary_and_off_modes():
+    page = _page()
+    binary = preprocess.preprocess_page(page, mode="binary")
+    assert set(np.unique(np.asarray(binary))) <= {0, 255}
+    assert preprocess.preprocess_page(page, mode="off") is page
+    blank = Image.new("RGB", (300, 300), "white")
+    assert preprocess.preprocess_page(blank).size == (300, 300)
@@ -0,0 +1,121 @@
+"""
+Tests for the document store (services/document_store.py) and incremental
+reprocessing (services/reprocess.py).
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_document
+from services import layout, pipeline, reprocess
+from services.backends import backends, _Backend
+from services.cache import ResultCache, content_key
+from services.decision_rules import compile_rules, load_rules
+from services.document import Document
+from services.document_store import DocumentStore
+
+needs_pymupdf = pytest.mark.skipif(backends.optional("pdf", "pymupdf") is None, reason="PyMuPDF not installed")
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.sqlite3"), enabled=True)
+    monkeypatch.setattr(pipeline, "document_store", store)
+    monkeypatch.chdir(tmp_path)
+    pipeline.stage_versions.cache_clear()
+    yield store
+    pipeline.stage_versions.cache_clear()
+
+
+def _without_timings(result: dict) -> dict:
+    return {key: value for key, value in result.items() if key != "timings"}
+
+
+def test_layout_blob_round_trip():
+    words = layout.WordBoxes(["Total", "₹1,200.00"], [[0.1, 0.2, 0.3, 0.25], [0.31, 0.2, 0.5, 0.25]],
+                             [0, 0], (612.0, 792.0))
+    blank = layout.WordBoxes([], np.zeros((0, 4)), [], (10, 10))
+    pages = layout.unpack_pages(layout.pack_pages({0: blank, 2: words}))
+    assert sorted(pages) == [0, 2] and len(pages[0].words) == 0
+    assert pages[2].words == words.words and pages[2].size == (612.0, 792.0)
+    assert np.allclose(pages[2].boxes, words.boxes, atol=1 / 65535)
+    assert pages[2].find("1,200.00") == pages[2].find("₹1,200.00")
+
+
+@needs_pymupdf
+def test_second_run_reuses_stored_ocr(monkeypatch, store):
+    with make_document("invoice", "digital") as doc:
+        first = pipeline.analyze_file(Document(doc.data, doc.filename))
+    assert store.stats()["documents"] == 1
+
+    def no_ocr(*args, **kwargs):
+        raise AssertionError("OCR ran for a stored document")
+
+    monkeypatch.setattr(pipeline, "extract_text_from_image", no_ocr)
+    second = pipeline.analyze_file(Document(doc.data, doc.filename))
+    assert _without_timings(second) == _without_timings(first)
+    assert "store.load" in second["timings"] and "ocr.text_layer" not in second["timings"]
+
+
+@needs_pymupdf
+def test_hit_only_touches_the_stored_row(monkeypatch, store):
+    with make_document("invoice", "digital") as doc:
+        pipeline.analyze_file(Document(doc.data, doc.filename))
+    with store._db() as conn:
+        conn.execute("UPDATE documents SET accessed_at = 0")
+
+    def no_rewrite(*args, **kwargs):
+        raise AssertionError("stored blobs rewritten on a hit")
+
+    monkeypatch.setattr(store, "save", no_rewrite)
+    monkeypatch.setattr(store, "update_outputs", no_rewrite)
+    pipeline.analyze_file(Document(doc.data, doc.filename))
+    assert store.load(doc.sha256, pipeline.ocr_engine_name())["accessed_at"] > 0
+
+
+def test_store_prunes_least_recently_used_and_expired_rows(monkeypatch, tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.sqlite3"), enabled=True, max_rows=2, max_age_days=0)
+    for name in ("a", "b", "c"):
+        store.save(name, "tesseract", f"{name}.pdf", 1, name, None, {}, {"ocr": "1"}, {})
+    store.touch("a", "tesseract")  # used again: "b" is now the least recently used
+    assert store.prune() == 1
+    assert store.load("b", "tesseract") is None and store.load("a", "tesseract") is not None
+
+    store.max_age_days = 1
+    monkeypatch.setattr(time, "time", lambda: 10 ** 12)  # far in the future
+    assert store.prune() == 2 and store.stats()["documents"] == 0
+
+
+@needs_pymupdf
+def test_rule_change_reruns_only_decide(monkeypatch, store, tmp_path):
+    with make_document("invoice", "digital") as doc:
+        before = pipeline.analyze_file(Document(doc.data, doc.filename))
+    assert reprocess.reprocess(store) == {"documents": 1, "current": 1}
+
+    rules = load_rules()
+    rules["types"]["invoice"] = {"otherwise": {"decision": "Escalate", "confidence": 0.5}}
+    table = compile_rules(rules)
+    monkeypatch.setitem(backends._backends, ("decision", "rules"), _Backend("decision", "rules", lambda: table))
+    pipeline.stage_versions.cache_clear()
+    monkeypatch.setattr(reprocess, "extract_key_fields", lambda *a: pytest.fail("extract re-ran"))
+
+    cache = ResultCache(directory=str(tmp_path / "cache"))
+    assert reprocess.reprocess(store, dry_run=True) == {"documents": 1, "decide": 1}
+    assert reprocess.reprocess(store, cache=cache) == {"documents": 1, "decide": 1}
+    row = store.load(doc.sha256, pipeline.ocr_engine_name())
+    assert (row["decision"], row["confidence"]) == ("Escalate", 0.5)
+    assert row["fields"] == before["fields_extracted"] and row["overlay"] == before["overlay"]
+    assert row["versions"] == pipeline.stage_versions()
+
+    cached = cache.get(content_key(doc.sha256, pipeline.result_version()))
+    assert cached["decision"] == "Escalate" and cached["pages"] == before["pages"]
+    assert reprocess.reprocess(store) == {"documents": 1, "current": 1}
+
+
+def test_stale_stages_follow_dependencies():
+    current = {"ocr": "2", "classify": "1", "extract": "2", "decide": "1", "explain": "1"}
+    assert reprocess.stale_stages({**current, "extract": "1"}, current) == ("extract", "decide", "explain")
+    assert reprocess.stale_stages({**current, "explain": "0"}, current) == ("explain",)
+    assert reprocess.stale_stages(current, current) == ()
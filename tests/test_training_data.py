@@ -0,0 +1,84 @@
+"""
+Tests for the sharded training dataset (training/shards.py) and its
+PyTorch DataLoader (training/data.py, skipped without torch).
+"""
+
+import numpy as np
+import pytest
+
+from training.shards import ShardWriter, iter_batches, load_manifest, num_batches
+
+
+def _write(directory, rows=50, dim=3, shard_rows=16):
+    features = np.arange(rows * dim, dtype=np.float32).reshape(rows, dim)
+    labels = np.arange(rows) % 3
+    with ShardWriter(str(directory), dim, shard_rows=shard_rows, classes=["invoice", "resume", "report"]) as writer:
+        for start in range(0, rows, 7):  # blocks that straddle shard boundaries
+            writer.add(features[start:start + 7], labels[start:start + 7])
+    return features, labels
+
+
+def test_writer_splits_rows_into_shards(tmp_path):
+    _write(tmp_path)
+    manifest = load_manifest(str(tmp_path))
+    assert [s["rows"] for s in manifest["shards"]] == [16, 16, 16, 2]
+    assert manifest["rows"] == 50 and manifest["num_classes"] == 3 and manifest["feature_dim"] == 3
+    last = np.load(tmp_path / "shard-00003.features.npy", mmap_mode="r")
+    assert last.shape == (2, 3) and last[0, 0] == 48 * 3
+
+
+def test_epoch_reads_every_row_once_in_a_new_order(tmp_path):
+    features, labels = _write(tmp_path)
+
+    def epoch(n, **kwargs):
+        batches = list(iter_batches(str(tmp_path), 5, seed=1, epoch=n, **kwargs))
+        rows = np.concatenate([b[0] for b in batches])
+        assert np.array_equal(labels[(rows[:, 0] // 3).astype(int)], np.concatenate([b[1] for b in batches]))
+        return rows[:, 0] // 3
+
+    first, second = epoch(0), epoch(1)
+    assert sorted(first) == list(range(50)) and not np.array_equal(first, second)
+    assert np.array_equal(first, epoch(0))  # reproducible from (seed, epoch)
+    assert len(list(iter_batches(str(tmp_path), 5))) == num_batches(load_manifest(str(tmp_path)), 5) == 13
+
+    split = np.concatenate([epoch(0, worker=w, workers=3) for w in range(3)])
+    assert sorted(split) == list(range(50))  # workers share the shards without overlap
+
+    ordered = np.concatenate([b[0] for b in iter_batches(str(tmp_path), 5, shuffle=False)])
+    assert np.array_equal(ordered, features)
+
+
+def test_csr_shards_keep_sparse_rows(tmp_path):
+    from services.classifier import HashingVectorizer
+
+    texts = [f"invoice {i} " * (i % 4) + "total" for i in range(20)]
+    indptr, indices, values = HashingVectorizer(n_features=2 ** 10).transform(texts)
+    with ShardWriter(str(tmp_path), 2 ** 10, shard_rows=8, layout="csr") as writer:
+        writer.add_sparse(indptr[:6], indices[:indptr[5]], values[:indptr[5]], np.zeros(5))
+        writer.add_sparse(indptr[5:] - indptr[5], indices[indptr[5]:], values[indptr[5]:], np.arange(5, 20) % 2)
+    assert load_manifest(str(tmp_path))["layout"] == "csr"
+
+    def dense(batch):
+        (rows_indptr, rows_indices, rows_values), _ = batch
+        matrix = np.zeros((len(rows_indptr) - 1, 2 ** 10), np.float32)
+        matrix[np.repeat(np.arange(len(matrix)), np.diff(rows_indptr)), rows_indices] = rows_values
+        return matrix
+
+    expected = dense(((indptr, indices, values), None))
+    assert np.array_equal(np.concatenate([dense(b) for b in iter_batches(str(tmp_path), 3, shuffle=False)]), expected)
+    shuffled = np.concatenate([dense(b) for b in iter_batches(str(tmp_path), 3, seed=4)])
+    assert sorted(map(bytes, shuffled)) == sorted(map(bytes, expected))
+
+
+def test_dataloader_yields_tensor_batches(tmp_path):
+    torch = pytest.importorskip("torch")
+    from training.data import make_loader
+
+    _write(tmp_path)
+    loader = make_loader(str(tmp_path), batch_size=8, num_workers=2, pin_memory=False)
+    for epoch in range(2):
+        loader.dataset.set_epoch(epoch)
+        batches = list(loader)
+        assert len(batches) == len(loader) == 7
+        assert batches[0][0].dtype == torch.float32 and batches[0][1].dtype == torch.int64
+        assert sum(len(labels) for _, labels in batches) == 50
@@ -0,0 +1,66 @@
+"""
+Tests for upload ingestion: size cap and no temp files in the working directory.
+"""
+
+import io
+import os
+import re
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import api.main as main
+import api.uploads as uploads
+from services.cache import ResultCache
+from services.document import Document
+from services.explainability import highlight_text_areas
+from services.pool import WorkerPool
+
+client = TestClient(main.app)
+
+
+def test_upload_over_cap_is_rejected(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 10)
+    res = client.post("/analyze_document/", files={"file": ("big.pdf", io.BytesIO(b"x" * 11), "application/pdf")})
+    assert res.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_pipeline_receives_document_and_leaves_no_files(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    seen = []
+
+    def fake_pipeline(document, ocr_engine=None, explain_image=False):
+        seen.append((document.filename, document.data))
+        return {"document_type": "unknown", "fields_extracted": {}, "decision": "Needs Review",
+                "confidence_score": 0.75, "explainability_map": "N/A"}
+
+    pool = WorkerPool(max_workers=1, max_pending=0, kind="thread")
+    monkeypatch.setattr(main, "pipeline_pool", pool)
+    monkeypatch.setattr(main, "analyze_file", fake_pipeline)
+    monkeypatch.setattr(main, "result_cache", ResultCache(directory=str(tmp_path / "cache")))
+
+    res = client.post("/analyze_document/", files={"file": ("scan.png", io.BytesIO(b"abc"), "image/png")})
+    assert res.status_code == 200
+    assert seen == [("scan.png", b"abc")]
+    assert sorted(os.listdir(tmp_path)) == ["cache"]
+    pool.shutdown()
+
+
+def test_document_workdir_is_removed_on_close():
+    with Document(b"%PDF-1.4", "../../etc/x.pdf") as doc:
+        path = doc.path()
+        assert os.path.dirname(path) == doc.workdir
+        assert doc.filename == "x.pdf"
+    assert not os.path.exists(path)
+
+
+def test_highlight_reads_image_from_memory(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    buf = io.BytesIO()
+    Image.new("RGB", (600, 400), "white").save(buf, "PNG")
+    with Document(buf.getvalue(), "photo.png") as doc:
+        web_path = highlight_text_areas(doc, {"name": "Jane"})
+    assert re.fullmatch(r"/outputs/[0-9a-f]{32}\.webp", web_path)  # content-addressed
+    assert os.listdir(tmp_path / ".cache") == ["outputs"]
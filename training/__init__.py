@@ -0,0 +1,5 @@
+"""
+training
+Model training: sharded datasets (shards), the PyTorch input pipeline (data)
+and the training script (python -m training.train).
+"""
@@ -0,0 +1,72 @@
+"""
+training/data.py
+PyTorch input pipeline over the sharded datasets of training.shards.
+- ShardDataset is an IterableDataset of whole batches: each DataLoader worker
+  reads its own subset of the (memory-mapped) shards and slices batches out
+  of NumPy arrays, instead of stacking per-sample tensors.
+- "csr" datasets yield (indices, offsets, values) triples: the input, offsets
+  and per_sample_weights of nn.EmbeddingBag, i.e. a sparse linear layer.
+- make_loader(): DataLoader with worker processes, prefetching and pinned
+  memory (page-locked batches copy to the GPU asynchronously).
+- Call dataset.set_epoch(epoch) before each epoch for a new shuffle.
+"""
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from training.shards import iter_batches, load_manifest, num_batches
+
+
+class ShardDataset(IterableDataset):
+    """
+    Batches of (features, labels int64 tensor) from a shard directory;
+    features is a float tensor, or (indices, offsets, values) for "csr".
+    """
+
+    def __init__(self, directory: str, batch_size: int, shuffle: bool = True, seed: int = 0):
+        super().__init__()
+        self.directory = directory
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.manifest = load_manifest(directory)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self):
+        return num_batches(self.manifest, self.batch_size)
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker, workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        sparse = self.manifest.get("layout") == "csr"
+        for features, labels in iter_batches(self.directory, self.batch_size, self.shuffle, self.seed,
+                                             self.epoch, worker, workers, self.manifest):
+            if sparse:
+                indptr, indices, values = features
+                features = (torch.from_numpy(indices.astype(np.int64)), torch.from_numpy(indptr[:-1]),
+                            torch.from_numpy(values))
+            else:
+                features = torch.from_numpy(features)
+            yield features, torch.from_numpy(labels)
+
+
+def make_loader(directory: str, batch_size: int, num_workers: int = 0, shuffle: bool = True, seed: int = 0,
+                pin_memory: bool = None) -> DataLoader:
+    """
+    DataLoader over a shard directory. Workers get whole shards, so use at
+    most as many workers as there are shards. pin_memory defaults to on
+    when CUDA is available.
+    """
+    dataset = ShardDataset(directory, batch_size, shuffle, seed)
+    num_workers = min(num_workers, len(dataset.manifest["shards"]))
+    return DataLoader(
+        dataset,
+        batch_size=None,  # the dataset already yields batches
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available() if pin_memory is None else pin_memory,
+        prefetch_factor=4 if num_workers else None,
+    )
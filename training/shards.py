@@ -0,0 +1,262 @@
+"""
+training/shards.py
+Sharded on-disk training data: feature rows and integer labels in .npy shards.
+- ShardWriter streams rows into fixed-size shards written through
+  np.lib.format.open_memmap, so building a dataset holds at most one shard
+  in memory, however many documents go in.
+- Two layouts: "dense" (a rows × feature_dim matrix) and "csr" (indptr,
+  indices, values arrays, for hashed text features where a row has a few
+  hundred non-zeros out of 2^18 columns).
+- manifest.json lists the shards with their row counts, the layout, the
+  feature width and dtype, and the class names.
+- Readers open shards with mmap_mode="r": the OS pages rows in on demand and
+  drops them under pressure, so RAM stays bounded by what a batch touches.
+- iter_batches() is the NumPy reading loop: shards in a per-epoch shuffled
+  order, rows shuffled inside each shard, one fancy-index gather per batch.
+  training.data wraps it for PyTorch.
+"""
+
+import json
+import os
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+# 64k rows × 1k float32 features ≈ 256 MB per shard at most
+DEFAULT_SHARD_ROWS = 65536
+FORMAT_VERSION = 1
+LAYOUTS = ("dense", "csr")
+
+
+class CsrRows:
+    """Rows of a "csr" shard (memory-mapped indptr / indices / values)."""
+
+    def __init__(self, indptr, indices, values):
+        self.indptr, self.indices, self.values = indptr, indices, values
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def take(self, rows):
+        """(indptr, indices, values) in-memory arrays of a slice or an index array of rows."""
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(len(self))
+            low, high = int(self.indptr[start]), int(self.indptr[stop])
+            return (np.array(self.indptr[start:stop + 1]) - low,
+                    np.array(self.indices[low:high]), np.array(self.values[low:high]))
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return indptr, self.indices[positions], self.values[positions]
+
+
+class ShardWriter:
+    """Append (features, labels) rows; shards of `shard_rows` rows are written as they fill up."""
+
+    def __init__(self, directory: str, feature_dim: int, shard_rows: int = DEFAULT_SHARD_ROWS,
+                 dtype: str = "float32", classes=None, layout: str = "dense"):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown shard layout: {layout}")
+        self.directory = directory
+        self.feature_dim = int(feature_dim)
+        self.shard_rows = int(shard_rows)
+        self.dtype = np.dtype(dtype)
+        self.classes = list(classes) if classes is not None else None
+        self.layout = layout
+        self.shards = []          # [{"name", "rows"}] of finished shards
+        self.num_classes = 0
+        self._features = None     # open memmaps of the shard being filled ("dense")
+        self._labels = None
+        self._filled = 0
+        self._csr = None          # lists of row lengths, indices, values, labels being filled ("csr")
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, name: str):
+        return (os.path.join(self.directory, f"{name}.features.npy"),
+                os.path.join(self.directory, f"{name}.labels.npy"))
+
+    def _count_classes(self, labels):
+        if len(labels):
+            self.num_classes = max(self.num_classes, int(labels.max()) + 1)
+
+    def _open_shard(self):
+        name = f"shard-{len(self.shards):05d}"
+        features_path, labels_path = self._paths(name)
+        self._name = name
+        self._features = np.lib.format.open_memmap(features_path, mode="w+", dtype=self.dtype,
+                                                   shape=(self.shard_rows, self.feature_dim))
+        self._labels = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int64, shape=(self.shard_rows,))
+        self._filled = 0
+
+    def _close_shard(self):
+        if self._features is None:
+            return
+        features, labels, rows = self._features, self._labels, self._filled
+        self._features = self._labels = None
+        features_path, labels_path = self._paths(self._name)
+        if rows == 0:
+            del features, labels
+            os.remove(features_path)
+            os.remove(labels_path)
+            return
+        if rows < self.shard_rows:  # last, partial shard: rewrite at its real length (≤ one shard in RAM)
+            features, labels = np.array(features[:rows]), np.array(labels[:rows])
+            np.save(features_path, features)
+            np.save(labels_path, labels)
+        else:
+            features.flush()
+            labels.flush()
+        del features, labels
+        self.shards.append({"name": self._name, "rows": rows})
+
+    def add(self, features, labels):
+        """Append a block of rows: features (rows × feature_dim), labels (rows,) of class indexes."""
+        if self.layout == "csr":
+            raise ValueError("Use add_sparse() for a csr dataset")
+        features = np.asarray(features, dtype=self.dtype).reshape(-1, self.feature_dim)
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        if len(features) != len(labels):
+            raise ValueError(f"{len(features)} feature rows but {len(labels)} labels")
+        self._count_classes(labels)
+        start = 0
+        while start < len(labels):
+            if self._features is None:
+                self._open_shard()
+            take = min(self.shard_rows - self._filled, len(labels) - start)
+            self._features[self._filled:self._filled + take] = features[start:start + take]
+            self._labels[self._filled:self._filled + take] = labels[start:start + take]
+            self._filled += take
+            start += take
+            if self._filled == self.shard_rows:
+                self._close_shard()
+
+    def add_sparse(self, indptr, indices, values, labels):
+        """Append a block of CSR rows (indptr has rows + 1 entries) to a csr dataset."""
+        if self.layout != "csr":
+            raise ValueError("add_sparse() needs layout='csr'")
+        indptr = np.asarray(indptr, dtype=np.int64)
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        if len(indptr) - 1 != len(labels):
+            raise ValueError(f"{len(indptr) - 1} feature rows but {len(labels)} labels")
+        self._count_classes(labels)
+        indices = np.asarray(indices, dtype=np.int32)
+        values = np.asarray(values, dtype=self.dtype)
+        start = 0
+        while start < len(labels):
+            if self._csr is None:
+                self._csr = ([], [], [], [])
+                self._filled = 0
+            take = min(self.shard_rows - self._filled, len(labels) - start)
+            low, high = indptr[start], indptr[start + take]
+            lengths, shard_indices, shard_values, shard_labels = self._csr
+            lengths.append(np.diff(indptr[start:start + take + 1]))
+            shard_indices.append(indices[low:high])
+            shard_values.append(values[low:high])
+            shard_labels.append(labels[start:start + take])
+            self._filled += take
+            start += take
+            if self._filled == self.shard_rows:
+                self._close_csr_shard()
+
+    def _close_csr_shard(self):
+        if self._csr is None:
+            return
+        lengths, indices, values, labels = (np.concatenate(part) for part in self._csr)
+        self._csr = None
+        name = f"shard-{len(self.shards):05d}"
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        for part, array in (("indptr", indptr), ("indices", indices), ("values", values), ("labels", labels)):
+            np.save(os.path.join(self.directory, f"{name}.{part}.npy"), array)
+        self.shards.append({"name": name, "rows": len(labels), "nnz": int(indptr[-1])})
+
+    def close(self) -> dict:
+        """Finish the last shard and write the manifest (atomically). Returns the manifest."""
+        self._close_shard()
+        self._close_csr_shard()
+        manifest = {
+            "format": FORMAT_VERSION,
+            "layout": self.layout,
+            "feature_dim": self.feature_dim,
+            "dtype": self.dtype.name,
+            "classes": self.classes,
+            "num_classes": max(self.num_classes, len(self.classes or ())),
+            "rows": sum(shard["rows"] for shard in self.shards),
+            "shards": self.shards,
+        }
+        tmp_path = os.path.join(self.directory, MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST))
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:  # an incomplete dataset gets no manifest
+            self._close_shard()
+            self._close_csr_shard()
+
+
+# ---------------------------------------------------------------------
+# 📖 Reading
+# ---------------------------------------------------------------------
+def load_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def open_shard(directory: str, shard: dict, layout: str = "dense"):
+    """(features, labels) of one manifest entry, memory-mapped read-only; CsrRows features for "csr"."""
+    def load(part):
+        return np.load(os.path.join(directory, f"{shard['name']}.{part}.npy"), mmap_mode="r")
+
+    if layout == "csr":
+        return CsrRows(load("indptr"), load("indices"), load("values")), load("labels")
+    return load("features"), load("labels")
+
+
+def shard_order(manifest: dict, shuffle: bool = True, seed: int = 0, epoch: int = 0) -> list:
+    """Shard indexes in reading order; the same for every worker of an epoch."""
+    order = np.arange(len(manifest["shards"]))
+    if shuffle:
+        np.random.default_rng((seed, epoch)).shuffle(order)
+    return order.tolist()
+
+
+def num_batches(manifest: dict, batch_size: int) -> int:
+    """Batches per epoch (batches never span two shards)."""
+    return sum(-(-shard["rows"] // batch_size) for shard in manifest["shards"])
+
+
+def iter_batches(directory: str, batch_size: int, shuffle: bool = True, seed: int = 0, epoch: int = 0,
+                 worker: int = 0, workers: int = 1, manifest: dict = None):
+    """
+    Yield (features, labels) NumPy batches for one epoch; features is a
+    matrix ("dense") or an (indptr, indices, values) tuple ("csr").
+    With several readers (DataLoader workers), reader `worker` of `workers`
+    takes every workers-th shard of the epoch's order, so together they
+    read each row exactly once. A shard's last batch may be short.
+    """
+    manifest = manifest or load_manifest(directory)
+    order = shard_order(manifest, shuffle, seed, epoch)[worker::workers]
+    rng = np.random.default_rng((seed, epoch, worker))
+    layout = manifest.get("layout", "dense")
+    for index in order:
+        features, labels = open_shard(directory, manifest["shards"][index], layout)
+        take = features.take if layout == "csr" else (lambda rows: np.array(features[rows]))
+        rows = len(labels)
+        if shuffle:
+            permutation = rng.permutation(rows)
+            for start in range(0, rows, batch_size):
+                # sorted indexes read the memory map front to back; order inside a batch does not matter
+                batch = np.sort(permutation[start:start + batch_size])
+                yield take(batch), labels[batch]
+        else:
+            for start in range(0, rows, batch_size):
+                yield take(slice(start, start + batch_size)), np.array(labels[start:start + batch_size])